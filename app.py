@@ -1,14 +1,463 @@
-import asyncio
+import copy
+import hashlib
+import io
 import json
-import time
+import tempfile
+import uuid
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO
 
 import pandas as pd
 import streamlit as st
+from openai import AsyncOpenAI
 from src.classification import TextClassifier
+from src.core.cache import ResultCache
+from src.core.cascade import EscalationRule
+from src.core.checkpoint import Checkpoint
+from src.core.client import create_client
 from src.core.config import settings
-from src.evaluation import allow_user_correction, calculate_metrics
+from src.core.jobs import Job, JobManager, JobStatus
+from src.core.scheduler import AdaptiveScheduler
+from src.core.telemetry import RunMetrics
+from src.evaluation import (
+    allow_user_correction,
+    calculate_metrics,
+    choose_rows_to_reclassify,
+    show_metrics,
+)
 from src.explanation import show_detailed_results
-from src.utils.data import get_text_column, load_file, sample_data
+from src.export import show_downloads
+from src.monitoring import show_run_estimate, show_run_metrics
+from src.multi import MultiTaxonomyClassifier, attach_target_results
+from src.pipeline import ResultWriter, classify_stream
+from src.results import ClassificationResults, Reclassification
+from src.utils.data import (
+    get_kept_columns,
+    get_text_column,
+    iter_file_chunks,
+    load_columns,
+    sample_data,
+    sniff_file,
+)
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Get the job manager shared by every session of the server."""
+    return JobManager.from_settings()
+
+
+@st.cache_resource
+def get_client() -> AsyncOpenAI:
+    """Get the LLM client shared by every session of the server.
+
+    It is only used by jobs, on the job manager's event loop, so its connection
+    pool is kept warm across runs and caps the connections of the whole server.
+    """
+    return create_client()
+
+
+@st.cache_resource
+def get_scheduler() -> AdaptiveScheduler:
+    """Get the request scheduler shared by every session of the server.
+
+    Its concurrency limit and per-minute budgets apply to all runs together.
+    """
+    return AdaptiveScheduler.from_settings()
+
+
+@st.cache_data
+def get_predefined_categories() -> dict[str, dict[str, str]]:
+    """Get the predefined category sets, read once per server."""
+    with open("data/categories.json") as f:
+        return json.load(f)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def estimate_run(
+    _classifier: TextClassifier,
+    _texts: pd.Series,
+    key: str,  # noqa: ARG001 - identifies the texts and settings in the cache key
+    pack_size: int,
+) -> dict:
+    """Estimate a run once, rather than tokenizing every row on each rerun.
+
+    Args:
+        _classifier (TextClassifier): The classifier, with its settings applied.
+        _texts (pd.Series): The texts to classify, identified by ``key``.
+        key (str): Identifies the texts, the categories and the classifier
+            settings the estimate depends on, e.g. a checkpoint run ID.
+        pack_size (int): The maximum number of texts sent in a single request.
+
+    Returns:
+        dict: The estimate, see ``TextClassifier.estimate_run``.
+    """
+    return _classifier.estimate_run(_texts, pack_size)
+
+
+async def classify_in_memory(
+    job: Job,
+    classifier: TextClassifier,
+    df: pd.DataFrame,
+    text_column: str,
+    pack_size: int,
+    checkpoint: Checkpoint,
+) -> ClassificationResults:
+    """Classify a loaded DataFrame as a background job.
+
+    Args:
+        job (Job): The job to report progress on.
+        classifier (TextClassifier): The classifier, with its categories set.
+        df (pd.DataFrame): The data to classify.
+        text_column (str): The name of the text column.
+        pack_size (int): The maximum number of texts sent in a single request.
+        checkpoint (Checkpoint): Where completed rows are saved as they finish.
+
+    Returns:
+        ClassificationResults: The results, joined to ``df`` by index.
+    """
+
+    def update_progress(progress):
+        job.completed = int(progress * job.total)
+
+    job.metrics = classifier.metrics
+    job.models = classifier.models
+    try:
+        results = await classifier.batch_classify(
+            df[text_column].tolist(),
+            update_progress,
+            pack_size=pack_size,
+            checkpoint=checkpoint,
+        )
+    finally:
+        checkpoint.close()
+    # Every row is in the results now; only interrupted runs are resumed.
+    checkpoint.delete()
+
+    run_stats = classifier.last_run_stats
+    job.summary = {
+        "Model calls": run_stats["Model calls"],
+        "Duplicates skipped": run_stats["Duplicates"],
+        "Served from cache": run_stats["Cache hits"],
+        "Answered locally": run_stats["Lexical"],
+        "Near-duplicates": run_stats["Near-duplicates"],
+        "Resumed": run_stats["Resumed"],
+        "Errors": run_stats["Errors"],
+        "Escalated": run_stats["Escalated"],
+        "Retries": classifier.metrics.counters["retries"],
+        "Concurrency": classifier.scheduler.stats()["Concurrency"],
+    }
+    if classifier.cache is not None:
+        job.summary["Cache hit rate"] = f"{classifier.cache.hit_rate:.1%}"
+
+    with classifier.metrics.stage("assemble"):
+        classification = ClassificationResults.from_schemas(df, text_column, results)
+        classification.categories = dict(classifier.category_descriptions)
+    classifier.metrics.finish()
+
+    return classification
+
+
+async def classify_to_file(
+    job: Job,
+    classifier: TextClassifier,
+    file: BinaryIO,
+    filename: str,
+    text_column: str,
+    columns: list[str],
+    pack_size: int,
+    checkpoint: Checkpoint,
+) -> Path:
+    """Classify a file chunk by chunk as a background job, writing results to a temporary file.
+
+    Args:
+        job (Job): The job to report progress on.
+        classifier (TextClassifier): The classifier, with its categories set.
+        file (BinaryIO): The uploaded file content.
+        filename (str): The uploaded file name, used to detect the format.
+        text_column (str): The name of the text column.
+        columns (list[str]): The columns to read, with the text column.
+        pack_size (int): The maximum number of texts sent in a single request.
+        checkpoint (Checkpoint): Where completed rows are saved as they finish.
+
+    Returns:
+        Path: The path of the results file.
+    """
+    output_path = Path(tempfile.gettempdir()) / f"classification_{job.id}.csv"
+
+    def on_chunk(results_df: pd.DataFrame) -> None:
+        if "Preview" not in job.summary:
+            job.summary["Preview"] = results_df.head(20)
+        job.completed += len(results_df)
+
+    job.metrics = classifier.metrics
+    job.models = classifier.models
+    try:
+        with ResultWriter(output_path) as writer:
+            await classify_stream(
+                classifier,
+                iter_file_chunks(file, filename, columns=columns),
+                text_column,
+                writer,
+                chunk_callback=on_chunk,
+                pack_size=pack_size,
+                checkpoint=checkpoint,
+            )
+    finally:
+        checkpoint.close()
+        classifier.metrics.finish()
+    checkpoint.delete()
+
+    return output_path
+
+
+async def classify_targets(
+    job: Job,
+    classifier: TextClassifier,
+    df: pd.DataFrame,
+    taxonomies: dict[str, dict[str, str]],
+    columns: list[str],
+) -> Path:
+    """Classify a loaded DataFrame against several category sets and columns as a background job, writing results to a temporary file.
+
+    Args:
+        job (Job): The job to report progress on.
+        classifier (TextClassifier): The classifier, sending one request per row.
+        df (pd.DataFrame): The data to classify.
+        taxonomies (dict[str, dict[str, str]]): The category sets, by name.
+        columns (list[str]): The names of the text columns.
+
+    Returns:
+        Path: The path of the results file.
+    """
+    output_path = Path(tempfile.gettempdir()) / f"classification_{job.id}.csv"
+    multi = MultiTaxonomyClassifier(classifier, taxonomies, columns)
+
+    def update_progress(progress):
+        job.completed = int(progress * job.total)
+
+    job.metrics = classifier.metrics
+    job.models = classifier.models
+    results = await multi.classify(df, update_progress)
+
+    run_stats = multi.last_run_stats
+    job.summary = {
+        "Targets": run_stats["Targets"],
+        "Model calls": run_stats["Model calls"],
+        "Duplicates skipped": run_stats["Duplicates"],
+        "Served from cache": run_stats["Cache hits"],
+        "Errors": run_stats["Errors"],
+        "Retries": classifier.metrics.counters["retries"],
+    }
+
+    with classifier.metrics.stage("write"), ResultWriter(output_path) as writer:
+        writer.write(attach_target_results(df, results))
+    classifier.metrics.finish()
+
+    return output_path
+
+
+async def reclassify_rows(
+    job: Job,
+    classifier: TextClassifier,
+    results: ClassificationResults,
+    rows: pd.Index,
+    pack_size: int,
+    affected: bool,
+) -> Reclassification:
+    """Classify some rows of the results again as a background job.
+
+    Cached and local answers are bypassed, so the rows are sent to the model even
+    when the category set is unchanged.
+
+    Args:
+        job (Job): The job to report progress on.
+        classifier (TextClassifier): The classifier, with its categories set.
+        results (ClassificationResults): The results the rows belong to.
+        rows (pd.Index): The labels of the rows to classify again.
+        pack_size (int): The maximum number of texts sent in a single request.
+        affected (bool): Whether the rows include every row the change of the
+            category set may affect.
+
+    Returns:
+        Reclassification: The new results, merged by ``show_jobs``.
+    """
+
+    def update_progress(progress):
+        job.completed = int(progress * job.total)
+
+    job.metrics = classifier.metrics
+    job.models = classifier.models
+    new_results = await classifier.batch_classify(
+        results.texts.loc[rows].tolist(),
+        update_progress,
+        pack_size=pack_size,
+        row_ids=rows.tolist(),
+        refresh=True,
+    )
+    run_stats = classifier.last_run_stats
+    job.summary = {
+        "Model calls": run_stats["Model calls"],
+        "Duplicates skipped": run_stats["Duplicates"],
+        "Near-duplicates": run_stats["Near-duplicates"],
+        "Errors": run_stats["Errors"],
+    }
+    classifier.metrics.finish()
+
+    return Reclassification(
+        results,
+        rows,
+        new_results,
+        dict(classifier.category_descriptions) if affected else None,
+    )
+
+
+async def explain_rows(
+    job: Job,
+    classifier: TextClassifier,
+    results: ClassificationResults,
+    rows: pd.Index,
+) -> tuple[ClassificationResults, pd.Index, list]:
+    """Generate the details of label-only rows as a background job.
+
+    Args:
+        job (Job): The job to report progress on.
+        classifier (TextClassifier): The classifier, with its categories set.
+        results (ClassificationResults): The results the rows belong to.
+        rows (pd.Index): The labels of the rows to explain.
+
+    Returns:
+        tuple[ClassificationResults, pd.Index, list]: The results, and the labels
+            and details of the rows that were explained, for ``set_details``.
+    """
+    job.metrics = classifier.metrics
+    job.models = classifier.models
+    details = await classifier.explain(
+        results.texts.loc[rows].tolist(),
+        results.table.loc[rows, "category"].astype(str).tolist(),
+    )
+    job.completed = len(details)
+    classifier.metrics.finish()
+
+    return results, rows[list(details)], list(details.values())
+
+
+def request_details(rows: pd.Index) -> None:
+    """Explain label-only rows of the current results in the background.
+
+    A single explanation job runs per session, and each row is only requested
+    once, so rows whose request failed are not sent again on every rerun.
+
+    Args:
+        rows (pd.Index): The labels of the rows to explain.
+    """
+    requested = st.session_state.details_requested
+    rows = rows[~rows.isin(requested)]
+    if rows.empty or st.session_state.details_job is not None:
+        return
+
+    requested.update(rows)
+    classifier = copy.copy(st.session_state.classifier)
+    classifier.metrics = RunMetrics()
+    job = get_job_manager().submit(
+        f"Explanations ({len(rows)} rows)",
+        len(rows),
+        partial(
+            explain_rows,
+            classifier=classifier,
+            results=st.session_state.results,
+            rows=rows,
+        ),
+    )
+    st.session_state.details_job = job.id
+
+
+def collect_details() -> None:
+    """Store the details generated by the explanation job once it finishes."""
+    manager = get_job_manager()
+    job = manager.get(st.session_state.details_job)
+    if job is not None and not job.done:
+        return
+
+    st.session_state.details_job = None
+    result = manager.collect(job.id) if job is not None else None
+    if result is not None:
+        results, rows, details = result
+        # The results may have been replaced by a new run in the meantime.
+        if results is st.session_state.results:
+            results.set_details(rows, details)
+    st.rerun()
+
+
+def show_jobs() -> None:
+    """Show the classification jobs of the session, collecting finished results."""
+    manager = get_job_manager()
+
+    active = [job for job in manager.list_jobs() if not job.done]
+    if active:
+        running = sum(job.status == JobStatus.RUNNING for job in active)
+        st.caption(
+            f"Server load: {running} job(s) running, {len(active) - running} queued"
+        )
+
+    for job_id in reversed(st.session_state.job_ids):
+        job = manager.get(job_id)
+        if job is None:
+            continue
+
+        st.write(f"**{job.name}** — {job.status}")
+        st.progress(job.progress)
+
+        if job.status == JobStatus.RUNNING:
+            eta = f"{job.eta:.0f}s" if job.eta is not None else "estimating..."
+            st.caption(
+                f"{job.completed}/{job.total} rows · "
+                f"{job.throughput:.1f} rows/s · ETA {eta}"
+            )
+        if not job.done and st.button("Cancel", key=f"cancel_{job.id}"):
+            manager.cancel(job.id)
+
+        if "Preview" in job.summary and not job.done:
+            st.dataframe(job.summary["Preview"], use_container_width=True)
+
+        if job.status == JobStatus.FAILED:
+            st.error(f"Classification failed: {job.error}")
+
+        if job.metrics is not None and job.metrics.counters["rows"]:
+            with st.expander("Telemetry"):
+                show_run_metrics(job.metrics, job.id, job.models)
+
+        if job.status == JobStatus.COMPLETED:
+            st.caption(
+                f"Processed {job.total} texts in {job.elapsed:.2f} seconds."
+                + "".join(
+                    f" · {name}: {value}"
+                    for name, value in job.summary.items()
+                    if name != "Preview"
+                )
+            )
+
+            if job_id not in st.session_state.collected_jobs:
+                st.session_state.collected_jobs.add(job_id)
+                result = manager.collect(job_id)
+                if isinstance(result, ClassificationResults):
+                    st.session_state.results = result
+                    st.session_state.correction_log = {}
+                    st.session_state.details_requested = set()
+                elif isinstance(result, Reclassification):
+                    # The results may have been replaced by a new run meanwhile.
+                    if result.results is st.session_state.results:
+                        changed = result.results.replace_results(
+                            result.rows, result.new_results, result.categories
+                        )
+                        job.summary["Categories changed"] = len(changed)
+                        st.session_state.details_requested.difference_update(
+                            result.rows
+                        )
+                elif result is not None:
+                    st.session_state.stream_output = result
+                st.rerun()
 
 
 def main():
@@ -22,18 +471,41 @@ def main():
     )
 
     if "classifier" not in st.session_state:
-        st.session_state.classifier = TextClassifier(model=settings.MODEL)
+        st.session_state.classifier = TextClassifier(
+            model=settings.MODEL,
+            cache=ResultCache.from_settings(),
+            scheduler=get_scheduler(),
+            client=get_client(),
+        )
+        Checkpoint.cleanup(max_age_days=settings.CHECKPOINT_MAX_AGE_DAYS)
     if "categories" not in st.session_state:
         st.session_state.categories = {}
     if "predefined_options" not in st.session_state:
-        with open("data/categories.json") as f:
-            st.session_state.predefined_options = json.load(f)
+        st.session_state.predefined_options = get_predefined_categories()
     if "data_df" not in st.session_state:
         st.session_state.data_df = None
-    if "results_df" not in st.session_state:
-        st.session_state.results_df = None
+    if "results" not in st.session_state:
+        st.session_state.results = None
     if "text_column" not in st.session_state:
         st.session_state.text_column = None
+    if "correction_log" not in st.session_state:
+        # Pending corrections, from row label to category, until they are saved.
+        st.session_state.correction_log = {}
+    if "details_requested" not in st.session_state:
+        # Label-only rows whose details were requested, see request_details.
+        st.session_state.details_requested = set()
+    if "details_job" not in st.session_state:
+        st.session_state.details_job = None
+    if "stream_output" not in st.session_state:
+        st.session_state.stream_output = None
+    if "file_info" not in st.session_state:
+        st.session_state.file_info = {"id": None, "name": None, "digest": ""}
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if "job_ids" not in st.session_state:
+        st.session_state.job_ids = []
+    if "collected_jobs" not in st.session_state:
+        st.session_state.collected_jobs = set()
 
     st.title("🔍 Text Classification System")
     st.write("""
@@ -48,24 +520,39 @@ def main():
     )
 
     if uploaded_file:
-        df = load_file(uploaded_file)
+        if st.session_state.file_info["id"] != uploaded_file.file_id:
+            st.session_state.file_info = {
+                "id": uploaded_file.file_id,
+                "name": uploaded_file.name,
+                "digest": hashlib.sha256(uploaded_file.getvalue()).hexdigest(),
+            }
+
+        # Only the start of the file is read until the columns are chosen.
+        sample = sniff_file(uploaded_file)
 
-        if df is not None:
-            st.session_state.data_df = df
+        if sample is not None:
+            st.session_state.text_column = get_text_column(sample)
+            columns = get_kept_columns(sample, st.session_state.text_column)
 
-        st.session_state.text_column = get_text_column(df)
+            sample_data(sample[columns])
 
-        sample_data(df)
+            df, st.session_state.load_seconds = load_columns(
+                uploaded_file, st.session_state.file_info["digest"], columns
+            )
+            if df is not None:
+                st.session_state.data_df = df
 
     if st.session_state.data_df is not None:
         st.header("Step 2: Define Your Categories")
 
         predefined = st.checkbox("Use predefined category examples")
+        taxonomy_name = "Custom"
 
         if predefined:
             category_set = st.selectbox(
                 "Select category set:", list(st.session_state.predefined_options.keys())
             )
+            taxonomy_name = category_set
 
             st.session_state.categories = st.session_state.predefined_options[
                 category_set
@@ -114,117 +601,359 @@ def main():
     if st.session_state.data_df is not None and st.session_state.categories:
         st.header("Step 3: Classify Your Texts")
 
-        if st.button("Start Classification") and st.session_state.text_column:
-            texts = st.session_state.data_df[st.session_state.text_column].tolist()
-
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            def update_progress(progress):
-                progress_bar.progress(progress)
-                status_text.text(f"Processing... {int(progress * 100)}% complete")
-
-            start_time = time.time()
-            status_text.text("Starting classification...")
-
-            loop = asyncio.new_event_loop()
-
-            asyncio.set_event_loop(loop)
-            results = loop.run_until_complete(
-                st.session_state.classifier.batch_classify(texts, update_progress)
+        pack_size = st.number_input(
+            "Texts per request:",
+            min_value=1,
+            max_value=50,
+            value=settings.PACK_SIZE,
+            help="Send several short texts in a single request to save tokens. "
+            "Long texts are automatically sent in smaller groups.",
+        )
+
+        use_lexical = st.checkbox(
+            "Answer easy rows locally",
+            value=settings.LEXICAL_ENABLED,
+            help="A lightweight local model, trained on past confident results and "
+            "your corrections, answers the rows it is sure about without calling the AI.",
+        )
+        lexical_threshold = st.slider(
+            "Minimum local confidence:",
+            0.5,
+            1.0,
+            settings.LEXICAL_THRESHOLD,
+            0.01,
+            disabled=not use_lexical,
+        )
+
+        label_only = st.checkbox(
+            "Labels only, explain on demand",
+            value=settings.LABEL_ONLY,
+            help="Only the category and confidence are requested, which is faster "
+            "and cheaper. Explanations, keywords and ambiguities are generated in "
+            "the background for the rows you view.",
+        )
+        # Set before the run ID, which depends on the mode.
+        st.session_state.classifier.use_label_only(label_only)
+
+        use_near_duplicates = st.checkbox(
+            "Label near-duplicates together",
+            value=settings.NEAR_DUPLICATES_ENABLED,
+            help="Texts that only differ in case, punctuation, numbers or a few "
+            "words are grouped, and only one text per group is sent to the AI. The "
+            "others get its label and record its row as their cluster.",
+        )
+        near_duplicate_threshold = st.slider(
+            "Minimum similarity:",
+            0.5,
+            1.0,
+            settings.NEAR_DUPLICATE_THRESHOLD,
+            0.01,
+            disabled=not use_near_duplicates,
+        )
+
+        use_cascade = False
+        escalation = EscalationRule.from_settings()
+        if settings.CASCADE_MODELS:
+            use_cascade = st.checkbox(
+                "Escalate uncertain rows to larger models",
+                value=True,
+                help="Rows go to " + " → ".join(settings.CASCADE_MODELS) + " in turn, "
+                "only moving on when the answer is unsure, ambiguous, undetermined "
+                "or failed.",
+            )
+            escalation.min_confidence = st.slider(
+                "Escalate below confidence:",
+                0.0,
+                1.0,
+                settings.CASCADE_MIN_CONFIDENCE,
+                0.05,
+                disabled=not use_cascade,
+            )
+        # Set before the run ID, which depends on the models used.
+        st.session_state.classifier.use_cascade(
+            settings.CASCADE_MODELS if use_cascade else [], escalation
+        )
+
+        long_text_strategies = {
+            "Truncate, keeping the start and end": "truncate",
+            "Split into chunks and vote": "chunk",
+        }
+        long_text_strategy = st.selectbox(
+            "Long texts:",
+            list(long_text_strategies),
+            index=list(long_text_strategies.values()).index(
+                settings.LONG_TEXT_STRATEGY
+            ),
+            help="Texts over the token budget, e.g. pasted email threads, either "
+            "lose their middle or are classified chunk by chunk, the chunks voting "
+            "with their confidence.",
+        )
+        max_text_tokens = st.number_input(
+            "Maximum tokens per text:",
+            min_value=0,
+            value=settings.LONG_TEXT_MAX_TOKENS,
+            step=500,
+            help="0 sends texts whole.",
+        )
+        # Set before the run ID, which depends on the handling of long texts.
+        st.session_state.classifier.use_long_texts(
+            max_text_tokens or None, long_text_strategies[long_text_strategy]
+        )
+
+        extra_taxonomies = st.multiselect(
+            "Also classify against:",
+            [
+                name
+                for name in st.session_state.predefined_options
+                if name != taxonomy_name
+            ],
+            help="Other category sets, answered in the same request as the current "
+            "one. Each adds a category, confidence and explanation column, and the "
+            "results are written to a file.",
+        )
+        extra_columns = st.multiselect(
+            "Also classify columns:",
+            [
+                column
+                for column in st.session_state.data_df.columns
+                if column != st.session_state.text_column
+            ],
+            help="Other text columns, e.g. a subject next to a body, each classified "
+            "on its own in the same request.",
+        )
+        multi_target = bool(extra_taxonomies or extra_columns)
+
+        stream_to_file = st.checkbox(
+            "Stream results to a file (for very large files)",
+            disabled=uploaded_file is None or multi_target,
+            help="Rows are read, classified and written to disk chunk by chunk "
+            "instead of being kept in memory.",
+        )
+
+        checkpoint = Checkpoint(
+            Checkpoint.make_run_id(
+                st.session_state.file_info["digest"],
+                str(st.session_state.text_column),
+                st.session_state.classifier.signature,
+                st.session_state.classifier.render_categories(),
+            )
+        )
+        st.caption(f"Run ID: {checkpoint.run_id}")
+
+        in_progress = get_job_manager().find(checkpoint.run_id) is not None
+        if not in_progress and (saved_rows := checkpoint.saved_rows()):
+            st.info(
+                f"A previous run on this file stopped before the end: {saved_rows} "
+                "classified rows were saved and will not be sent again."
+            )
+            if st.button("Discard saved progress"):
+                checkpoint.delete()
+                st.rerun()
+
+        if st.session_state.text_column:
+            show_run_estimate(
+                estimate_run(
+                    st.session_state.classifier,
+                    st.session_state.data_df[st.session_state.text_column],
+                    checkpoint.run_id,
+                    pack_size,
+                )
             )
 
-            loop.close()
-
-            results_df = st.session_state.data_df.copy()
-            results_df["original_text"] = results_df[st.session_state.text_column]
-            results_df["category"] = [
-                r.category if r.category else "Unknown" for r in results
-            ]
-            results_df["confidence"] = [
-                r.confidence if r.confidence else 0 for r in results
-            ]
-            results_df["explanation"] = [
-                r.explanation if r.explanation else "" for r in results
-            ]
-            results_df["keywords"] = [r.keywords if r.keywords else [] for r in results]
-            results_df["ambiguities"] = [
-                r.ambiguities if r.ambiguities else [] for r in results
-            ]
-
-            st.session_state.results_df = results_df
+        if st.button("Start Classification") and st.session_state.text_column:
+            # The job runs while the user keeps editing, so it gets its own
+            # classifier holding a snapshot of the current categories.
+            classifier = copy.copy(st.session_state.classifier)
+            classifier.set_categories(dict(st.session_state.categories))
+            classifier.use_lexical(lexical_threshold if use_lexical else None)
+            classifier.use_near_duplicates(
+                near_duplicate_threshold if use_near_duplicates else None
+            )
+            classifier.metrics = RunMetrics()
+
+            if multi_target:
+                # A single request per row, sent to the first model.
+                classifier.use_cascade([])
+                work = partial(
+                    classify_targets,
+                    classifier=classifier,
+                    df=st.session_state.data_df,
+                    taxonomies={
+                        taxonomy_name: dict(st.session_state.categories),
+                        **{
+                            name: st.session_state.predefined_options[name]
+                            for name in extra_taxonomies
+                        },
+                    },
+                    columns=[st.session_state.text_column, *extra_columns],
+                )
+            elif stream_to_file:
+                work = partial(
+                    classify_to_file,
+                    classifier=classifier,
+                    file=io.BytesIO(uploaded_file.getvalue()),
+                    filename=uploaded_file.name,
+                    text_column=st.session_state.text_column,
+                    columns=list(st.session_state.data_df.columns),
+                    pack_size=pack_size,
+                    checkpoint=checkpoint,
+                )
+            else:
+                classifier.metrics.add_stage(
+                    "load", st.session_state.get("load_seconds", 0.0)
+                )
+                work = partial(
+                    classify_in_memory,
+                    classifier=classifier,
+                    df=st.session_state.data_df,
+                    text_column=st.session_state.text_column,
+                    pack_size=pack_size,
+                    checkpoint=checkpoint,
+                )
 
-            elapsed_time = time.time() - start_time
-            status_text.text(
-                f"Classification complete! Processed {len(texts)} texts in {elapsed_time:.2f} seconds."
+            job = get_job_manager().submit(
+                f"{st.session_state.file_info['name']} ({st.session_state.text_column})",
+                len(st.session_state.data_df),
+                work,
+                run_id=None if multi_target else checkpoint.run_id,
+                owner=st.session_state.session_id,
             )
-            progress_bar.progress(1.0)
+            # A job of another session is left for that session to collect.
+            if job.owner != st.session_state.session_id:
+                st.info("This run is already in progress in another session.")
+            elif job.id in st.session_state.job_ids:
+                st.info("This run is already in progress.")
+            else:
+                st.session_state.job_ids.append(job.id)
+
+        polling = any(
+            (job := get_job_manager().get(job_id)) is not None and not job.done
+            for job_id in st.session_state.job_ids
+        )
+        st.fragment(show_jobs, run_every=1.0 if polling else None)()
+
+        if st.session_state.stream_output is not None:
+            with open(st.session_state.stream_output, "rb") as f:
+                st.download_button(
+                    "Download Streamed Results as CSV",
+                    f,
+                    "classification_results.csv",
+                    "text/csv",
+                    key="download-stream-csv",
+                )
+
+        if st.session_state.results is not None:
+            results = st.session_state.results
 
-        if st.session_state.results_df is not None:
             st.header("Classification Results")
 
-            show_detailed_results(
-                st.session_state.results_df, st.session_state.text_column
-            )
+            show_detailed_results(results, request_details)
+            if st.session_state.details_job is not None:
+                st.fragment(collect_details, run_every=1.0)()
 
             st.subheader("Data visualization")
             col1, col2 = st.columns(2)
 
+            # Aggregates are computed once per version of the results.
+            index = results.get_index()
+
             with col1:
-                category_counts = st.session_state.results_df["category"].value_counts()
                 st.write("Category distribution:")
-                st.bar_chart(category_counts)
+                st.bar_chart(index.category_counts)
 
             with col2:
-                avg_confidence = st.session_state.results_df.groupby("category")[
-                    "confidence"
-                ].mean()
                 st.write("Average confidence by category:")
-                st.bar_chart(avg_confidence)
+                st.bar_chart(index.mean_confidence)
 
             st.header("Step 4: Review and Improve")
 
+            with st.expander("Re-classify rows"):
+                st.caption(
+                    "Send a subset of the rows to the AI again, e.g. after editing "
+                    "the categories, and merge the new results in place. Your "
+                    "corrections are kept."
+                )
+                rows, affected = choose_rows_to_reclassify(
+                    results, st.session_state.categories
+                )
+                rows_hash = pd.util.hash_pandas_object(rows).sum()
+                estimate = estimate_run(
+                    st.session_state.classifier,
+                    results.texts.loc[rows],
+                    f"{checkpoint.run_id}:{id(results)}:{results.version}:{rows_hash}",
+                    pack_size,
+                )
+                st.caption(
+                    f"{len(rows):,} rows selected · {estimate['Requests']:,} requests "
+                    f"· about ${estimate['Estimated cost']:,.2f}"
+                )
+                if st.button(f"Re-classify {len(rows):,} rows", disabled=rows.empty):
+                    classifier = copy.copy(st.session_state.classifier)
+                    classifier.set_categories(dict(st.session_state.categories))
+                    classifier.use_near_duplicates(
+                        near_duplicate_threshold if use_near_duplicates else None
+                    )
+                    classifier.metrics = RunMetrics()
+                    job = get_job_manager().submit(
+                        f"Re-classification ({len(rows)} rows)",
+                        len(rows),
+                        partial(
+                            reclassify_rows,
+                            classifier=classifier,
+                            results=results,
+                            rows=rows,
+                            pack_size=pack_size,
+                            affected=affected,
+                        ),
+                    )
+                    st.session_state.job_ids.append(job.id)
+                    st.rerun()
+
+            gold_column = None
+            gold_columns = [
+                column
+                for column in results.source.columns
+                if column != results.text_column
+            ]
+            if gold_columns:
+                choice = st.selectbox(
+                    "Labelled column :",
+                    ["None", *gold_columns],
+                    help="A column of your file holding known categories. Rows "
+                    "disagreeing with it are reviewed first, and the predictions are "
+                    "evaluated against it.",
+                )
+                gold_column = None if choice == "None" else choice
+
             if st.checkbox("Enable correction mode"):
-                corrected_df = allow_user_correction(
-                    st.session_state.results_df,
-                    st.session_state.text_column,
+                corrected_categories = allow_user_correction(
+                    results,
                     ["Undetermined", *st.session_state.categories.keys()],
+                    st.session_state.correction_log,
+                    gold_column,
                 )
 
                 if st.button("Save Corrections"):
-                    st.session_state.results_df = corrected_df
+                    changed = results.apply_corrections(corrected_categories)
+                    st.session_state.correction_log.clear()
+                    st.session_state.classifier.learn_corrections(
+                        results.texts.loc[changed].tolist(),
+                        results.table.loc[changed, "category"].tolist(),
+                    )
                     st.success("Corrections saved!")
 
-                    metrics = calculate_metrics(corrected_df)
-                    if metrics:
-                        st.subheader("Model Performance Metrics")
-                        st.write(f"**Overall accuracy**: {metrics['Accuracy']:.2%}")
-                        st.write(f"**Total samples**: {metrics['Total samples']}")
-                        st.write(
-                            f"**Corrected samples**: {metrics['Corrected samples']}"
-                        )
+            metrics = calculate_metrics(results.get_evaluation())
+            if metrics:
+                show_metrics(metrics)
 
-                        st.subheader("Per-Category Performance")
-                        metrics_df = pd.DataFrame.from_dict(
-                            {
-                                k: {
-                                    "Total": v["Total"],
-                                    "Accuracy": f"{v['Accuracy']:.2%}",
-                                }
-                                for k, v in metrics["Per category"].items()
-                            },
-                            orient="index",
-                        )
-
-                        st.dataframe(metrics_df)
+            if gold_column is not None:
+                metrics = calculate_metrics(results.get_evaluation(gold_column))
+                if metrics:
+                    show_metrics(metrics, f"Performance Against '{gold_column}'")
+                else:
+                    st.warning(f"The column '{gold_column}' has no labels.")
 
-            st.download_button(
-                "Download Results as CSV",
-                st.session_state.results_df.to_csv(index=False).encode("utf-8"),
-                "classification_results.csv",
-                "text/csv",
-                key="download-csv",
-            )
+            show_downloads(results)
 
     st.markdown("---")
     st.markdown("### About This Tool")
@@ -0,0 +1,553 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+The server answers ``POST /v1/chat/completions`` with classifications in the format
+expected by ``TextClassifier``, for single texts and packs alike, after a simulated
+latency. Rate limiting, server errors and malformed JSON can be injected at a given
+rate to exercise the retry and fallback paths.
+
+The file and batch endpoints of the Batch API are served too: uploaded JSONL files
+of chat completion requests are answered after ``--batch-delay`` seconds, with the
+same injected failures as error lines or malformed completions.
+
+Example:
+    python -m benchmarks.mock_server --port 8765 --latency-mean 0.2 --rate-limit-rate 0.05
+"""
+
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_PATTERN = re.compile(r"/batches/([\w-]+)(/cancel)?$")
+FILE_CONTENT_PATTERN = re.compile(r"/files/([\w-]+)/content$")
+CATEGORY_PATTERN = re.compile(r"^\s*- ([^:\"\n]+):", re.MULTILINE)
+PACKED_TEXT_PATTERN = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+# Multi-taxonomy prompts list their taxonomies and the keys of the answer.
+TAXONOMY_PATTERN = re.compile(r'^Taxonomy "([^"]+)":\n((?:- .*\n?)+)', re.MULTILINE)
+TARGET_KEYS_PATTERN = re.compile(r"entry for each of these keys: (\[.*\])")
+FIELD_PATTERN = re.compile(r"^\[([^\]]+)\] (.*)$", re.MULTILINE)
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server.
+
+    Attributes:
+        latency_distribution (str): One of ``LATENCY_DISTRIBUTIONS``.
+        latency_mean (float): The mean simulated latency, in seconds.
+        latency_jitter (float): The spread of the latency, in seconds: the standard
+            deviation for normal and lognormal, the half-width for uniform.
+        rate_limit_rate (float): The fraction of requests answered with a 429.
+        server_error_rate (float): The fraction of requests answered with a 500.
+        malformed_rate (float): The fraction of completions whose content is not
+            valid JSON.
+        retry_after_ms (int): The ``retry-after-ms`` header sent with 429s, or 0 to
+            omit it.
+        batch_delay (float): The time a batch takes to complete, in seconds.
+        seed (int | None): Seeds the random generator, for reproducible runs.
+    """
+
+    latency_distribution: str = "constant"
+    latency_mean: float = 0.05
+    latency_jitter: float = 0.0
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    retry_after_ms: int = 0
+    batch_delay: float = 1.0
+    seed: int | None = None
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock configuration and request counters."""
+
+    daemon_threads = True
+    # Benchmarks open many connections at once; the default backlog is 5.
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.counts: dict[str, int] = {}
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """The base URL to use as ``LITE_LLM_BASE_URL``."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw(self) -> tuple[str, float]:
+        """Pick the outcome and latency of a request.
+
+        Returns:
+            tuple[str, float]: The outcome (``"ok"``, ``"rate_limited"``,
+                ``"server_error"`` or ``"malformed"``) and the latency in seconds.
+        """
+        config = self.config
+        with self._lock:
+            roll = self.random.random()
+            mean, jitter = config.latency_mean, config.latency_jitter
+
+            if config.latency_distribution == "uniform":
+                latency = self.random.uniform(mean - jitter, mean + jitter)
+            elif config.latency_distribution == "normal":
+                latency = self.random.gauss(mean, jitter)
+            elif config.latency_distribution == "lognormal" and mean > 0:
+                # Parameters of the underlying normal giving this mean and spread.
+                sigma2 = math.log1p((jitter / mean) ** 2)
+                latency = self.random.lognormvariate(
+                    math.log(mean) - sigma2 / 2, math.sqrt(sigma2)
+                )
+            elif config.latency_distribution == "exponential" and mean > 0:
+                latency = self.random.expovariate(1 / mean)
+            else:
+                latency = mean
+
+        if roll < config.rate_limit_rate:
+            outcome = "rate_limited"
+        elif roll < config.rate_limit_rate + config.server_error_rate:
+            outcome = "server_error"
+        elif (
+            roll
+            < config.rate_limit_rate + config.server_error_rate + config.malformed_rate
+        ):
+            outcome = "malformed"
+        else:
+            outcome = "ok"
+
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+        return outcome, max(latency, 0.0)
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        """Store a file and describe it like the files endpoint."""
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def create_batch(self, request: dict) -> dict:
+        """Queue a batch, answered in the background after ``batch_delay``."""
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": request.get("metadata"),
+        }
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(
+            target=self._run_batch, args=(batch,), name="mock-batch", daemon=True
+        ).start()
+        return batch
+
+    def _run_batch(self, batch: dict) -> None:
+        time.sleep(self.config.batch_delay)
+        with self._lock:
+            content = self.files.get(batch["input_file_id"])
+            cancelled = batch["status"] == "cancelling"
+        if content is None:
+            batch.update(status="failed", errors={"data": [{"message": "No file"}]})
+            return
+
+        outputs, errors = [], []
+        for line in content.decode("utf-8").splitlines():
+            if cancelled or not line.strip():
+                continue
+            request = json.loads(line)
+            outcome, _ = self.draw()
+            record = {
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": request["custom_id"],
+            }
+            if outcome in ("rate_limited", "server_error"):
+                status = 429 if outcome == "rate_limited" else 500
+                record["response"] = {
+                    "status_code": status,
+                    "request_id": uuid.uuid4().hex,
+                    "body": {"error": {"message": outcome, "type": outcome}},
+                }
+                record["error"] = None
+                errors.append(record)
+            else:
+                record["response"] = {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": completion(request["body"], outcome == "malformed"),
+                }
+                record["error"] = None
+                outputs.append(record)
+
+        def store(records: list[dict]) -> str | None:
+            if not records:
+                return None
+            content = "".join(json.dumps(record) + "\n" for record in records)
+            return self.add_file(
+                content.encode("utf-8"), "output.jsonl", "batch_output"
+            )["id"]
+
+        batch.update(
+            status="cancelled" if cancelled else "completed",
+            output_file_id=store(outputs),
+            error_file_id=store(errors),
+            completed_at=int(time.time()),
+            request_counts={
+                "total": len(outputs) + len(errors),
+                "completed": len(outputs),
+                "failed": len(errors),
+            },
+        )
+
+
+def classify(text: str, categories: list[str], details: bool = True) -> dict:
+    """Build a deterministic classification of a text.
+
+    Args:
+        text (str): The text to classify.
+        categories (list[str]): The category names offered in the prompt.
+        details (bool): Whether to add the explanation, keywords and ambiguities.
+
+    Returns:
+        dict: A result with the fields of ``AnalysisSchema``.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    category = categories[digest[0] % len(categories)] if categories else "Undetermined"
+    result = {"category": category, "confidence": round(0.5 + digest[1] / 510, 3)}
+    if details:
+        result.update(
+            explanation=f"Mock classification as {category}",
+            keywords=text.split()[:3],
+            ambiguities=[],
+        )
+    return result
+
+
+def completion(request: dict, malformed: bool = False) -> dict:
+    """Build the chat completion answering a request.
+
+    Args:
+        request (dict): The body of the chat completion request.
+        malformed (bool): Whether to cut the content short, so it is not valid JSON.
+
+    Returns:
+        dict: The chat completion.
+    """
+    messages = request.get("messages", [])
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    categories = [
+        name.strip()
+        for name in CATEGORY_PATTERN.findall(system)
+        if name.strip() != "Undetermined"
+    ]
+
+    # Label-only prompts do not ask for the details.
+    details = '"explanation"' in system
+    packed = PACKED_TEXT_PATTERN.findall(user)
+    keys = TARGET_KEYS_PATTERN.search(system)
+    if keys:
+        taxonomies = {
+            name: [
+                category.strip()
+                for category in CATEGORY_PATTERN.findall(lines)
+                if category.strip() != "Undetermined"
+            ]
+            for name, lines in TAXONOMY_PATTERN.findall(system)
+        }
+        fields = dict(FIELD_PATTERN.findall(user))
+        results = {}
+        for key in json.loads(keys.group(1)):
+            taxonomy, _, column = key.partition(" / ")
+            text = fields.get(column, user.removeprefix("Text to classify: "))
+            results[key] = classify(text, taxonomies.get(taxonomy, []), details)
+        content = json.dumps({"results": results})
+    elif packed:
+        content = json.dumps(
+            {
+                "results": [
+                    {**classify(text, categories, details), "index": int(index)}
+                    for index, text in packed
+                ]
+            }
+        )
+    else:
+        content = json.dumps(
+            classify(user.removeprefix("Text to classify: "), categories, details)
+        )
+
+    if malformed:
+        content = content[: len(content) // 2]
+
+    finish_reason = "stop"
+    max_tokens = request.get("max_tokens")
+    if max_tokens is not None and len(content) // 4 > max_tokens:
+        content = content[: max_tokens * 4]
+        finish_reason = "length"
+
+    prompt_tokens = (len(system) + len(user)) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-mock-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(
+        self, status: int, payload: dict, headers: dict | None = None
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.rstrip("/")
+
+        if path.endswith("/files"):
+            self._upload(body)
+            return
+        if path.endswith("/batches"):
+            self._send_json(200, self.server.create_batch(json.loads(body)))
+            return
+        if (match := BATCH_PATTERN.search(path)) and match.group(2):
+            batch = self.server.batches.get(match.group(1))
+            if batch is None:
+                self._send_json(404, {"error": {"message": "Unknown batch"}})
+                return
+            if batch["status"] == "in_progress":
+                batch["status"] = "cancelling"
+            self._send_json(200, batch)
+            return
+
+        if not path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        request = json.loads(body)
+        outcome, latency = self.server.draw()
+        time.sleep(latency)
+
+        if outcome == "rate_limited":
+            headers = {}
+            if self.server.config.retry_after_ms:
+                headers["retry-after-ms"] = str(self.server.config.retry_after_ms)
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                headers,
+            )
+            return
+
+        if outcome == "server_error":
+            self._send_json(
+                500, {"error": {"message": "Internal error", "type": "server_error"}}
+            )
+            return
+
+        self._send_json(200, completion(request, outcome == "malformed"))
+
+    def do_GET(self) -> None:
+        path = self.path.rstrip("/")
+
+        if match := FILE_CONTENT_PATTERN.search(path):
+            content = self.server.files.get(match.group(1))
+            if content is None:
+                self._send_json(404, {"error": {"message": "Unknown file"}})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        if (match := BATCH_PATTERN.search(path)) and not match.group(2):
+            batch = self.server.batches.get(match.group(1))
+            if batch is None:
+                self._send_json(404, {"error": {"message": "Unknown batch"}})
+            else:
+                self._send_json(200, batch)
+            return
+
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _upload(self, body: bytes) -> None:
+        # Multipart form data parses as a MIME message once given its headers.
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields, content, filename = {}, None, "upload.jsonl"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                content, filename = part.get_payload(decode=True), part.get_filename()
+            else:
+                fields[name] = part.get_content().strip()
+
+        if content is None:
+            self._send_json(400, {"error": {"message": "No file uploaded"}})
+            return
+        self._send_json(
+            200, self.server.add_file(content, filename, fields.get("purpose", "batch"))
+        )
+
+
+def start_mock_server(
+    config: MockConfig, host: str = "127.0.0.1", port: int = 0
+) -> MockServer:
+    """Start the mock server in a background thread.
+
+    Args:
+        config (MockConfig): The behaviour of the server.
+        host (str): The interface to listen on.
+        port (int): The port to listen on, or 0 for any free port.
+
+    Returns:
+        MockServer: The running server; call ``shutdown()`` to stop it.
+    """
+    server = MockServer((host, port), config)
+    threading.Thread(
+        target=server.serve_forever, name="mock-llm-server", daemon=True
+    ).start()
+    return server
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of ``MockConfig`` to a command-line parser."""
+    parser.add_argument(
+        "--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="constant"
+    )
+    parser.add_argument(
+        "--latency-mean", type=float, default=0.05, help="Mean latency in seconds"
+    )
+    parser.add_argument(
+        "--latency-jitter", type=float, default=0.0, help="Latency spread in seconds"
+    )
+    parser.add_argument(
+        "--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses"
+    )
+    parser.add_argument(
+        "--server-error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of 500 responses",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of completions that are not valid JSON",
+    )
+    parser.add_argument(
+        "--retry-after-ms",
+        type=int,
+        default=0,
+        help="The retry-after-ms header sent with 429s",
+    )
+    parser.add_argument(
+        "--batch-delay",
+        type=float,
+        default=1.0,
+        help="The time a batch takes to complete, in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def mock_config(args: argparse.Namespace) -> MockConfig:
+    """Build the mock configuration from parsed command-line arguments."""
+    return MockConfig(
+        latency_distribution=args.latency_distribution,
+        latency_mean=args.latency_mean,
+        latency_jitter=args.latency_jitter,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        malformed_rate=args.malformed_rate,
+        retry_after_ms=args.retry_after_ms,
+        batch_delay=args.batch_delay,
+        seed=args.seed,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the mock server until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.mock_server",
+        description="Serve mock chat completions for benchmarks.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockServer((args.host, args.port), mock_config(args))
+    # The benchmark runner reads this line to find the port.
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+"""Throughput benchmarks of ``TextClassifier`` against the local mock server.
+
+Each dataset size runs in a fresh process so its peak memory is measured on its
+own. Results are saved as JSON; ``compare`` prints the change between two runs.
+
+Example:
+    python -m benchmarks.run run --rows 1000 100000 --latency-mean 0.2 \\
+        --rate-limit-rate 0.02 --output benchmark.json
+    python -m benchmarks.run compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from array import array
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import httpx
+import numpy as np
+from src.classification import TextClassifier
+from src.core.cache import ResultCache
+from src.core.client import create_client
+from src.core.config import settings
+from src.core.scheduler import AdaptiveScheduler
+
+from benchmarks.mock_server import add_mock_arguments, mock_config
+
+logger = logging.getLogger("benchmarks.run")
+
+CATEGORIES = {
+    "Billing": "Invoices, charges, refunds and payment methods",
+    "Technical Issue": "Bugs, crashes, errors and things that do not work",
+    "Account": "Login, passwords, profile and account settings",
+    "Feature Request": "Suggestions for new features or improvements",
+    "Praise": "Positive feedback about the product or the service",
+}
+
+VOCABULARY = [
+    "invoice",
+    "charge",
+    "refund",
+    "payment",
+    "card",
+    "crash",
+    "error",
+    "bug",
+    "slow",
+    "login",
+    "password",
+    "profile",
+    "email",
+    "feature",
+    "request",
+    "suggestion",
+    "great",
+    "thanks",
+    "love",
+    "support",
+    "app",
+    "screen",
+    "button",
+    "update",
+    "order",
+    "delivery",
+    "price",
+    "plan",
+    "subscription",
+    "cancel",
+    "help",
+]
+
+
+def synthetic_texts(
+    rows: int, chunksize: int, duplicate_ratio: float, seed: int
+) -> Iterator[list[str]]:
+    """Generate random support-ticket-like texts, one chunk at a time.
+
+    Args:
+        rows (int): The total number of texts.
+        chunksize (int): The number of texts per chunk.
+        duplicate_ratio (float): The fraction of texts repeating an earlier text of
+            the same chunk.
+        seed (int): Seeds the generator, so runs see the same data.
+
+    Yields:
+        list[str]: The texts of each chunk.
+    """
+    rng = random.Random(seed)
+    for start in range(0, rows, chunksize):
+        chunk: list[str] = []
+        for i in range(start, min(start + chunksize, rows)):
+            if chunk and rng.random() < duplicate_ratio:
+                chunk.append(rng.choice(chunk))
+            else:
+                words = rng.choices(VOCABULARY, k=rng.randint(5, 40))
+                chunk.append(f"#{i} " + " ".join(words))
+        yield chunk
+
+
+class RequestRecorder:
+    """Record the latency and status of every HTTP request made by the client."""
+
+    def __init__(self):
+        self.latencies = array("d")
+        self.statuses: dict[int, int] = {}
+
+    async def on_request(self, request: httpx.Request) -> None:
+        request.extensions["benchmark_start"] = time.perf_counter()
+
+    async def on_response(self, response: httpx.Response) -> None:
+        start = response.request.extensions.get("benchmark_start")
+        if start is not None:
+            self.latencies.append(time.perf_counter() - start)
+        self.statuses[response.status_code] = (
+            self.statuses.get(response.status_code, 0) + 1
+        )
+
+    def percentiles(self) -> dict[str, float | None]:
+        """Summarise the request latencies, in milliseconds."""
+        if not self.latencies:
+            return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+
+        latencies = np.frombuffer(self.latencies, dtype=np.float64) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "mean": float(latencies.mean()),
+            "max": float(latencies.max()),
+        }
+
+
+def peak_rss_mb() -> float:
+    """The peak resident memory of this process, in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+async def run_scenario(base_url: str, rows: int, options: dict) -> dict:
+    """Classify a synthetic dataset and measure the run.
+
+    Args:
+        base_url (str): The base URL of the mock server.
+        rows (int): The number of rows to classify.
+        options (dict): The benchmark options, as parsed from the command line.
+
+    Returns:
+        dict: The measurements of the run.
+    """
+    recorder = RequestRecorder()
+    scheduler = AdaptiveScheduler(
+        max_concurrency=options["max_concurrency"],
+        initial_concurrency=options["initial_concurrency"],
+        max_retries=options["max_retries"],
+        backoff_base=options["backoff_base"],
+    )
+
+    with TemporaryDirectory(prefix="benchmark-") as tmp_dir:
+        # Runs have a process of their own; keep their lexical model out of the tree.
+        settings.LEXICAL_DIR = str(Path(tmp_dir) / "lexical")
+        cache = (
+            ResultCache(Path(tmp_dir) / "cache.sqlite3") if options["cache"] else None
+        )
+        client = create_client(
+            base_url=base_url,
+            api_key="benchmark",
+            event_hooks={
+                "request": [recorder.on_request],
+                "response": [recorder.on_response],
+            },
+        )
+        classifier = TextClassifier(
+            model=options["model"], cache=cache, scheduler=scheduler, client=client
+        )
+        classifier.set_categories(CATEGORIES)
+
+        totals: dict[str, int] = {}
+        start = time.perf_counter()
+        for texts in synthetic_texts(
+            rows, options["chunksize"], options["duplicate_ratio"], options["seed"]
+        ):
+            await classifier.batch_classify(texts, pack_size=options["pack_size"])
+            for name, value in classifier.last_run_stats.items():
+                totals[name] = totals.get(name, 0) + value
+        elapsed = time.perf_counter() - start
+
+        await classifier.client.close()
+        if cache is not None:
+            cache.close()
+
+    requests = sum(recorder.statuses.values())
+    failed_requests = sum(
+        count for status, count in recorder.statuses.items() if status >= 400
+    )
+    return {
+        "rows": rows,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else None,
+        "requests": requests,
+        "request_statuses": {str(k): v for k, v in sorted(recorder.statuses.items())},
+        "request_error_rate": failed_requests / requests if requests else 0.0,
+        "latency_ms": recorder.percentiles(),
+        "error_rate": totals.get("Errors", 0) / rows if rows else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "classifier": totals,
+        "scheduler": scheduler.stats(),
+        "telemetry": classifier.metrics.to_dict(),
+    }
+
+
+def _run_in_process(base_url: str, rows: int, options: dict) -> dict:
+    logging.basicConfig(level=logging.ERROR)
+    return asyncio.run(run_scenario(base_url, rows, options))
+
+
+def git_revision() -> str | None:
+    """The current commit of the working tree, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    """Run the ``run`` command.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: The process exit code.
+    """
+    mock_args = [
+        "--port",
+        "0",
+        "--latency-distribution",
+        args.latency_distribution,
+        "--latency-mean",
+        str(args.latency_mean),
+        "--latency-jitter",
+        str(args.latency_jitter),
+        "--rate-limit-rate",
+        str(args.rate_limit_rate),
+        "--server-error-rate",
+        str(args.server_error_rate),
+        "--malformed-rate",
+        str(args.malformed_rate),
+        "--retry-after-ms",
+        str(args.retry_after_ms),
+    ]
+    if args.seed is not None:
+        mock_args += ["--seed", str(args.seed)]
+
+    options = {
+        "model": args.model,
+        "chunksize": args.chunksize,
+        "pack_size": args.pack_size,
+        "duplicate_ratio": args.duplicate_ratio,
+        "cache": args.cache,
+        "max_concurrency": args.max_concurrency,
+        "initial_concurrency": args.initial_concurrency,
+        "max_retries": args.max_retries,
+        "backoff_base": args.backoff_base,
+        "seed": args.seed if args.seed is not None else 0,
+    }
+
+    # The server runs in its own process so it neither competes for the GIL nor
+    # counts towards the memory of the classifier.
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_server", *mock_args],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        base_url = server.stdout.readline().strip()
+        if not base_url:
+            logger.error("The mock server did not start")
+            return 1
+        logger.info("Mock server listening on %s", base_url)
+
+        results = []
+        for rows in args.rows:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                result = pool.submit(_run_in_process, base_url, rows, options).result()
+
+            latency = result["latency_ms"]
+            logger.info(
+                "%d rows: %.1f rows/s, p50 %.0f ms, p95 %.0f ms, p99 %.0f ms, "
+                "peak RSS %.0f MB, %.2f%% row errors, %.2f%% request errors",
+                rows,
+                result["rows_per_second"] or 0.0,
+                latency["p50"] or 0.0,
+                latency["p95"] or 0.0,
+                latency["p99"] or 0.0,
+                result["peak_rss_mb"],
+                100 * result["error_rate"],
+                100 * result["request_error_rate"],
+            )
+            results.append(result)
+
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": vars(mock_config(args)),
+        "options": options,
+        "results": results,
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    logger.info("Results written to %s", output)
+    return 0
+
+
+def run_compare(args: argparse.Namespace) -> int:
+    """Run the ``compare`` command.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: The process exit code.
+    """
+    reports = [json.loads(Path(path).read_text()) for path in (args.old, args.new)]
+    old, new = ({r["rows"]: r for r in report["results"]} for report in reports)
+
+    metrics = {
+        "rows/s": lambda r: r["rows_per_second"],
+        "p50 ms": lambda r: r["latency_ms"]["p50"],
+        "p95 ms": lambda r: r["latency_ms"]["p95"],
+        "p99 ms": lambda r: r["latency_ms"]["p99"],
+        "peak RSS MB": lambda r: r["peak_rss_mb"],
+        "error rate": lambda r: r["error_rate"],
+    }
+
+    print(f"{reports[0]['git_revision']} -> {reports[1]['git_revision']}")
+    for rows in sorted(old.keys() & new.keys()):
+        print(f"{rows} rows")
+        for name, metric in metrics.items():
+            before, after = metric(old[rows]), metric(new[rows])
+            if before is None or after is None:
+                continue
+            change = f"{100 * (after - before) / before:+.1f}%" if before else "n/a"
+            print(f"  {name:<12} {before:>12.3f} {after:>12.3f} {change:>9}")
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the classifier against a local mock server.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmark")
+    run.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000],
+        help="The dataset sizes to benchmark, e.g. 1000 100000 1000000",
+    )
+    run.add_argument(
+        "--chunksize", type=int, default=10_000, help="The number of rows per batch"
+    )
+    run.add_argument("--pack-size", type=int, default=1)
+    run.add_argument(
+        "--duplicate-ratio",
+        type=float,
+        default=0.0,
+        help="The fraction of rows repeating an earlier row",
+    )
+    run.add_argument(
+        "--cache", action="store_true", help="Use a fresh result cache for each run"
+    )
+    run.add_argument("--model", default="mock-model")
+    run.add_argument("--max-concurrency", type=int, default=64)
+    run.add_argument("--initial-concurrency", type=int, default=5)
+    run.add_argument("--max-retries", type=int, default=5)
+    run.add_argument("--backoff-base", type=float, default=0.5)
+    add_mock_arguments(run)
+    run.add_argument(
+        "-o",
+        "--output",
+        default=f"benchmarks/results/{time.strftime('%Y%m%d-%H%M%S')}.json",
+        help="Where to save the results",
+    )
+    run.set_defaults(func=run_benchmark)
+
+    compare = commands.add_parser("compare", help="Compare two saved runs")
+    compare.add_argument("old", help="The baseline results")
+    compare.add_argument("new", help="The results to compare with the baseline")
+    compare.set_defaults(func=run_compare)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark command-line interface."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+import openai
+from openai.types import Batch
+
+from src.classification import TextClassifier
+from src.core.cache import ResultCache
+from src.core.checkpoint import Checkpoint
+from src.core.config import settings
+from src.core.scheduler import RETRYABLE_ERRORS
+from src.schemas.analysis_schema import AnalysisSchema
+
+logger = logging.getLogger(__name__)
+
+# Batch statuses after which nothing more will be answered.
+FINISHED_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchClassifier:
+    """Classify texts offline with the Batch API, at its lower price per token.
+
+    The requests ``TextClassifier.classify_text`` would send are written to JSONL
+    files within the size limits of a batch, uploaded and submitted, then polled
+    until they finish. Answers are matched to their texts by custom ID and parsed
+    like online answers; texts whose request failed or whose answer could not be
+    parsed are submitted again, on their own, up to ``max_attempts`` times. With a
+    checkpoint, the IDs of the batches in flight are saved in ``directory``, so a
+    run interrupted while waiting collects the same batches instead of paying for
+    them twice.
+    """
+
+    def __init__(
+        self,
+        classifier: TextClassifier,
+        directory: str | Path | None = None,
+        max_requests: int = 50_000,
+        max_bytes: int = 190_000_000,
+        completion_window: str = "24h",
+        poll_interval: float = 60.0,
+        max_attempts: int = 3,
+        max_wait: float = 26 * 3600,
+    ):
+        self.classifier = classifier
+        self.directory = Path(directory or settings.BATCH_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.last_run_stats = {}
+
+    @classmethod
+    def from_settings(cls, classifier: TextClassifier) -> "BatchClassifier":
+        """Build a batch classifier configured by the application settings.
+
+        Args:
+            classifier (TextClassifier): The classifier whose prompts are sent.
+
+        Returns:
+            BatchClassifier: The batch classifier.
+        """
+        return cls(
+            classifier,
+            directory=settings.BATCH_DIR,
+            max_requests=settings.BATCH_MAX_REQUESTS,
+            max_bytes=settings.BATCH_MAX_FILE_BYTES,
+            completion_window=settings.BATCH_COMPLETION_WINDOW,
+            poll_interval=settings.BATCH_POLL_INTERVAL,
+            max_attempts=settings.BATCH_MAX_ATTEMPTS,
+            max_wait=settings.BATCH_MAX_WAIT_HOURS * 3600,
+        )
+
+    def write_shards(self, requests: dict[str, str], name: str) -> list[Path]:
+        """Write the requests classifying texts to JSONL files, one per batch.
+
+        Args:
+            requests (dict[str, str]): The texts to classify, by custom ID.
+            name (str): The prefix of the file names.
+
+        Returns:
+            list[Path]: The files, each within ``max_requests`` lines and
+                ``max_bytes`` bytes.
+        """
+        _, max_tokens = self.classifier.completion_budget(1)
+        paths: list[Path] = []
+        lines: list[bytes] = []
+        size = 0
+
+        def flush() -> None:
+            path = self.directory / f"{name}-{len(paths):04d}.jsonl"
+            path.write_bytes(b"".join(lines))
+            paths.append(path)
+
+        for custom_id, text in requests.items():
+            line = (
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": self.classifier.request_body(
+                            self.classifier.text_messages(text), max_tokens=max_tokens
+                        ),
+                    }
+                )
+                + "\n"
+            ).encode("utf-8")
+            if lines and (
+                len(lines) >= self.max_requests or size + len(line) > self.max_bytes
+            ):
+                flush()
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+
+        if lines:
+            flush()
+        return paths
+
+    async def submit(self, path: Path) -> str:
+        """Upload a file of requests and start a batch answering it.
+
+        Args:
+            path (Path): The file, as written by ``write_shards``.
+
+        Returns:
+            str: The ID of the batch.
+        """
+        client = self.classifier.client
+        uploaded = await client.files.create(file=path, purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+            metadata={"file": path.name},
+        )
+        logger.info("Submitted %s as batch %s", path.name, batch.id)
+        return batch.id
+
+    async def wait(
+        self, batch_id: str, on_poll: Callable[[Batch], None] | None = None
+    ) -> Batch | None:
+        """Poll a batch until it finishes.
+
+        Transient errors while polling (timeouts, connection and server errors,
+        throttling) are logged and the batch is polled again later.
+
+        Args:
+            batch_id (str): The ID of the batch.
+            on_poll (callable, optional): Called with the batch after each poll.
+
+        Returns:
+            Batch | None: The finished batch, or None if it does not exist.
+
+        Raises:
+            TimeoutError: If the batch is still running after ``max_wait`` seconds.
+            openai.APIError: Any other error, e.g. an invalid API key.
+        """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            try:
+                batch = await self.classifier.client.batches.retrieve(batch_id)
+            except openai.NotFoundError:
+                logger.warning("Batch %s no longer exists", batch_id)
+                return None
+            except RETRYABLE_ERRORS as e:
+                logger.warning("Could not check batch %s: %s", batch_id, e)
+            else:
+                if on_poll is not None:
+                    on_poll(batch)
+                if batch.status in FINISHED_STATUSES:
+                    return batch
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Batch {batch_id} did not finish within {self.max_wait:.0f}s"
+                )
+            await asyncio.sleep(self.poll_interval)
+
+    async def download(self, batch: Batch) -> dict[str, AnalysisSchema]:
+        """Read the answers of a finished batch.
+
+        Expired and cancelled batches still answer part of their requests.
+
+        Args:
+            batch (Batch): The finished batch.
+
+        Returns:
+            dict[str, AnalysisSchema]: The results by custom ID, error results for
+                failed requests and unparseable answers. Requests the batch did not
+                get to are missing.
+        """
+        if batch.status != "completed":
+            logger.warning("Batch %s finished as %s", batch.id, batch.status)
+
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id is None:
+                continue
+            content = await self.classifier.client.files.content(file_id)
+            for line in content.text.splitlines():
+                try:
+                    record = json.loads(line)
+                    results[record["custom_id"]] = self.parse_record(record)
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return results
+
+    def parse_record(self, record: dict) -> AnalysisSchema:
+        """Parse a line of the output or error file of a batch.
+
+        Requests, tokens and failures are counted in the classifier's metrics.
+
+        Args:
+            record (dict): The line, with the custom ID and the response.
+
+        Returns:
+            AnalysisSchema: The result, or an error result.
+        """
+        classifier = self.classifier
+        metrics = classifier.metrics
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        metrics.count("requests")
+        metrics.count_model(classifier.model, requests=1)
+
+        if response.get("status_code") != 200:
+            metrics.count("failed_requests")
+            error = record.get("error") or body.get("error") or {}
+            return classifier.error_result(
+                error.get("message") or f"status {response.get('status_code')}"
+            )
+
+        usage = body.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        metrics.count("prompt_tokens", prompt_tokens)
+        metrics.count("completion_tokens", completion_tokens)
+        metrics.count_model(
+            classifier.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+        try:
+            content = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            return classifier.error_result("no completion in the batch output")
+        return classifier.parse_result(content)
+
+    @staticmethod
+    def _load_manifest(path: Path | None) -> list[str]:
+        if path is None or not path.exists():
+            return []
+        try:
+            return json.loads(path.read_text())["batches"]
+        except (ValueError, KeyError, TypeError):
+            return []
+
+    @staticmethod
+    def _save_manifest(path: Path | None, batch_ids: list[str]) -> None:
+        if path is None:
+            return
+        if batch_ids:
+            path.write_text(json.dumps({"batches": batch_ids}))
+        else:
+            path.unlink(missing_ok=True)
+
+    async def classify(
+        self,
+        texts: list[str],
+        progress_callback: Callable | None = None,
+        checkpoint: Checkpoint | None = None,
+        row_ids: list[int] | None = None,
+    ) -> list[AnalysisSchema]:
+        """Classify texts with batches, returning once every batch has finished.
+
+        Identical texts are only sent once, and texts already present in the result
+        cache are not sent. Request telemetry and the time spent are added to the
+        classifier's metrics.
+
+        Args:
+            texts (list[str]): The texts to classify.
+            progress_callback (callable, optional): A callback function to report
+                progress.
+            checkpoint (Checkpoint, optional): Where completed rows are saved. Rows
+                already saved in it are not classified again, and batches submitted
+                by an interrupted run with the same run ID are collected.
+            row_ids (list[int], optional): The IDs of the rows in the checkpoint.
+                Defaults to their position in ``texts``.
+
+        Returns:
+            list[AnalysisSchema]: The classification result of each text.
+        """
+        start_time = time.perf_counter()
+        classifier = self.classifier
+        total = len(texts)
+        results: list[AnalysisSchema | None] = [None] * total
+
+        if row_ids is None:
+            row_ids = list(range(total))
+        saved = checkpoint.take(row_ids) if checkpoint is not None else {}
+
+        pending: dict[str, list[int]] = {}
+        for i, text in enumerate(texts):
+            if row_ids[i] in saved:
+                results[i] = saved[row_ids[i]]
+            elif classifier.is_empty(text):
+                results[i] = classifier.empty_result()
+            else:
+                pending.setdefault(str(text), []).append(i)
+
+        completed = 0
+        in_flight: dict[str, int] = {}
+
+        def report(count: int = 0) -> None:
+            nonlocal completed
+            completed += count
+            if progress_callback and total:
+                progress_callback(min((completed + sum(in_flight.values())) / total, 1))
+
+        empty = total - len(saved) - sum(len(indices) for indices in pending.values())
+        report(len(saved) + empty)
+
+        def assign(indices: list[int], result: AnalysisSchema) -> None:
+            for i in indices:
+                results[i] = result
+            if checkpoint is not None:
+                checkpoint.append([row_ids[i] for i in indices], result)
+            report(len(indices))
+
+        keys = {}
+        cache_hits = 0
+        if classifier.cache is not None and pending:
+            categories_info = classifier.render_categories()
+            keys = {
+                text: ResultCache.make_key(classifier.signature, categories_info, text)
+                for text in pending
+            }
+            cached = await asyncio.to_thread(
+                classifier.cache.get_many, list(keys.values())
+            )
+            for text in list(pending):
+                result = cached.get(keys[text])
+                if result is not None:
+                    indices = pending.pop(text)
+                    cache_hits += len(indices)
+                    assign(indices, result.model_copy(update={"stage": "cache"}))
+
+        # Requests are named after the first row of their text, so that a rerun
+        # names them alike and can match the answers of batches it did not submit.
+        requests = {
+            f"row-{row_ids[indices[0]]}": text for text, indices in pending.items()
+        }
+        failures: dict[str, AnalysisSchema] = {}
+
+        async def collect(batch_id: str) -> None:
+            def on_poll(batch: Batch) -> None:
+                if batch.request_counts is not None:
+                    in_flight[batch_id] = batch.request_counts.completed
+                    report()
+
+            batch = await self.wait(batch_id, on_poll)
+            answers = await self.download(batch) if batch is not None else {}
+            in_flight.pop(batch_id, None)
+            to_cache = []
+            for custom_id, result in answers.items():
+                if custom_id not in requests:
+                    continue
+                if result.category == "Error":
+                    failures[custom_id] = result
+                    continue
+                text = requests.pop(custom_id)
+                failures.pop(custom_id, None)
+                if classifier.cache is not None:
+                    to_cache.append((keys[text], result))
+                assign(pending[text], result)
+            if to_cache:
+                await asyncio.to_thread(classifier.cache.set_many, to_cache)
+
+        manifest = (
+            self.directory / f"{checkpoint.run_id}.batches.json"
+            if checkpoint is not None
+            else None
+        )
+        prefix = checkpoint.run_id if checkpoint is not None else uuid.uuid4().hex[:16]
+        batch_ids = self._load_manifest(manifest)
+        if batch_ids:
+            logger.info("Collecting %d batches of a previous run", len(batch_ids))
+
+        batches = 0
+        resubmitted = 0
+        attempt = 0
+        while True:
+            if not batch_ids:
+                if not requests or attempt >= self.max_attempts:
+                    break
+                if attempt:
+                    logger.info("Resubmitting %d failed requests", len(requests))
+                    resubmitted += len(requests)
+                    classifier.metrics.count("retries", len(requests))
+                attempt += 1
+                paths = await asyncio.to_thread(
+                    self.write_shards, requests, f"{prefix}-{attempt}"
+                )
+                for path in paths:
+                    batch_ids.append(await self.submit(path))
+                    self._save_manifest(manifest, batch_ids)
+                    path.unlink()
+                batches += len(paths)
+
+            await asyncio.gather(*[collect(batch_id) for batch_id in batch_ids])
+            batch_ids = []
+            self._save_manifest(manifest, batch_ids)
+
+        errors = 0
+        for custom_id, text in requests.items():
+            result = failures.get(custom_id) or classifier.error_result(
+                "no answer in the batch output"
+            )
+            errors += len(pending[text])
+            for i in pending[text]:
+                results[i] = result
+            report(len(pending[text]))
+
+        self.last_run_stats = {
+            "Rows": total,
+            "Batches": batches,
+            "Requests": len(pending),
+            "Resubmitted": resubmitted,
+            "Duplicates": total - len(saved) - empty - cache_hits - len(pending),
+            "Cache hits": cache_hits,
+            "Empty": empty,
+            "Resumed": len(saved),
+            "Errors": errors,
+        }
+        classifier.metrics.count_model(
+            classifier.model,
+            texts=len(pending),
+            answered=len(pending) - len(requests),
+        )
+        classifier.metrics.count("rows", total)
+        classifier.metrics.add_stage("classify", time.perf_counter() - start_time)
+
+        return results
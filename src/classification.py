@@ -1,23 +1,106 @@
 import asyncio
 import json
+import logging
+import time
 from collections.abc import Callable
 
 import pandas as pd
-import streamlit as st
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from pydantic import ValidationError
 
+from src.core.cache import ResultCache
+from src.core.cascade import EscalationRule
+from src.core.checkpoint import Checkpoint
+from src.core.client import create_client
 from src.core.config import settings
-from src.schemas.analysis_schema import AnalysisSchema
+from src.core.scheduler import AdaptiveScheduler
+from src.core.telemetry import RunMetrics
+from src.lexical import LexicalClassifier
+from src.near_duplicates import NearDuplicateClusterer
+from src.schemas.analysis_schema import (
+    AnalysisSchema,
+    DetailsSchema,
+    PackedAnalysisSchema,
+    PackedDetailsSchema,
+)
+from src.utils.tokens import (
+    CHARS_PER_TOKEN,
+    estimate_tokens,
+    split_text,
+    truncate_head_tail,
+)
+
+logger = logging.getLogger(__name__)
+
+LABEL_FIELDS = """- "category" (string): The selected category name
+        - "confidence" (float): A number between 0 and 1 indicating your confidence"""
+
+DETAIL_FIELDS = """- "explanation" (string): A brief explanation of why this category was chosen
+        - "keywords" (list[string]): A list of keywords explaining your decision
+        - "ambiguities" (list[dict[string, string]]): If the text seems to fit multiple categories, list them here. It should be a list of objects, each containing a category name and an explanation."""
+
+RESPONSE_FIELDS = f"""{LABEL_FIELDS}
+        {DETAIL_FIELDS}"""
+
+# The details left out of label-only results until they are explained.
+PENDING_DETAILS = {
+    "explanation": None,
+    "keywords": None,
+    "ambiguities": None,
+    "explained": False,
+}
+
+COMPLETION_TOKENS_PER_TEXT = 150
+
+# How texts over the token budget of ``use_long_texts`` are handled.
+LONG_TEXT_STRATEGIES = ("truncate", "chunk")
+
+
+def render_category_set(descriptions: dict[str, str]) -> str:
+    """Render a category set as it is sent to the model.
+
+    Args:
+        descriptions (dict[str, str]): The category names and descriptions.
+
+    Returns:
+        str: One line per category with its description, and "Undetermined".
+    """
+    categories_info = "\n".join(
+        [f"- {cat}: {description}" for cat, description in descriptions.items()]
+    )
+
+    categories_info += (
+        "\n- Undetermined: The text doesn't clearly fit any of the defined categories."
+    )
+
+    return categories_info
 
 
 class TextClassifier:
-    def __init__(self, model: str = "openai/gpt-4o-mini"):
-        self.client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY, base_url=settings.LITE_LLM_BASE_URL
-        )
+    def __init__(
+        self,
+        model: str = "openai/gpt-4o-mini",
+        cache: ResultCache | None = None,
+        scheduler: AdaptiveScheduler | None = None,
+        client: AsyncOpenAI | None = None,
+    ):
+        self.client = client or create_client()
         self.model = model
+        self.cache = cache
+        self.scheduler = scheduler or AdaptiveScheduler.from_settings()
         self.categories = []
         self.category_descriptions = {}
+        self.lexical_threshold = None
+        self.lexical_training = settings.LEXICAL_TRAIN
+        self.label_only = False
+        self.max_text_tokens: int | None = None
+        self.long_text_strategy = "truncate"
+        self.near_duplicates: NearDuplicateClusterer | None = None
+        self.cascade: list[str] = []
+        self.escalation = EscalationRule()
+        self.last_run_stats = {}
+        self.metrics = RunMetrics()
 
     def set_categories(self, categories_dict: dict[str, str]) -> None:
         """Set the classification categories with descriptions.
@@ -28,33 +111,336 @@ class TextClassifier:
         self.categories = list(categories_dict.keys())
         self.category_descriptions = categories_dict
 
-    async def classify_text(self, text: str) -> AnalysisSchema:
+    def use_lexical(self, threshold: float | None) -> None:
+        """Answer rows locally when the lexical model is confident enough.
+
+        The model is trained on confident results while the stage is on, or
+        always with ``settings.LEXICAL_TRAIN``.
+
+        Args:
+            threshold (float | None): The minimum confidence of the lexical model for
+                a row to skip the LLM, or None to send every row to the LLM.
+        """
+        self.lexical_threshold = threshold
+        self.lexical_training = threshold is not None or settings.LEXICAL_TRAIN
+
+    def use_near_duplicates(self, threshold: float | None) -> None:
+        """Only send one text per cluster of near-duplicates to the model.
+
+        The other texts of a cluster get the result of its representative, with
+        the stage "near-duplicate" and the cluster ID.
+
+        Args:
+            threshold (float | None): The minimum estimated Jaccard similarity of
+                the word bigrams of a text and its representative, or None to send
+                every distinct text to the model.
+        """
+        self.near_duplicates = (
+            None
+            if threshold is None
+            else NearDuplicateClusterer(
+                threshold, permutations=settings.NEAR_DUPLICATE_PERMUTATIONS
+            )
+        )
+
+    def use_label_only(self, enabled: bool) -> None:
+        """Request only the category and confidence of each text.
+
+        Completions are capped at ``settings.LABEL_ONLY_MAX_TOKENS`` per text, and
+        the explanation, keywords and ambiguities are left to ``explain``.
+
+        Args:
+            enabled (bool): Whether to leave the details out.
+        """
+        self.label_only = enabled
+
+    def use_long_texts(
+        self, max_tokens: int | None, strategy: str = "truncate"
+    ) -> None:
+        """Bound the estimated tokens of the texts sent to the model.
+
+        With the "truncate" strategy, longer texts are cut down to their beginning
+        and end. With "chunk", they are split into chunks classified concurrently,
+        whose results are combined by ``combine_chunk_results``; texts are still
+        truncated where chunks cannot be used, i.e. in batches and explanations.
+
+        Args:
+            max_tokens (int | None): The estimated token budget of a text, or None
+                to send texts whole.
+            strategy (str): "truncate" or "chunk".
+
+        Raises:
+            ValueError: If the strategy is unknown.
+        """
+        if strategy not in LONG_TEXT_STRATEGIES:
+            raise ValueError(
+                f"Unknown long text strategy {strategy!r}, "
+                f"expected one of {', '.join(LONG_TEXT_STRATEGIES)}"
+            )
+        self.max_text_tokens = max_tokens
+        self.long_text_strategy = strategy
+
+    def use_cascade(
+        self, models: list[str], escalation: EscalationRule | None = None
+    ) -> None:
+        """Send rows to a cascade of models, escalating only uncertain results.
+
+        Args:
+            models (list[str]): The models, cheapest first, or an empty list to send
+                every row to ``self.model`` only.
+            escalation (EscalationRule, optional): When a result is sent on to the
+                next model. Defaults to the rule described by the settings.
+        """
+        self.cascade = list(models)
+        self.escalation = escalation or EscalationRule.from_settings()
+
+    @property
+    def models(self) -> list[str]:
+        """The models rows are sent to, in order."""
+        return self.cascade or [self.model]
+
+    @property
+    def signature(self) -> str:
+        """The models, escalation rule of a cascade and modes that determine the results.
+
+        Used in the keys of the result cache and of checkpoints.
+        """
+        if len(self.models) == 1:
+            signature = self.models[0]
+        else:
+            signature = f"{' > '.join(self.models)} ({self.escalation})"
+        if self.max_text_tokens is not None:
+            signature += f" [{self.long_text_strategy} over {self.max_text_tokens}]"
+        return f"{signature} [labels only]" if self.label_only else signature
+
+    def lexical_model(self) -> LexicalClassifier:
+        """Get the lexical model trained for the current category set."""
+        return LexicalClassifier.for_categories(self.render_categories())
+
+    def save_lexical(self) -> None:
+        """Persist what the lexical model learned, once at the end of a run."""
+        if self.lexical_training and self.categories:
+            self.lexical_model().save()
+
+    def learn_corrections(self, texts: list[str], categories: list[str]) -> None:
+        """Teach the lexical model the categories set by users.
+
+        Args:
+            texts (list[str]): The corrected texts.
+            categories (list[str]): The category chosen by the user for each text.
+        """
+        examples = [
+            (text, category)
+            for text, category in zip(texts, categories, strict=True)
+            if category in self.categories and not self.is_empty(text)
+        ]
+        if not examples:
+            return
+
+        lexical = self.lexical_model()
+        lexical.partial_fit(
+            [str(text) for text, _ in examples],
+            [category for _, category in examples],
+            weight=settings.LEXICAL_CORRECTION_WEIGHT,
+        )
+        lexical.save()
+
+    async def complete(
+        self,
+        messages: list[dict[str, str]],
+        model: str | None = None,
+        max_tokens: int | None = None,
+    ) -> ChatCompletion:
+        """Request a JSON chat completion from the model.
+
+        The body is posted as is: ``chat.completions.create`` first walks every
+        parameter against the SDK's type annotations, which costs milliseconds of CPU
+        per request with long prompts. Requests, tokens and latency are counted per
+        model in ``self.metrics``.
+
+        Args:
+            messages (list[dict[str, str]]): The conversation to complete.
+            model (str, optional): The model to use. Defaults to ``self.model``.
+            max_tokens (int, optional): The maximum number of completion tokens.
+
+        Returns:
+            ChatCompletion: The completion.
+        """
+        model = model or self.model
+        body = self.request_body(messages, model, max_tokens)
+
+        start = time.perf_counter()
+        usage = None
+        try:
+            response = await self.client.post(
+                "/chat/completions", body=body, cast_to=ChatCompletion
+            )
+            usage = response.usage
+            return response
+        finally:
+            self.metrics.count_model(
+                model,
+                requests=1,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0),
+                completion_tokens=getattr(usage, "completion_tokens", 0),
+                latency_seconds=time.perf_counter() - start,
+            )
+
+    def request_body(
+        self,
+        messages: list[dict[str, str]],
+        model: str | None = None,
+        max_tokens: int | None = None,
+    ) -> dict:
+        """Build the body of a chat completion request.
+
+        Args:
+            messages (list[dict[str, str]]): The conversation to complete.
+            model (str, optional): The model to use. Defaults to ``self.model``.
+            max_tokens (int, optional): The maximum number of completion tokens.
+
+        Returns:
+            dict: The request body, as posted to ``/chat/completions``.
+        """
+        body = {
+            "model": model or self.model,
+            "response_format": {"type": "json_object"},
+            "messages": messages,
+            "temperature": 0.1,
+        }
+        if max_tokens is not None:
+            body["max_tokens"] = max_tokens
+        return body
+
+    def render_categories(self) -> str:
+        """Render the category set as it is sent to the model.
+
+        Returns:
+            str: One line per category with its description.
+        """
+        return render_category_set(
+            {cat: self.category_descriptions[cat] for cat in self.categories}
+        )
+
+    def response_fields(self) -> str:
+        """Describe the fields the model answers with for each text."""
+        return LABEL_FIELDS if self.label_only else RESPONSE_FIELDS
+
+    def completion_budget(self, texts: int) -> tuple[int, int | None]:
+        """Size the completion of a request.
+
+        Args:
+            texts (int): The number of texts classified by the request.
+
+        Returns:
+            tuple[int, int | None]: The estimated completion tokens, used by the
+                scheduler, and the ``max_tokens`` cap, None outside label-only mode.
+        """
+        if not self.label_only:
+            return COMPLETION_TOKENS_PER_TEXT * texts, None
+        cap = settings.LABEL_ONLY_MAX_TOKENS * texts
+        return cap, cap
+
+    @staticmethod
+    def is_empty(text: str) -> bool:
+        """Check whether a cell value has nothing to classify."""
+        return not text or pd.isna(text)
+
+    def is_long(self, text: str) -> bool:
+        """Check whether a text exceeds the token budget of ``use_long_texts``."""
+        return (
+            self.max_text_tokens is not None
+            and estimate_tokens(text) > self.max_text_tokens
+        )
+
+    def fit_text(self, text: str) -> str:
+        """Truncate a text to the token budget of ``use_long_texts``, if any.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The text, with its middle cut out if it is long.
+        """
+        if not self.is_long(text):
+            return text
+        return truncate_head_tail(
+            text, self.max_text_tokens, settings.LONG_TEXT_HEAD_SHARE
+        )
+
+    @staticmethod
+    def empty_result() -> AnalysisSchema:
+        """Build the result returned for empty or missing texts."""
+        return AnalysisSchema(
+            category="Empty",
+            confidence=1.0,
+            keywords=[],
+            explanation="Empty or missing text",
+            ambiguities=[],
+        )
+
+    @staticmethod
+    def error_result(message: str) -> AnalysisSchema:
+        """Build the result returned when a text could not be classified."""
+        return AnalysisSchema(
+            category="Error",
+            confidence=0,
+            keywords=[],
+            explanation=f"Error during classification: {message}",
+            ambiguities=[],
+            stage="llm",
+        )
+
+    async def classify_text(
+        self, text: str, model: str | None = None
+    ) -> AnalysisSchema:
         """Classify a single text input using LLM asynchronously.
 
         Args:
             text (str): The text to classify.
-            with_explanation (bool): Whether to include an explanation in the response.
+            model (str, optional): The model to use. Defaults to ``self.model``.
 
         Returns:
             OpenAISchema: A dictionary containing the classification result.
         """
-        if not text or pd.isna(text):
-            return AnalysisSchema(
-                category="Empty",
-                confidence=1.0,
-                keywords=[],
-                explanation="Empty or missing text",
-                ambiguities=[],
+        if self.is_empty(text):
+            return self.empty_result()
+        if self.long_text_strategy == "chunk" and self.is_long(text):
+            return await self.classify_chunks(text, model)
+
+        messages = self.text_messages(text)
+        completion_tokens, max_tokens = self.completion_budget(1)
+
+        try:
+            response = await self.scheduler.run(
+                lambda: self.complete(messages, model, max_tokens),
+                estimated_tokens=estimate_tokens(
+                    messages[0]["content"] + messages[1]["content"]
+                )
+                + completion_tokens,
+                metrics=self.metrics,
             )
+        except Exception as e:
+            logger.warning("Classification error: %s", e)
+            return self.error_result(str(e))
+
+        return self.parse_result(response.choices[0].message.content, model)
+
+    def text_messages(self, text: str) -> list[dict[str, str]]:
+        """Build the conversation that classifies a single text.
+
+        Long texts are truncated, see ``use_long_texts``.
 
+        Args:
+            text (str): The non-empty text to classify.
+
+        Returns:
+            list[dict[str, str]]: The system and user messages.
+        """
         if not self.categories:
             raise ValueError("Categories must be set before classification")
 
-        categories_info = "\n".join(
-            [f"- {cat}: {self.category_descriptions[cat]}" for cat in self.categories]
-        )
-
-        categories_info += "\n- Undetermined: The text doesn't clearly fit any of the defined categories."
+        categories_info = self.render_categories()
 
         system_message = f"""You are a text classification system.
         Classify the provided text into ONE of the following categories:
@@ -63,81 +449,644 @@ class TextClassifier:
         If a text could fit multiple categories, select the MOST appropriate one.
 
         Respond in JSON format with these fields:
-        - "category" (string): The selected category name
-        - "confidence" (float): A number between 0 and 1 indicating your confidence
-        - "explanation" (string): A brief explanation of why this category was chosen
-        - "keywords" (list[string]): A list of keywords explaining your decision
-        - "ambiguities" (list[dict[string, string]]): If the text seems to fit multiple categories, list them here. It should be a list of objects, each containing a category name and an explanation.
+        {self.response_fields()}
         """
 
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"Text to classify: {self.fit_text(text)}"},
+        ]
+
+    def parse_result(
+        self, content: str | None, model: str | None = None
+    ) -> AnalysisSchema:
+        """Parse the answer to the conversation of ``text_messages``.
+
+        Args:
+            content (str | None): The content of the completion.
+            model (str, optional): The model that answered. Defaults to
+                ``self.model``.
+
+        Returns:
+            AnalysisSchema: The result, or an error result if the answer is not
+                valid.
+        """
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": f"Text to classify: {text}"},
-                ],
-                temperature=0.1,
+            return AnalysisSchema(
+                **{
+                    **json.loads(content),
+                    **(PENDING_DETAILS if self.label_only else {}),
+                    "stage": "llm",
+                    "model": model or self.model,
+                }
+            )
+        except (ValueError, TypeError) as e:
+            self.metrics.count("parse_failures")
+            logger.warning("Unparseable classification: %s", e)
+            return self.error_result(f"invalid response: {e!s}")
+
+    async def classify_chunks(
+        self, text: str, model: str | None = None
+    ) -> AnalysisSchema:
+        """Classify a long text chunk by chunk, combining the results.
+
+        Args:
+            text (str): The text, over the token budget of ``use_long_texts``.
+            model (str, optional): The model to use. Defaults to ``self.model``.
+
+        Returns:
+            AnalysisSchema: The combined result of the chunks.
+        """
+        chunks = split_text(text, self.max_text_tokens, settings.LONG_TEXT_MAX_CHUNKS)
+        results = await asyncio.gather(
+            *[self.classify_text(chunk, model) for chunk in chunks]
+        )
+        return self.combine_chunk_results(results)
+
+    @staticmethod
+    def combine_chunk_results(results: list[AnalysisSchema]) -> AnalysisSchema:
+        """Reduce the results of the chunks of a text to a single result.
+
+        Each chunk votes for its category with its confidence. The confidence of
+        the winner is the mean confidence of its chunks, scaled by its share of
+        the votes, so that chunks disagreeing lower it. The explanation comes from
+        the most confident chunk of the winner, the keywords from all of its
+        chunks, and the other categories voted for are listed as ambiguities.
+
+        Args:
+            results (list[AnalysisSchema]): The results of the chunks, in order.
+
+        Returns:
+            AnalysisSchema: The combined result, or the first error if every chunk
+                failed.
+        """
+        valid = [result for result in results if result.category != "Error"]
+        if not valid:
+            return results[0]
+
+        votes: dict[str, float] = {}
+        for result in valid:
+            votes[result.category] = votes.get(result.category, 0.0) + (
+                result.confidence or 0.0
+            )
+        total = sum(votes.values())
+        category = max(votes, key=votes.get)
+        winners = [result for result in valid if result.category == category]
+        best = max(winners, key=lambda result: result.confidence or 0.0)
+        confidence = votes[category] / len(winners)
+        if total:
+            confidence *= votes[category] / total
+
+        details = {}
+        if best.explained:
+            keywords = dict.fromkeys(
+                keyword for result in winners for keyword in result.keywords or []
             )
+            others = [
+                {
+                    "category": other,
+                    "explanation": f"Chosen by {sum(r.category == other for r in valid)} "
+                    f"of {len(results)} chunks",
+                }
+                for other in votes
+                if other != category
+            ]
+            details = {
+                "explanation": f"{len(winners)} of {len(results)} chunks: "
+                f"{best.explanation}",
+                "keywords": list(keywords),
+                "ambiguities": (best.ambiguities or []) + others,
+            }
 
-            result = AnalysisSchema(**json.loads(response.choices[0].message.content))
-            return result
+        return best.model_copy(update={"confidence": round(confidence, 3), **details})
 
+    async def classify_pack(
+        self, texts: list[str], model: str | None = None
+    ) -> dict[int, AnalysisSchema]:
+        """Classify several texts with a single chat completion.
+
+        Each text is sent with its position in the pack, and the model answers with
+        one result per position. Results that are missing, duplicated or invalid are
+        left out so the caller can classify those texts on their own.
+
+        Args:
+            texts (list[str]): The non-empty texts to classify together.
+            model (str, optional): The model to use. Defaults to ``self.model``.
+
+        Returns:
+            dict[int, AnalysisSchema]: The valid results, keyed by position in the pack.
+        """
+        if not self.categories:
+            raise ValueError("Categories must be set before classification")
+
+        categories_info = self.render_categories()
+
+        system_message = f"""You are a text classification system.
+        You will receive {len(texts)} texts, each prefixed with its index in square brackets.
+        Classify EACH text into ONE of the following categories:
+        {categories_info}
+
+        If a text could fit multiple categories, select the MOST appropriate one.
+
+        Respond in JSON format with a single field "results": a list containing exactly one object per text, with these fields:
+        - "index" (integer): The index of the text, as given in square brackets
+        {self.response_fields()}
+        """
+
+        texts_info = "\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"Texts to classify:\n{texts_info}"},
+        ]
+        completion_tokens, max_tokens = self.completion_budget(len(texts))
+
+        try:
+            response = await self.scheduler.run(
+                lambda: self.complete(messages, model, max_tokens),
+                estimated_tokens=estimate_tokens(system_message + texts_info)
+                + completion_tokens,
+                metrics=self.metrics,
+            )
         except Exception as e:
-            error_msg = f"Classification error: {e!s}"
-            st.error(error_msg)
-            return AnalysisSchema(
-                category="Error",
-                confidence=0,
-                keywords=[],
-                explanation=f"Error during classification: {e!s}",
-                ambiguities=[],
+            logger.warning(
+                "Packed classification error, retrying texts one by one: %s", e
+            )
+            return {}
+
+        try:
+            items = json.loads(response.choices[0].message.content)["results"]
+            if not isinstance(items, list):
+                raise TypeError(
+                    f"expected a list of results, got {type(items).__name__}"
+                )
+        except (ValueError, TypeError, KeyError) as e:
+            self.metrics.count("parse_failures")
+            logger.warning(
+                "Unparseable packed classification, retrying texts one by one: %s", e
             )
+            return {}
+
+        results = {}
+        for item in items:
+            try:
+                if self.label_only and isinstance(item, dict):
+                    item = {**item, **PENDING_DETAILS}
+                packed = PackedAnalysisSchema.model_validate(item)
+            except ValidationError:
+                self.metrics.count("parse_failures")
+                continue
+
+            if 0 <= packed.index < len(texts) and packed.index not in results:
+                results[packed.index] = AnalysisSchema(
+                    **{
+                        **packed.model_dump(exclude={"index"}),
+                        "stage": "llm",
+                        "model": model or self.model,
+                    }
+                )
+
+        return results
+
+    async def explain(
+        self, texts: list[str], categories: list[str], pack_size: int = 20
+    ) -> dict[int, DetailsSchema]:
+        """Generate the details left out of label-only results.
+
+        Texts are sent with their category, in packs bounded by ``pack_size`` and
+        ``settings.PACK_TOKEN_BUDGET``, to ``self.model``. Packs run concurrently
+        through the scheduler.
+
+        Args:
+            texts (list[str]): The classified texts.
+            categories (list[str]): The category of each text.
+            pack_size (int): The maximum number of texts sent in a single request.
+
+        Returns:
+            dict[int, DetailsSchema]: The explanation, keywords and ambiguities of
+                each text, keyed by position. Empty texts and texts whose request
+                failed or whose answer is invalid are left out.
+        """
+        categories_info = self.render_categories()
+        labelled = [
+            (i, f"{self.fit_text(text)} => {category}")
+            for i, (text, category) in enumerate(zip(texts, categories, strict=True))
+            if not self.is_empty(text)
+        ]
+
+        system_message = f"""You are a text classification system.
+        You will receive texts, each prefixed with its index in square brackets and followed by "=>" and the category it was classified into, one of:
+        {categories_info}
+
+        Respond in JSON format with a single field "results": a list containing exactly one object per text, with these fields:
+        - "index" (integer): The index of the text, as given in square brackets
+        {DETAIL_FIELDS}
+        """
+
+        details: dict[int, DetailsSchema] = {}
+
+        async def explain_pack(pack: list[tuple[int, str]]) -> None:
+            texts_info = "\n".join(f"[{i}] {line}" for i, line in pack)
+            messages = [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": f"Texts to explain:\n{texts_info}"},
+            ]
+
+            try:
+                response = await self.scheduler.run(
+                    lambda: self.complete(messages),
+                    estimated_tokens=estimate_tokens(system_message + texts_info)
+                    + COMPLETION_TOKENS_PER_TEXT * len(pack),
+                    metrics=self.metrics,
+                )
+                items = json.loads(response.choices[0].message.content)["results"]
+                if not isinstance(items, list):
+                    raise TypeError(
+                        f"expected a list of results, got {type(items).__name__}"
+                    )
+            except Exception as e:
+                logger.warning("Explanation error: %s", e)
+                return
+
+            positions = {i for i, _ in pack}
+            for item in items:
+                try:
+                    packed = PackedDetailsSchema.model_validate(item)
+                except ValidationError:
+                    self.metrics.count("parse_failures")
+                    continue
+                if packed.index in positions:
+                    details.setdefault(
+                        packed.index,
+                        DetailsSchema(**packed.model_dump(exclude={"index"})),
+                    )
+
+        packs = []
+        for pack in self.make_packs(
+            [line for _, line in labelled], pack_size, settings.PACK_TOKEN_BUDGET
+        ):
+            packs.append(labelled[: len(pack)])
+            labelled = labelled[len(pack) :]
+
+        await asyncio.gather(*[explain_pack(pack) for pack in packs])
+        return details
+
+    @staticmethod
+    def make_packs(
+        texts: list[str], pack_size: int, token_budget: int
+    ) -> list[list[str]]:
+        """Group texts into packs bounded by a size and an estimated token budget.
+
+        Args:
+            texts (list[str]): The texts to group.
+            pack_size (int): The maximum number of texts per pack.
+            token_budget (int): The maximum estimated number of text tokens per pack.
+
+        Returns:
+            list[list[str]]: The packs, in input order. A text that exceeds the
+                budget on its own gets a pack of its own.
+        """
+        packs = []
+        current = []
+        current_tokens = 0
+
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) >= pack_size or current_tokens + tokens > token_budget
+            ):
+                packs.append(current)
+                current = []
+                current_tokens = 0
+
+            current.append(text)
+            current_tokens += tokens
+
+        if current:
+            packs.append(current)
+
+        return packs
+
+    def estimate_run(self, texts: list[str] | pd.Series, pack_size: int = 1) -> dict:
+        """Estimate the tokens and cost of classifying texts, before sending them.
+
+        Every distinct non-empty text is assumed to go to the first model, after
+        truncation or splitting; the cache, the lexical stage, near-duplicates and
+        escalations can only lower the actual figures. Prices are
+        ``settings.PROMPT_TOKEN_PRICE`` and ``settings.COMPLETION_TOKEN_PRICE``.
+
+        Args:
+            texts (list[str] | pd.Series): The texts to classify.
+            pack_size (int): The maximum number of texts sent in a single request.
+
+        Returns:
+            dict: The distinct texts, the long texts among them, and the estimated
+                requests, prompt tokens, completion tokens and cost in dollars.
+        """
+        distinct = pd.Series(texts, dtype=object).dropna().astype(str).unique()
+        lengths = pd.Series(distinct, dtype=object).str.len()
+        tokens = -(-lengths[lengths > 0] // CHARS_PER_TOKEN)
+
+        chunks = pd.Series(1, index=tokens.index)
+        long = pd.Series(False, index=tokens.index)
+        if self.max_text_tokens is not None:
+            long = tokens > self.max_text_tokens
+            if self.long_text_strategy == "chunk":
+                chunks = (-(-tokens // self.max_text_tokens)).clip(
+                    1, settings.LONG_TEXT_MAX_CHUNKS
+                )
+            tokens = tokens.clip(upper=chunks * self.max_text_tokens)
+
+        short = int((~long).sum())
+        requests = -(-short // pack_size) + int(chunks[long].sum())
+        system_tokens = estimate_tokens(self.text_messages("")[0]["content"])
+        prompt_tokens = requests * system_tokens + int(tokens.sum())
+        completion_tokens = self.completion_budget(int(chunks.sum()))[0]
+
+        return {
+            "Texts": len(tokens),
+            "Long texts": int(long.sum()),
+            "Requests": requests,
+            "Prompt tokens": prompt_tokens,
+            "Completion tokens": completion_tokens,
+            "Estimated cost": (
+                prompt_tokens * settings.PROMPT_TOKEN_PRICE
+                + completion_tokens * settings.COMPLETION_TOKEN_PRICE
+            )
+            / 1_000_000,
+        }
 
     async def batch_classify(
-        self, texts: list[str], progress_callback: Callable | None = None
+        self,
+        texts: list[str],
+        progress_callback: Callable | None = None,
+        pack_size: int = 1,
+        checkpoint: Checkpoint | None = None,
+        row_ids: list[int] | None = None,
+        refresh: bool = False,
+        save_lexical: bool = True,
     ) -> list[AnalysisSchema]:
         """Classify a batch of texts asynchronously with optional progress callback.
 
+        Identical texts are only classified once, and texts already present in the
+        result cache are served without calling the model. With
+        ``use_near_duplicates``, near-duplicate texts are only classified once too. Request telemetry and
+        the time spent are added to ``self.metrics``.
+
         Args:
             texts (list[str]): The texts to classify.
             progress_callback (callable, optional): A callback function to report progress.
+            pack_size (int): The maximum number of texts sent in a single request.
+                Packs are also bounded by ``settings.PACK_TOKEN_BUDGET``; texts
+                missing from a packed response are classified one by one.
+            checkpoint (Checkpoint, optional): Where completed rows are saved. Rows
+                already saved in it are not classified again.
+            row_ids (list[int], optional): The IDs of the rows in the checkpoint.
+                Defaults to their position in ``texts``.
+            refresh (bool): Whether to send texts to the model even when the cache
+                or the lexical model could answer them, e.g. to classify rows
+                again. New results still replace the cached ones.
+            save_lexical (bool): Whether to save the lexical model once trained on
+                the results. Runs made of several calls, e.g. chunk by chunk, save
+                it once at the end with ``save_lexical``.
 
         Returns:
             list[OpenAISchema]: A list of OpenAISchema containing the classification results.
         """
+        start_time = time.perf_counter()
         total = len(texts)
         completed = 0
+        results: list[AnalysisSchema | None] = [None] * total
+
+        if row_ids is None:
+            row_ids = list(range(total))
+        saved = checkpoint.take(row_ids) if checkpoint is not None else {}
 
-        async def process_with_progress(
-            text: str, index: int
-        ) -> tuple[int, AnalysisSchema]:
-            result = await self.classify_text(text)
+        pending: dict[str, list[int]] = {}
+        for i, text in enumerate(texts):
+            if row_ids[i] in saved:
+                results[i] = saved[row_ids[i]]
+            elif self.is_empty(text):
+                results[i] = self.empty_result()
+            else:
+                pending.setdefault(str(text), []).append(i)
 
-            if progress_callback:
-                nonlocal completed
-                completed += 1
+        def report(count: int) -> None:
+            nonlocal completed
+            completed += count
+            if progress_callback and total:
                 progress_callback(completed / total)
 
-            return index, result
+        empty = total - len(saved) - sum(len(indices) for indices in pending.values())
+        report(len(saved) + empty)
 
-        tasks = [process_with_progress(text, i) for i, text in enumerate(texts)]
+        def assign(indices: list[int], result: AnalysisSchema) -> None:
+            for i in indices:
+                results[i] = result
+            if checkpoint is not None:
+                checkpoint.append([row_ids[i] for i in indices], result)
+            report(len(indices))
 
-        semaphore = asyncio.Semaphore(5)
+        keys = {}
+        cache_hits = 0
+        if self.cache is not None and pending:
+            categories_info = self.render_categories()
+            keys = {
+                text: ResultCache.make_key(self.signature, categories_info, text)
+                for text in pending
+            }
+            cached = (
+                {}
+                if refresh
+                else await asyncio.to_thread(self.cache.get_many, list(keys.values()))
+            )
+            for text in list(pending):
+                result = cached.get(keys[text])
+                if result is not None:
+                    indices = pending.pop(text)
+                    cache_hits += len(indices)
+                    assign(indices, result.model_copy(update={"stage": "cache"}))
 
-        async def bounded_process(
-            task: tuple[int, AnalysisSchema],
-        ) -> tuple[int, AnalysisSchema]:
-            async with semaphore:
-                return await task
+        lexical = self.lexical_model() if self.categories else None
+        lexical_hits = 0
+        if (
+            not refresh
+            and self.lexical_threshold is not None
+            and lexical is not None
+            and pending
+        ):
+            candidates = list(pending)
+            for text, prediction in zip(
+                candidates, lexical.predict(candidates), strict=True
+            ):
+                if prediction is None or prediction[1] < self.lexical_threshold:
+                    continue
+                indices = pending.pop(text)
+                lexical_hits += len(indices)
+                assign(
+                    indices,
+                    AnalysisSchema(
+                        category=prediction[0],
+                        confidence=prediction[1],
+                        explanation="Classified locally by the lexical model",
+                        keywords=[],
+                        ambiguities=[],
+                        stage="lexical",
+                    ),
+                )
 
-        results_with_indices = await asyncio.gather(
-            *[bounded_process(task) for task in tasks]
-        )
+        # Texts of a cluster of near-duplicates, by representative. Only the
+        # representatives are sent to the model.
+        members: dict[str, list[str]] = {}
+        near_duplicates = 0
+        if self.near_duplicates is not None and len(pending) > 1:
+            candidates = list(pending)
+            # Texts are compared as they are sent, without the middle of long ones.
+            representatives = await asyncio.to_thread(
+                self.near_duplicates.cluster,
+                [self.fit_text(text) for text in candidates],
+            )
+            for text, representative in zip(candidates, representatives, strict=True):
+                if candidates[representative] != text:
+                    members.setdefault(candidates[representative], []).append(text)
+                    near_duplicates += 1
 
-        sorted_results = [
-            r for _, r in sorted(results_with_indices, key=lambda x: x[0])
-        ]
+        model_calls = 0
+        errors = 0
+        examples: list[tuple[str, str]] = []
+        # Written to the cache in one transaction at the end, off the event loop.
+        to_cache: list[tuple[str, AnalysisSchema]] = []
+
+        def store(text: str, result: AnalysisSchema) -> None:
+            nonlocal errors
+            if result.category != "Error":
+                if self.cache is not None:
+                    to_cache.append((keys[text], result))
+                if (
+                    result.category in self.categories
+                    and (result.confidence or 0)
+                    >= settings.LEXICAL_TRAIN_MIN_CONFIDENCE
+                ):
+                    examples.append((text, result.category))
+
+            if text in members:
+                # The cluster is named after the row of its representative.
+                result = result.model_copy(
+                    update={"cluster_id": row_ids[pending[text][0]]}
+                )
+                propagated = result.model_copy(update={"stage": "near-duplicate"})
+                settled = [(text, result)]
+                settled += [(member, propagated) for member in members[text]]
+            else:
+                settled = [(text, result)]
+
+            for settled_text, settled_result in settled:
+                indices = pending[settled_text]
+                if result.category == "Error":
+                    errors += len(indices)
+                    for i in indices:
+                        results[i] = settled_result
+                    report(len(indices))
+                else:
+                    assign(indices, settled_result)
+
+        # Classify texts with a model of the cascade, storing the results that do
+        # not escalate as soon as they arrive, and return the texts that do.
+        async def run_tier(model: str, texts: list[str], last_tier: bool) -> list[str]:
+            escalated: list[str] = []
+
+            def settle(text: str, result: AnalysisSchema) -> None:
+                if not last_tier and self.escalation.escalates(result):
+                    escalated.append(text)
+                else:
+                    store(text, result)
+
+            async def process_single(text: str) -> None:
+                nonlocal model_calls
+                model_calls += 1
+                settle(text, await self.classify_text(text, model))
+
+            async def process_pack(pack: list[str]) -> None:
+                nonlocal model_calls
+                model_calls += 1
+                packed = await self.classify_pack(pack, model)
+
+                for position, text in enumerate(pack):
+                    if position in packed:
+                        settle(text, packed[position])
+
+                await asyncio.gather(
+                    *[
+                        process_single(text)
+                        for position, text in enumerate(pack)
+                        if position not in packed
+                    ]
+                )
+
+            if pack_size > 1:
+                # Long texts are truncated or split on their own, never packed.
+                packs = self.make_packs(
+                    [text for text in texts if not self.is_long(text)],
+                    pack_size,
+                    settings.PACK_TOKEN_BUDGET,
+                )
+                packs += [[text] for text in texts if self.is_long(text)]
+            else:
+                packs = [[text] for text in texts]
+
+            await asyncio.gather(
+                *[
+                    process_pack(pack) if len(pack) > 1 else process_single(pack[0])
+                    for pack in packs
+                ]
+            )
+
+            self.metrics.count_model(
+                model,
+                texts=len(texts),
+                answered=len(texts) - len(escalated),
+                escalated=len(escalated),
+            )
+            return escalated
+
+        # Each model of a cascade only gets the texts the previous one was unsure of.
+        clustered = {member for cluster in members.values() for member in cluster}
+        todo = [text for text in pending if text not in clustered]
+        escalated_count = 0
+        for tier, model in enumerate(self.models):
+            if not todo:
+                break
+            todo = await run_tier(model, todo, tier == len(self.models) - 1)
+            escalated_count += len(todo)
+
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set_many, to_cache)
+
+        if lexical is not None and examples and self.lexical_training:
+            lexical.partial_fit(
+                [text for text, _ in examples], [label for _, label in examples]
+            )
+            if save_lexical:
+                await asyncio.to_thread(lexical.save)
+
+        self.last_run_stats = {
+            "Rows": total,
+            "Model calls": model_calls,
+            "Duplicates": total
+            - len(saved)
+            - empty
+            - cache_hits
+            - lexical_hits
+            - len(pending),
+            "Cache hits": cache_hits,
+            "Lexical": lexical_hits,
+            "Near-duplicates": near_duplicates,
+            "Empty": empty,
+            "Resumed": len(saved),
+            "Errors": errors,
+            "Escalated": escalated_count,
+        }
+        self.metrics.count("rows", total)
+        self.metrics.add_stage("classify", time.perf_counter() - start_time)
 
-        return sorted_results
+        return results
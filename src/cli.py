@@ -0,0 +1,899 @@
+"""Headless batch classification.
+
+Example:
+    python -m src.cli classify in.csv --column text --categories "Customer Feedback" \\
+        --output out.parquet --workers 4
+    python -m src.cli batch in.csv --column text --categories "Customer Feedback" \\
+        --output out.parquet
+    python -m src.cli multi in.csv --columns subject body \\
+        --taxonomies "Sentiment Analysis" "Customer Feedback" --output out.parquet
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import openai
+import pandas as pd
+
+from src.batch import BatchClassifier
+from src.classification import LONG_TEXT_STRATEGIES, TextClassifier
+from src.core.cache import ResultCache
+from src.core.cascade import EscalationRule, cascade_savings
+from src.core.checkpoint import Checkpoint
+from src.core.config import settings
+from src.core.scheduler import AdaptiveScheduler
+from src.core.telemetry import RunMetrics
+from src.multi import MultiTaxonomyClassifier, attach_target_results
+from src.pipeline import ResultWriter, classify_stream, merge_parts
+from src.utils.data import attach_results, iter_file_chunks
+
+logger = logging.getLogger("src.cli")
+
+_worker: dict = {}
+
+
+def load_categories(
+    categories_file: str, category_set: str | None, custom: list[str]
+) -> dict[str, str]:
+    """Resolve the categories requested on the command line.
+
+    Args:
+        categories_file (str): The JSON file of predefined category sets.
+        category_set (str | None): The name of a predefined set.
+        custom (list[str]): Extra categories, as ``"Name=Description"``.
+
+    Returns:
+        dict[str, str]: The category names and descriptions.
+
+    Raises:
+        ValueError: If the set does not exist, a custom category is malformed, or no
+            category was given.
+    """
+    categories = {}
+
+    if category_set:
+        with open(categories_file) as f:
+            options = json.load(f)
+        if category_set not in options:
+            raise ValueError(
+                f"Unknown category set {category_set!r}, available: {', '.join(options)}"
+            )
+        categories.update(options[category_set])
+
+    for item in custom:
+        name, sep, description = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Expected 'Name=Description', got {item!r}")
+        categories[name.strip()] = description.strip()
+
+    if not categories:
+        raise ValueError("No categories given, use --categories or --category")
+
+    return categories
+
+
+def build_classifier(
+    model: str,
+    categories: dict[str, str],
+    workers: int,
+    use_cache: bool,
+    lexical_threshold: float | None = None,
+    cascade: list[str] | None = None,
+    min_confidence: float = settings.CASCADE_MIN_CONFIDENCE,
+    label_only: bool = False,
+    near_duplicate_threshold: float | None = None,
+    max_text_tokens: int | None = None,
+    long_text_strategy: str = "truncate",
+) -> TextClassifier:
+    """Build a classifier whose share of the request budget matches one of ``workers``.
+
+    Args:
+        model (str): The model to use.
+        categories (dict[str, str]): The category names and descriptions.
+        workers (int): The number of processes sharing the global budget.
+        use_cache (bool): Whether to use the persistent result cache.
+        lexical_threshold (float | None): The minimum confidence for the lexical
+            model to answer a row, or None to send every row to the LLM.
+        cascade (list[str], optional): Models tried cheapest first instead of
+            ``model``, escalating uncertain results.
+        min_confidence (float): Results of the cascade less confident than this
+            escalate to the next model.
+        label_only (bool): Whether to request only the category and confidence.
+        near_duplicate_threshold (float | None): The minimum similarity for a
+            near-duplicate to get the label of its cluster, or None to classify
+            every distinct text.
+        max_text_tokens (int | None): The estimated token budget of a text, or
+            None to send texts whole.
+        long_text_strategy (str): How longer texts are handled, "truncate" or
+            "chunk".
+
+    Returns:
+        TextClassifier: The classifier, with its categories set.
+    """
+    scheduler = AdaptiveScheduler(
+        min_concurrency=settings.MIN_CONCURRENCY,
+        max_concurrency=max(settings.MAX_CONCURRENCY // workers, 1),
+        initial_concurrency=max(settings.INITIAL_CONCURRENCY // workers, 1),
+        requests_per_minute=settings.REQUESTS_PER_MINUTE // workers,
+        tokens_per_minute=settings.TOKENS_PER_MINUTE // workers,
+        max_retries=settings.MAX_RETRIES,
+        backoff_base=settings.RETRY_BACKOFF_BASE,
+        backoff_max=settings.RETRY_BACKOFF_MAX,
+    )
+    classifier = TextClassifier(
+        model=model,
+        cache=ResultCache.from_settings() if use_cache else None,
+        scheduler=scheduler,
+    )
+    classifier.set_categories(categories)
+    classifier.use_lexical(lexical_threshold)
+    classifier.use_label_only(label_only)
+    classifier.use_near_duplicates(near_duplicate_threshold)
+    classifier.use_long_texts(max_text_tokens, long_text_strategy)
+    if cascade:
+        escalation = EscalationRule.from_settings()
+        escalation.min_confidence = min_confidence
+        classifier.use_cascade(cascade, escalation)
+    return classifier
+
+
+def _init_worker(
+    model: str,
+    categories: dict[str, str],
+    workers: int,
+    use_cache: bool,
+    lexical_threshold: float | None,
+    cascade: list[str] | None,
+    min_confidence: float,
+    label_only: bool,
+    near_duplicate_threshold: float | None,
+    max_text_tokens: int | None,
+    long_text_strategy: str,
+) -> None:
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    _worker["classifier"] = build_classifier(
+        model,
+        categories,
+        workers,
+        use_cache,
+        lexical_threshold,
+        cascade,
+        min_confidence,
+        label_only,
+        near_duplicate_threshold,
+        max_text_tokens,
+        long_text_strategy,
+    )
+    _worker["loop"] = asyncio.new_event_loop()
+
+
+def _classify_chunk(
+    chunk: pd.DataFrame, text_column: str, part: Path, header: bool, pack_size: int
+) -> tuple[dict, RunMetrics]:
+    classifier: TextClassifier = _worker["classifier"]
+    # Each chunk reports its own telemetry, merged by the parent process.
+    classifier.metrics = metrics = RunMetrics()
+    results = _worker["loop"].run_until_complete(
+        classifier.batch_classify(
+            chunk[text_column].tolist(),
+            pack_size=pack_size,
+            # Row numbers of the file, so near-duplicate clusters are named after
+            # the same rows whatever the chunk.
+            row_ids=chunk.index.tolist(),
+            # Workers would overwrite each other's saved model.
+            save_lexical=False,
+        )
+    )
+
+    with metrics.stage("assemble"):
+        results_df = attach_results(chunk, text_column, results)
+
+    # Write under a temporary name so an interrupted run never leaves a partial
+    # part behind for --resume to pick up.
+    tmp_part = part.with_name(f"tmp-{part.name}")
+    with metrics.stage("write"), ResultWriter(tmp_part, header=header) as writer:
+        writer.write(results_df)
+    tmp_part.replace(part)
+
+    return classifier.last_run_stats, metrics
+
+
+def classify_sharded(
+    args: argparse.Namespace,
+    categories: dict[str, str],
+    parts_dir: Path,
+    metrics: RunMetrics,
+) -> dict:
+    """Classify the input across worker processes, one part file per chunk.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+        categories (dict[str, str]): The category names and descriptions.
+        parts_dir (Path): Where the part files are written.
+        metrics (RunMetrics): Where the telemetry of every chunk is merged.
+
+    Returns:
+        dict: The summed statistics of every chunk.
+    """
+    suffix = "".join(Path(args.output).suffixes)
+    totals: dict[str, int] = {}
+    parts = []
+    in_flight: set[Future] = set()
+
+    def collect(done: set[Future]) -> None:
+        for future in done:
+            stats, chunk_metrics = future.result()
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+            metrics.merge(chunk_metrics)
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            args.model,
+            categories,
+            args.workers,
+            not args.no_cache,
+            args.lexical_threshold,
+            args.cascade,
+            args.escalate_below,
+            args.labels_only,
+            args.near_duplicates,
+            args.max_text_tokens or None,
+            args.long_texts,
+        ),
+    ) as pool:
+        chunks = iter_file_chunks(args.input, Path(args.input).name, args.chunksize)
+        for sequence in itertools.count():
+            with metrics.stage("load"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+
+            part = parts_dir / f"part-{sequence:06d}{suffix}"
+            parts.append(part)
+
+            if args.resume and part.exists():
+                logger.info("Skipping chunk %d, already classified", sequence)
+                # Counted so that the summary covers the whole file.
+                for name in ("Rows", "Resumed"):
+                    totals[name] = totals.get(name, 0) + len(chunk)
+                continue
+
+            # Bound the number of parsed chunks waiting for a worker.
+            if len(in_flight) >= 2 * args.workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            in_flight.add(
+                pool.submit(
+                    _classify_chunk,
+                    chunk,
+                    args.column,
+                    part,
+                    sequence == 0,
+                    args.pack_size,
+                )
+            )
+
+        collect(wait(in_flight).done)
+
+    merge_parts(parts, args.output)
+    return totals
+
+
+def classify_single(
+    args: argparse.Namespace, categories: dict[str, str], metrics: RunMetrics
+) -> dict:
+    """Classify the input in this process, streaming results to the output file.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+        categories (dict[str, str]): The category names and descriptions.
+        metrics (RunMetrics): Where the telemetry of the run is recorded.
+
+    Returns:
+        dict: The summed statistics of every chunk.
+    """
+    classifier = build_classifier(
+        args.model,
+        categories,
+        1,
+        not args.no_cache,
+        args.lexical_threshold,
+        args.cascade,
+        args.escalate_below,
+        args.labels_only,
+        args.near_duplicates,
+        args.max_text_tokens or None,
+        args.long_texts,
+    )
+    classifier.metrics = metrics
+    totals: dict[str, int] = {}
+
+    def on_chunk(_results_df: pd.DataFrame) -> None:
+        for name, value in classifier.last_run_stats.items():
+            totals[name] = totals.get(name, 0) + value
+        logger.info("%d rows written", writer.rows)
+
+    with ResultWriter(args.output) as writer:
+        asyncio.run(
+            classify_stream(
+                classifier,
+                iter_file_chunks(args.input, Path(args.input).name, args.chunksize),
+                args.column,
+                writer,
+                chunk_callback=on_chunk,
+                pack_size=args.pack_size,
+                chunks_in_flight=1,
+            )
+        )
+
+    return totals
+
+
+def write_metrics(metrics: RunMetrics, path: str | Path) -> None:
+    """Save the telemetry of a run: Prometheus text for ``.prom`` files, JSON otherwise.
+
+    Args:
+        metrics (RunMetrics): The telemetry of the run.
+        path (str | Path): Where to write it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".prom":
+        path.write_text(metrics.to_prometheus())
+    else:
+        path.write_text(json.dumps(metrics.to_dict(), indent=2))
+
+
+def run_classify(args: argparse.Namespace) -> int:
+    """Run the ``classify`` command.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: The process exit code.
+    """
+    try:
+        categories = load_categories(
+            args.categories_file, args.categories, args.category
+        )
+    except (OSError, ValueError) as e:
+        logger.error("%s", e)
+        return 2
+
+    if args.resume and not args.parts_dir:
+        logger.error("--resume needs the --parts-dir of the interrupted run")
+        return 2
+
+    start_time = time.time()
+    metrics = RunMetrics()
+
+    if args.workers > 1:
+        parts_dir = Path(args.parts_dir or tempfile.mkdtemp(prefix="classify-parts-"))
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        totals = classify_sharded(args, categories, parts_dir, metrics)
+        # Parts in a directory of our own are only a copy of the output by now.
+        if not args.parts_dir:
+            shutil.rmtree(parts_dir)
+    else:
+        totals = classify_single(args, categories, metrics)
+
+    elapsed = time.time() - start_time
+    metrics.finish()
+    rows = totals.get("Rows", 0)
+    logger.info(
+        "Classified %d rows in %.1fs (%.1f rows/s): %d model calls, %d duplicates, "
+        "%d cache hits, %d answered locally, %d near-duplicates, %d resumed, "
+        "%d empty, %d errors. "
+        "Results written to %s",
+        rows,
+        elapsed,
+        rows / elapsed if elapsed else 0.0,
+        totals.get("Model calls", 0),
+        totals.get("Duplicates", 0),
+        totals.get("Cache hits", 0),
+        totals.get("Lexical", 0),
+        totals.get("Near-duplicates", 0),
+        totals.get("Resumed", 0),
+        totals.get("Empty", 0),
+        totals.get("Errors", 0),
+        args.output,
+    )
+
+    summary = metrics.summary()
+    logger.info(
+        "%d requests, latency p50 %.2fs p95 %.2fs, queue wait p95 %.2fs, "
+        "%d prompt and %d completion tokens, %d retries, %d parse failures",
+        summary["Requests"],
+        summary["Latency p50"] or 0.0,
+        summary["Latency p95"] or 0.0,
+        summary["Queue wait p95"] or 0.0,
+        summary["Prompt tokens"],
+        summary["Completion tokens"],
+        summary["Retries"],
+        summary["Parse failures"],
+    )
+
+    if args.cascade:
+        for model, counters in metrics.models.items():
+            logger.info(
+                "%s: %d texts, %d answered, %d escalated, %d tokens",
+                model,
+                counters["texts"],
+                counters["answered"],
+                counters["escalated"],
+                counters["prompt_tokens"] + counters["completion_tokens"],
+            )
+        if savings := cascade_savings(metrics, args.cascade):
+            logger.info(
+                "Cascade: %d texts answered before %s, about %d of its tokens saved",
+                savings["Answered early"],
+                args.cascade[-1],
+                savings["Tokens saved"],
+            )
+
+    if args.metrics_output:
+        write_metrics(metrics, args.metrics_output)
+        logger.info("Telemetry written to %s", args.metrics_output)
+
+    if totals.get("Errors"):
+        logger.warning("%d rows could not be classified", totals["Errors"])
+        return 1 if args.strict else 0
+
+    return 0
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """Run the ``batch`` command.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: The process exit code.
+    """
+    try:
+        categories = load_categories(
+            args.categories_file, args.categories, args.category
+        )
+    except (OSError, ValueError) as e:
+        logger.error("%s", e)
+        return 2
+
+    start_time = time.time()
+    metrics = RunMetrics()
+    # Chunks cannot be voted on in batches, so long texts are truncated.
+    classifier = build_classifier(
+        args.model,
+        categories,
+        1,
+        not args.no_cache,
+        label_only=args.labels_only,
+        max_text_tokens=args.max_text_tokens or None,
+    )
+    classifier.metrics = metrics
+    batcher = BatchClassifier.from_settings(classifier)
+    batcher.poll_interval = args.poll_interval
+    batcher.max_attempts = args.max_attempts
+    batcher.max_wait = args.max_wait_hours * 3600
+
+    with metrics.stage("load"):
+        df = pd.concat(
+            iter_file_chunks(args.input, Path(args.input).name, args.chunksize)
+        )
+        with open(args.input, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+    # Rerunning the same command collects the batches of an interrupted run.
+    checkpoint = Checkpoint(
+        Checkpoint.make_run_id(
+            digest, args.column, classifier.signature, classifier.render_categories()
+        )
+    )
+    logger.info("Run ID: %s", checkpoint.run_id)
+    try:
+        results = asyncio.run(
+            batcher.classify(
+                df[args.column].tolist(),
+                checkpoint=checkpoint,
+                row_ids=df.index.tolist(),
+            )
+        )
+    except (TimeoutError, openai.APIError) as e:
+        # The batches in flight are kept, for a rerun to collect them.
+        logger.error("%s", e)
+        return 1
+    finally:
+        checkpoint.close()
+
+    with metrics.stage("assemble"):
+        results_df = attach_results(df, args.column, results)
+    with metrics.stage("write"), ResultWriter(args.output) as writer:
+        writer.write(results_df)
+    # Every row is in the output now; only interrupted runs are resumed.
+    checkpoint.delete()
+
+    elapsed = time.time() - start_time
+    metrics.finish()
+    stats = batcher.last_run_stats
+    summary = metrics.summary()
+    logger.info(
+        "Classified %d rows in %.1fs: %d batches, %d requests, %d resubmitted, "
+        "%d duplicates, %d cache hits, %d resumed, %d empty, %d errors, "
+        "%d prompt and %d completion tokens. Results written to %s",
+        stats["Rows"],
+        elapsed,
+        stats["Batches"],
+        stats["Requests"],
+        stats["Resubmitted"],
+        stats["Duplicates"],
+        stats["Cache hits"],
+        stats["Resumed"],
+        stats["Empty"],
+        stats["Errors"],
+        summary["Prompt tokens"],
+        summary["Completion tokens"],
+        args.output,
+    )
+
+    if args.metrics_output:
+        write_metrics(metrics, args.metrics_output)
+        logger.info("Telemetry written to %s", args.metrics_output)
+
+    if stats["Errors"]:
+        logger.warning("%d rows could not be classified", stats["Errors"])
+        return 1 if args.strict else 0
+
+    return 0
+
+
+def run_multi(args: argparse.Namespace) -> int:
+    """Run the ``multi`` command.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: The process exit code.
+    """
+    try:
+        taxonomies = {
+            name: load_categories(args.categories_file, name, [])
+            for name in args.taxonomies
+        }
+    except (OSError, ValueError) as e:
+        logger.error("%s", e)
+        return 2
+
+    start_time = time.time()
+    metrics = RunMetrics()
+    classifier = build_classifier(
+        args.model,
+        {},
+        1,
+        not args.no_cache,
+        label_only=args.labels_only,
+        max_text_tokens=args.max_text_tokens or None,
+    )
+    classifier.metrics = metrics
+    multi = MultiTaxonomyClassifier(classifier, taxonomies, args.columns)
+    totals: dict[str, int] = {}
+
+    async def classify_chunks() -> None:
+        with ResultWriter(args.output) as writer:
+            for chunk in iter_file_chunks(
+                args.input, Path(args.input).name, args.chunksize
+            ):
+                results = await multi.classify(chunk)
+                with metrics.stage("write"):
+                    writer.write(attach_target_results(chunk, results))
+                for name, value in multi.last_run_stats.items():
+                    totals[name] = totals.get(name, 0) + value
+                logger.info("%d rows written", writer.rows)
+
+    asyncio.run(classify_chunks())
+
+    elapsed = time.time() - start_time
+    metrics.finish()
+    summary = metrics.summary()
+    logger.info(
+        "Classified %d rows against %d targets in %.1fs: %d model calls, "
+        "%d duplicates, %d cache hits, %d empty, %d rows with errors, "
+        "%d prompt and %d completion tokens. Results written to %s",
+        totals.get("Rows", 0),
+        len(multi.targets),
+        elapsed,
+        totals.get("Model calls", 0),
+        totals.get("Duplicates", 0),
+        totals.get("Cache hits", 0),
+        totals.get("Empty", 0),
+        totals.get("Errors", 0),
+        summary["Prompt tokens"],
+        summary["Completion tokens"],
+        args.output,
+    )
+
+    if args.metrics_output:
+        write_metrics(metrics, args.metrics_output)
+        logger.info("Telemetry written to %s", args.metrics_output)
+
+    if totals.get("Errors"):
+        logger.warning("%d rows could not be fully classified", totals["Errors"])
+        return 1 if args.strict else 0
+
+    return 0
+
+
+def add_input_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments naming the input, the categories, the output and the model."""
+    parser.add_argument("input", help="The CSV or Excel file to classify")
+    parser.add_argument("--column", required=True, help="The text column")
+    parser.add_argument(
+        "--categories", help="The name of a predefined category set to use"
+    )
+    parser.add_argument(
+        "--category",
+        action="append",
+        default=[],
+        metavar="NAME=DESCRIPTION",
+        help="A custom category; may be repeated",
+    )
+    parser.add_argument(
+        "--categories-file",
+        default="data/categories.json",
+        help="The file of predefined category sets",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="classification_results.csv",
+        help="The output file: .csv, .csv.gz, .csv.zst, .jsonl or .parquet",
+    )
+    parser.add_argument("--model", default=settings.MODEL, help="The model to use")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli", description="Classify text files without the UI."
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log debug output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    classify = commands.add_parser("classify", help="Classify a CSV or Excel file")
+    add_input_arguments(classify)
+    classify.add_argument(
+        "--cascade",
+        nargs="+",
+        metavar="MODEL",
+        default=settings.CASCADE_MODELS or None,
+        help="Models to try cheapest first instead of --model; uncertain rows "
+        "escalate to the next one",
+    )
+    classify.add_argument(
+        "--escalate-below",
+        type=float,
+        default=settings.CASCADE_MIN_CONFIDENCE,
+        help="Cascade results less confident than this escalate to the next model",
+    )
+    classify.add_argument(
+        "--labels-only",
+        action="store_true",
+        default=settings.LABEL_ONLY,
+        help="Request only the category and confidence, leaving the explanation, "
+        "keywords and ambiguities empty",
+    )
+    classify.add_argument(
+        "--max-text-tokens",
+        type=int,
+        default=settings.LONG_TEXT_MAX_TOKENS,
+        help="The estimated token budget of a text; 0 sends texts whole",
+    )
+    classify.add_argument(
+        "--long-texts",
+        choices=LONG_TEXT_STRATEGIES,
+        default=settings.LONG_TEXT_STRATEGY,
+        help="Truncate longer texts to their start and end, or split them into "
+        "chunks that vote with their confidence",
+    )
+    classify.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes; the request budget is split between them",
+    )
+    classify.add_argument(
+        "--chunksize", type=int, default=10_000, help="The number of rows per chunk"
+    )
+    classify.add_argument(
+        "--pack-size",
+        type=int,
+        default=settings.PACK_SIZE,
+        help="The maximum number of texts per request",
+    )
+    classify.add_argument(
+        "--parts-dir",
+        help="Where worker processes write their part files (kept for --resume)",
+    )
+    classify.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip chunks whose part file already exists in --parts-dir",
+    )
+    classify.add_argument(
+        "--no-cache", action="store_true", help="Do not use the result cache"
+    )
+    classify.add_argument(
+        "--lexical-threshold",
+        type=float,
+        default=settings.LEXICAL_THRESHOLD if settings.LEXICAL_ENABLED else None,
+        help="Answer rows locally when the lexical model is at least this confident",
+    )
+    classify.add_argument(
+        "--near-duplicates",
+        type=float,
+        metavar="THRESHOLD",
+        default=settings.NEAR_DUPLICATE_THRESHOLD
+        if settings.NEAR_DUPLICATES_ENABLED
+        else None,
+        help="Classify one text per cluster of near-duplicates at least this "
+        "similar, giving its label to the others",
+    )
+    classify.add_argument(
+        "--metrics-output",
+        help="Save the run telemetry: Prometheus text for .prom files, JSON otherwise",
+    )
+    classify.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit with status 1 if any row could not be classified",
+    )
+    classify.set_defaults(func=run_classify)
+
+    batch = commands.add_parser(
+        "batch",
+        help="Classify a CSV or Excel file offline with the Batch API",
+        description="Submit every row as a Batch API request and wait for the "
+        "answers; failed rows are resubmitted. Rerun the same command to collect "
+        "the batches of an interrupted run.",
+    )
+    add_input_arguments(batch)
+    batch.add_argument(
+        "--labels-only",
+        action="store_true",
+        default=settings.LABEL_ONLY,
+        help="Request only the category and confidence, leaving the explanation, "
+        "keywords and ambiguities empty",
+    )
+    batch.add_argument(
+        "--max-text-tokens",
+        type=int,
+        default=settings.LONG_TEXT_MAX_TOKENS,
+        help="Longer texts are truncated to their start and end; 0 sends texts whole",
+    )
+    batch.add_argument(
+        "--poll-interval",
+        type=float,
+        default=settings.BATCH_POLL_INTERVAL,
+        help="Seconds between checks of the batches in flight",
+    )
+    batch.add_argument(
+        "--max-attempts",
+        type=int,
+        default=settings.BATCH_MAX_ATTEMPTS,
+        help="How many times a row is submitted before it is given up as an error",
+    )
+    batch.add_argument(
+        "--max-wait-hours",
+        type=float,
+        default=settings.BATCH_MAX_WAIT_HOURS,
+        help="How long a batch is polled before the run gives up on it",
+    )
+    batch.add_argument(
+        "--chunksize", type=int, default=10_000, help="The number of rows per chunk"
+    )
+    batch.add_argument(
+        "--no-cache", action="store_true", help="Do not use the result cache"
+    )
+    batch.add_argument(
+        "--metrics-output",
+        help="Save the run telemetry: Prometheus text for .prom files, JSON otherwise",
+    )
+    batch.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit with status 1 if any row could not be classified",
+    )
+    batch.set_defaults(func=run_batch)
+
+    multi = commands.add_parser(
+        "multi",
+        help="Classify several text columns against several category sets at once",
+        description="Send each row once, asking for one result per combination of "
+        "category set and column, and write a category, confidence and explanation "
+        "column for each.",
+    )
+    multi.add_argument("input", help="The CSV or Excel file to classify")
+    multi.add_argument(
+        "--columns", nargs="+", required=True, help="The text columns to classify"
+    )
+    multi.add_argument(
+        "--taxonomies",
+        nargs="+",
+        required=True,
+        metavar="SET",
+        help="The names of the predefined category sets to classify against",
+    )
+    multi.add_argument(
+        "--categories-file",
+        default="data/categories.json",
+        help="The file of predefined category sets",
+    )
+    multi.add_argument(
+        "-o",
+        "--output",
+        default="classification_results.csv",
+        help="The output file: .csv, .csv.gz, .csv.zst, .jsonl or .parquet",
+    )
+    multi.add_argument("--model", default=settings.MODEL, help="The model to use")
+    multi.add_argument(
+        "--labels-only",
+        action="store_true",
+        default=settings.LABEL_ONLY,
+        help="Request only the categories and confidences, leaving the "
+        "explanations empty",
+    )
+    multi.add_argument(
+        "--max-text-tokens",
+        type=int,
+        default=settings.LONG_TEXT_MAX_TOKENS,
+        help="Longer texts are truncated to their start and end; 0 sends texts whole",
+    )
+    multi.add_argument(
+        "--chunksize", type=int, default=10_000, help="The number of rows per chunk"
+    )
+    multi.add_argument(
+        "--no-cache", action="store_true", help="Do not use the result cache"
+    )
+    multi.add_argument(
+        "--metrics-output",
+        help="Save the run telemetry: Prometheus text for .prom files, JSON otherwise",
+    )
+    multi.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit with status 1 if any row could not be classified",
+    )
+    multi.set_defaults(func=run_multi)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the command-line interface."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
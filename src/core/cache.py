@@ -0,0 +1,215 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.core.config import settings
+from src.schemas.analysis_schema import AnalysisSchema
+
+
+class ResultCache:
+    """Persistent, content-addressed store of classification results.
+
+    Results are keyed by a hash of the model, the rendered category set and the
+    text, so re-running the same file with the same categories never pays for
+    the same row twice. The age and size limits are enforced when the cache is
+    opened and again every ``evict_interval`` stores, so a long-lived cache, e.g.
+    the one of the app server, does not grow without bound.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int = 1_000_000,
+        max_age_seconds: float = 30 * 24 * 3600,
+        evict_interval: int = 1000,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stores = 0
+        # The database may be shared by several worker processes.
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)"
+        )
+        self._conn.commit()
+
+        self.evict()
+
+    @classmethod
+    def from_settings(cls) -> "ResultCache | None":
+        """Build the cache described by the application settings.
+
+        Returns:
+            ResultCache | None: The cache, or None if caching is disabled.
+        """
+        if not settings.CACHE_ENABLED:
+            return None
+
+        return cls(
+            settings.CACHE_PATH,
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            max_age_seconds=settings.CACHE_MAX_AGE_DAYS * 24 * 3600,
+            evict_interval=settings.CACHE_EVICT_INTERVAL,
+        )
+
+    @staticmethod
+    def make_key(model: str, categories_info: str, text: str) -> str:
+        """Compute the cache key of a classification request.
+
+        Args:
+            model (str): The model used for classification.
+            categories_info (str): The rendered category set sent to the model.
+            text (str): The text to classify.
+
+        Returns:
+            str: The hex digest identifying the request.
+        """
+        digest = hashlib.sha256()
+        for part in (model, categories_info, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, AnalysisSchema]:
+        """Look up several keys at once, refreshing their access time.
+
+        Args:
+            keys (list[str]): The keys to look up.
+
+        Returns:
+            dict[str, AnalysisSchema]: The cached results for the keys that were found.
+        """
+        found = {}
+        cutoff = time.time() - self.max_age_seconds
+
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({placeholders}) AND created_at >= ?",
+                    [*chunk, cutoff],
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = AnalysisSchema.model_validate_json(value)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE results SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+
+        return found
+
+    def set(self, key: str, result: AnalysisSchema) -> None:
+        """Store a classification result.
+
+        Args:
+            key (str): The cache key of the request.
+            result (AnalysisSchema): The result to store.
+        """
+        self.set_many([(key, result)])
+
+    def set_many(self, items: list[tuple[str, AnalysisSchema]]) -> None:
+        """Store several classification results in a single transaction.
+
+        Args:
+            items (list[tuple[str, AnalysisSchema]]): The cache key and result of
+                each request.
+        """
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, result.model_dump_json(), now, now) for key, result in items],
+            )
+            self._conn.commit()
+            due = (self._stores + len(items)) // self.evict_interval > (
+                self._stores // self.evict_interval
+            )
+            self._stores += len(items)
+
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above the size limit.
+
+        Returns:
+            int: The number of evicted entries.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM results WHERE created_at < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+            evicted = cursor.rowcount
+
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                cursor = self._conn.execute(
+                    """DELETE FROM results WHERE key IN (
+                        SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?
+                    )""",
+                    (count - self.max_entries,),
+                )
+                evicted += cursor.rowcount
+
+            self._conn.commit()
+
+        return evicted
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache since it was opened."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Summarise the cache usage.
+
+        Returns:
+            dict: The number of entries, hits, misses and the hit rate.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+
+        return {
+            "Entries": entries,
+            "Hits": self.hits,
+            "Misses": self.misses,
+            "Hit rate": self.hit_rate,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+
+from src.core.config import settings
+from src.core.telemetry import RunMetrics
+from src.schemas.analysis_schema import AnalysisSchema
+
+
+@dataclass
+class EscalationRule:
+    """When a result of a model of the cascade is sent on to the next model.
+
+    Attributes:
+        min_confidence (float): Results less confident than this escalate.
+        on_ambiguities (bool): Whether results listing ambiguities escalate.
+        on_undetermined (bool): Whether "Undetermined" results escalate.
+        on_errors (bool): Whether failed requests and unparseable answers escalate.
+    """
+
+    min_confidence: float = 0.8
+    on_ambiguities: bool = True
+    on_undetermined: bool = True
+    on_errors: bool = True
+
+    @classmethod
+    def from_settings(cls) -> "EscalationRule":
+        """Build the escalation rule described by the application settings."""
+        return cls(
+            min_confidence=settings.CASCADE_MIN_CONFIDENCE,
+            on_ambiguities=settings.CASCADE_ON_AMBIGUITIES,
+            on_undetermined=settings.CASCADE_ON_UNDETERMINED,
+            on_errors=settings.CASCADE_ON_ERRORS,
+        )
+
+    def escalates(self, result: AnalysisSchema) -> bool:
+        """Check whether a result should be sent on to the next model.
+
+        Args:
+            result (AnalysisSchema): The result of a model of the cascade.
+
+        Returns:
+            bool: Whether the rule fires.
+        """
+        if result.category == "Error":
+            return self.on_errors
+        if self.on_undetermined and result.category == "Undetermined":
+            return True
+        if self.on_ambiguities and result.ambiguities:
+            return True
+        return (result.confidence or 0.0) < self.min_confidence
+
+
+def cascade_savings(metrics: RunMetrics, models: list[str]) -> dict:
+    """Estimate what a cascade saved compared to sending every text to its last model.
+
+    Prompts are the same for every model, so a text answered early is assumed to
+    have cost the last model as many tokens as it cost the first one, and as much
+    time as the texts the last model did answer.
+
+    Args:
+        metrics (RunMetrics): The telemetry of the run.
+        models (list[str]): The models of the cascade, cheapest first.
+
+    Returns:
+        dict: The texts answered before the last model, the last-model tokens they
+            did not use, the tokens spent on texts that escalated anyway and the
+            summed last-model request seconds avoided, None if the last model
+            has not answered any text yet. Empty if the run is not a cascade or
+            its first model has not answered any text yet.
+    """
+    counters = [metrics.models.get(model) for model in models]
+    if len(models) < 2 or counters[0] is None or not counters[0]["texts"]:
+        return {}
+
+    first, last = counters[0], counters[-1]
+    answered_early = sum(c["answered"] for c in counters[:-1] if c is not None)
+    tokens_per_text = (first["prompt_tokens"] + first["completion_tokens"]) / first[
+        "texts"
+    ]
+    escalated_tokens = sum(
+        (c["prompt_tokens"] + c["completion_tokens"]) * c["escalated"] / c["texts"]
+        for c in counters[:-1]
+        if c is not None and c["texts"]
+    )
+
+    return {
+        "Answered early": answered_early,
+        "Tokens saved": round(answered_early * tokens_per_text),
+        "Tokens spent on escalated texts": round(escalated_tokens),
+        "Request seconds saved": answered_early
+        * last["latency_seconds"]
+        / last["texts"]
+        if last is not None and last["texts"]
+        else None,
+    }
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import ClassVar
+
+from src.core.config import settings
+from src.schemas.analysis_schema import AnalysisSchema
+
+
+class Checkpoint:
+    """Durable, append-only log of the rows completed by a classification run.
+
+    Each completed row is appended as one JSON line as soon as its result is known,
+    so a run interrupted by a rerun, a disconnect or a restart can resume without
+    paying again for the rows it already classified. A run that finishes deletes
+    its log, so a log on disk is always the progress of an unfinished run.
+    """
+
+    # The size of each log and its rows counted so far, shared by the instances
+    # of the process, so that counting only reads what was appended since.
+    _counts: ClassVar[dict[Path, tuple[int, int]]] = {}
+
+    def __init__(self, run_id: str, directory: str | Path | None = None):
+        self.run_id = run_id
+        self.directory = Path(directory or settings.CHECKPOINT_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{run_id}.jsonl"
+        self._file = None
+        self._completed = None
+
+    @staticmethod
+    def make_run_id(*parts: str) -> str:
+        """Derive a run ID from everything that determines the results of a run.
+
+        Args:
+            *parts (str): E.g. the input file digest, the text column, the model and
+                the rendered category set.
+
+        Returns:
+            str: A short hex identifier, stable across restarts.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()[:16]
+
+    def load(self) -> dict[int, AnalysisSchema]:
+        """Read the rows completed so far.
+
+        Returns:
+            dict[int, AnalysisSchema]: The results, keyed by row ID. A line cut short
+                by a crash is ignored.
+        """
+        done = {}
+        if not self.path.exists():
+            return done
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done[record["row"]] = AnalysisSchema(**record["result"])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+
+        return done
+
+    def saved_rows(self) -> int:
+        """Count the rows saved so far, without parsing them.
+
+        Only the lines appended since the last count of the log are read.
+
+        Returns:
+            int: The number of saved rows.
+        """
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+        counted_size, count = self._counts.get(self.path, (0, 0))
+        if counted_size > size:
+            counted_size, count = 0, 0
+        if counted_size < size:
+            with open(self.path, "rb") as f:
+                f.seek(counted_size)
+                count += f.read(size - counted_size).count(b"\n")
+            self._counts[self.path] = (size, count)
+        return count
+
+    def take(self, row_ids: list[int]) -> dict[int, AnalysisSchema]:
+        """Hand out the saved results of some rows, forgetting them afterwards.
+
+        The log is read once, on the first call. Results are released as they are
+        taken so resuming a large run chunk by chunk does not keep them all around.
+
+        Args:
+            row_ids (list[int]): The rows to look up.
+
+        Returns:
+            dict[int, AnalysisSchema]: The saved results of the rows that were completed.
+        """
+        if self._completed is None:
+            self._completed = self.load()
+
+        return {
+            row: self._completed.pop(row) for row in row_ids if row in self._completed
+        }
+
+    def append(self, row_ids: list[int], result: AnalysisSchema) -> None:
+        """Record the result of one or more rows.
+
+        Args:
+            row_ids (list[int]): The rows sharing this result.
+            result (AnalysisSchema): The classification result.
+        """
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")  # noqa: SIM115
+
+        payload = result.model_dump()
+        for row in row_ids:
+            self._file.write(json.dumps({"row": row, "result": payload}) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self) -> None:
+        """Discard the saved progress of the run, e.g. once it has finished."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self._counts.pop(self.path, None)
+
+    @staticmethod
+    def cleanup(directory: str | Path | None = None, max_age_days: int = 7) -> int:
+        """Delete checkpoints that have not been written to for a while.
+
+        Args:
+            directory (str | Path, optional): The checkpoint directory.
+            max_age_days (int): The age after which a checkpoint is deleted.
+
+        Returns:
+            int: The number of deleted checkpoints.
+        """
+        directory = Path(directory or settings.CHECKPOINT_DIR)
+        if not directory.exists():
+            return 0
+
+        cutoff = time.time() - max_age_days * 24 * 3600
+        deleted = 0
+        for path in directory.glob("*.jsonl"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                deleted += 1
+
+        return deleted
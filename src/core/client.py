@@ -0,0 +1,37 @@
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src.core.config import settings
+
+
+def create_client(
+    base_url: str | None = None, api_key: str | None = None, **http_options
+) -> AsyncOpenAI:
+    """Build the LLM client, with the connection pool described by the settings.
+
+    Idle connections are kept open between requests and runs, so TLS sessions are
+    reused, and the total number of connections is capped. A client should only be
+    used from a single event loop, e.g. the job manager's.
+
+    Args:
+        base_url (str, optional): The API base URL. Defaults to the settings.
+        api_key (str, optional): The API key. Defaults to the settings.
+        **http_options: Extra options of the HTTP client, e.g. ``event_hooks``.
+
+    Returns:
+        AsyncOpenAI: The client.
+    """
+    return AsyncOpenAI(
+        api_key=api_key or settings.OPENAI_API_KEY,
+        base_url=base_url or settings.LITE_LLM_BASE_URL,
+        # Retries are handled by the scheduler, which also adapts concurrency.
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.KEEPALIVE_EXPIRY,
+            ),
+            **http_options,
+        ),
+    )
@@ -8,6 +8,72 @@ class Settings(BaseSettings):
 
     MODEL: str
 
+    CASCADE_MODELS: list[str] = []
+    CASCADE_MIN_CONFIDENCE: float = 0.8
+    CASCADE_ON_AMBIGUITIES: bool = True
+    CASCADE_ON_UNDETERMINED: bool = True
+    CASCADE_ON_ERRORS: bool = True
+
+    CACHE_ENABLED: bool = True
+    CACHE_PATH: str = ".cache/classification.sqlite3"
+    CACHE_MAX_ENTRIES: int = 1_000_000
+    CACHE_MAX_AGE_DAYS: int = 30
+    CACHE_EVICT_INTERVAL: int = 1000
+
+    LABEL_ONLY: bool = False
+    LABEL_ONLY_MAX_TOKENS: int = 32
+
+    NEAR_DUPLICATES_ENABLED: bool = False
+    NEAR_DUPLICATE_THRESHOLD: float = 0.9
+    NEAR_DUPLICATE_PERMUTATIONS: int = 64
+
+    LONG_TEXT_MAX_TOKENS: int = 4000
+    LONG_TEXT_STRATEGY: str = "truncate"
+    LONG_TEXT_HEAD_SHARE: float = 0.7
+    LONG_TEXT_MAX_CHUNKS: int = 8
+
+    # Dollars per million tokens, for the pre-flight cost estimate.
+    PROMPT_TOKEN_PRICE: float = 0.15
+    COMPLETION_TOKEN_PRICE: float = 0.6
+
+    PACK_SIZE: int = 1
+    PACK_TOKEN_BUDGET: int = 2000
+
+    MIN_CONCURRENCY: int = 1
+    MAX_CONCURRENCY: int = 64
+    INITIAL_CONCURRENCY: int = 5
+    REQUESTS_PER_MINUTE: int = 0
+    TOKENS_PER_MINUTE: int = 0
+    MAX_RETRIES: int = 5
+    RETRY_BACKOFF_BASE: float = 0.5
+    RETRY_BACKOFF_MAX: float = 30.0
+
+    CHECKPOINT_DIR: str = ".cache/checkpoints"
+    CHECKPOINT_MAX_AGE_DAYS: int = 7
+
+    BATCH_DIR: str = ".cache/batches"
+    BATCH_MAX_REQUESTS: int = 50_000
+    BATCH_MAX_FILE_BYTES: int = 190_000_000
+    BATCH_COMPLETION_WINDOW: str = "24h"
+    BATCH_POLL_INTERVAL: float = 60.0
+    BATCH_MAX_ATTEMPTS: int = 3
+    BATCH_MAX_WAIT_HOURS: float = 26.0
+
+    MAX_CONCURRENT_JOBS: int = 2
+
+    MAX_CONNECTIONS: int = 128
+    MAX_KEEPALIVE_CONNECTIONS: int = 64
+    KEEPALIVE_EXPIRY: float = 120.0
+
+    RECLASSIFY_MIN_CONFIDENCE: float = 0.7
+
+    LEXICAL_ENABLED: bool = False
+    LEXICAL_DIR: str = ".cache/lexical"
+    LEXICAL_THRESHOLD: float = 0.9
+    LEXICAL_TRAIN: bool = False
+    LEXICAL_TRAIN_MIN_CONFIDENCE: float = 0.9
+    LEXICAL_CORRECTION_WEIGHT: float = 3.0
+
     model_config = SettingsConfigDict(
         env_file=[
             ".env",
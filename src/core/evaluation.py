@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+
+class Evaluation:
+    """Confusion matrix of the predicted categories against the true ones.
+
+    Predictions are kept as category codes and corrections as a sparse map from row
+    position to the corrected category, so each correction moves one count of the
+    matrix. Per-class precision, recall and F1 are derived from the matrix, and
+    calibration bins from the codes, with NumPy.
+
+    The true category of a row is its gold label when evaluating against a labelled
+    column, and otherwise its correction, rows left uncorrected counting as right.
+    """
+
+    def __init__(
+        self,
+        predicted: pd.Series,
+        confidence: np.ndarray,
+        truth: pd.Series | None = None,
+    ):
+        """Build the confusion matrix.
+
+        Args:
+            predicted (pd.Series): The predicted category of each row.
+            confidence (np.ndarray): The confidence of each prediction.
+            truth (pd.Series, optional): The true category of each row, e.g. a
+                labelled column of the uploaded file. Rows without a label are left
+                out. Defaults to the predictions.
+        """
+        predicted = pd.Categorical(predicted)
+        self.labels: list[str] = [str(label) for label in predicted.categories]
+        self.predicted = predicted.codes.astype(np.int32)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+        self.gold = truth is not None
+
+        if truth is None:
+            self.truth = self.predicted.copy()
+        else:
+            truth = truth.astype("string").str.strip().replace("", pd.NA)
+            known = set(self.labels)
+            self.labels += [
+                label for label in truth.dropna().unique() if label not in known
+            ]
+            self.truth = pd.Categorical(truth, categories=self.labels).codes.astype(
+                np.int32
+            )
+
+        self._codes = {label: code for code, label in enumerate(self.labels)}
+        # Corrected category of each corrected row, by position.
+        self.corrections: dict[int, str] = {}
+
+        size = len(self.labels)
+        valid = (self.truth >= 0) & (self.predicted >= 0)
+        self.matrix = np.bincount(
+            self.truth[valid].astype(np.int64) * size + self.predicted[valid],
+            minlength=size * size,
+        ).reshape(size, size)
+
+    def _code(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.labels.append(label)
+            self._codes[label] = code
+            self.matrix = np.pad(self.matrix, ((0, 1), (0, 1)))
+        return code
+
+    def correct(self, position: int, label: str) -> bool:
+        """Set the true category of a row, updating the matrix in place.
+
+        Args:
+            position (int): The position of the row.
+            label (str): Its true category.
+
+        Returns:
+            bool: Whether the true category of the row changed.
+        """
+        code = self._code(label)
+        old = self.truth[position]
+        if old == code:
+            return False
+
+        predicted = self.predicted[position]
+        if predicted >= 0:
+            if old >= 0:
+                self.matrix[old, predicted] -= 1
+            self.matrix[code, predicted] += 1
+        self.truth[position] = code
+
+        if code == predicted:
+            self.corrections.pop(position, None)
+        else:
+            self.corrections[position] = label
+        return True
+
+    def repredict(
+        self, positions: np.ndarray, labels: list[str], confidence: np.ndarray
+    ) -> None:
+        """Replace the predictions of some rows, e.g. after classifying them again.
+
+        Rows without a correction are assumed right, so their true category follows
+        the new prediction; corrected rows keep theirs, and a correction the new
+        prediction agrees with is dropped.
+
+        Args:
+            positions (np.ndarray): The positions of the rows.
+            labels (list[str]): Their new predicted category.
+            confidence (np.ndarray): The confidence of the new predictions.
+        """
+        codes = [self._code(label) for label in labels]
+        for position, code in zip(positions, codes, strict=True):
+            predicted, truth = self.predicted[position], self.truth[position]
+            if truth >= 0 and predicted >= 0:
+                self.matrix[truth, predicted] -= 1
+            if not self.gold and position not in self.corrections:
+                truth = code
+            elif self.corrections.get(position) == self.labels[code]:
+                del self.corrections[position]
+            if truth >= 0:
+                self.matrix[truth, code] += 1
+            self.predicted[position] = code
+            self.truth[position] = truth
+        self.confidence[positions] = confidence
+
+    def against(self, truth: pd.Series) -> "Evaluation":
+        """Evaluate the same predictions against labelled rows.
+
+        Args:
+            truth (pd.Series): The true category of each row, by position.
+
+        Returns:
+            Evaluation: A new evaluation, leaving the corrections out.
+        """
+        predicted = pd.Categorical.from_codes(self.predicted, self.labels)
+        return Evaluation(
+            pd.Series(predicted), self.confidence, truth.reset_index(drop=True)
+        )
+
+    @property
+    def evaluated(self) -> int:
+        """The number of rows with a true category."""
+        return int(self.matrix.sum())
+
+    @property
+    def accuracy(self) -> float:
+        """The fraction of evaluated rows predicted right."""
+        evaluated = self.evaluated
+        return float(np.trace(self.matrix) / evaluated) if evaluated else 0.0
+
+    def per_class(self) -> pd.DataFrame:
+        """Compute the precision, recall and F1 of each category.
+
+        Returns:
+            pd.DataFrame: One row per category seen as a prediction or true
+                category, with its support, the number of predictions and the
+                precision, recall and F1.
+        """
+        hits = np.diag(self.matrix).astype(np.float64)
+        support = self.matrix.sum(axis=1)
+        predictions = self.matrix.sum(axis=0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predictions > 0, hits / predictions, 0.0)
+            recall = np.where(support > 0, hits / support, 0.0)
+            f1 = np.where(
+                precision + recall > 0,
+                2 * precision * recall / (precision + recall),
+                0.0,
+            )
+
+        seen = (support > 0) | (predictions > 0)
+        return pd.DataFrame(
+            {
+                "Support": support[seen],
+                "Predicted": predictions[seen],
+                "Precision": precision[seen],
+                "Recall": recall[seen],
+                "F1": f1[seen],
+            },
+            index=pd.Index(self.labels, name="Category")[seen],
+        )
+
+    def calibration(self, bins: int = 10) -> pd.DataFrame:
+        """Compare the confidence of the predictions with their accuracy.
+
+        Args:
+            bins (int): The number of equal-width confidence bins.
+
+        Returns:
+            pd.DataFrame: One row per bin, with the number of rows, their mean
+                confidence and their accuracy.
+        """
+        valid = (self.truth >= 0) & (self.predicted >= 0)
+        confidence = self.confidence[valid]
+        right = self.truth[valid] == self.predicted[valid]
+
+        bin_of = np.clip((confidence * bins).astype(np.intp), 0, bins - 1)
+        rows = np.bincount(bin_of, minlength=bins)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_confidence = np.bincount(bin_of, confidence, bins) / rows
+            accuracy = np.bincount(bin_of, right, bins) / rows
+
+        return pd.DataFrame(
+            {
+                "Rows": rows,
+                "Mean confidence": mean_confidence,
+                "Accuracy": accuracy,
+            },
+            index=pd.Index(
+                [f"{i / bins:.2f}-{(i + 1) / bins:.2f}" for i in range(bins)],
+                name="Confidence",
+            ),
+        )
+
+    def calibration_error(self, bins: int = 10) -> float:
+        """Compute the expected calibration error.
+
+        Args:
+            bins (int): The number of equal-width confidence bins.
+
+        Returns:
+            float: The gap between the confidence and the accuracy of each bin,
+                averaged over the bins weighted by their number of rows.
+        """
+        calibration = self.calibration(bins)
+        rows = calibration["Rows"].to_numpy()
+        if not rows.sum():
+            return 0.0
+        gaps = np.abs(
+            calibration["Mean confidence"].to_numpy()
+            - calibration["Accuracy"].to_numpy()
+        )
+        return float(np.nansum(gaps * rows) / rows.sum())
+
+    def summary(self) -> dict:
+        """Summarise the evaluation for display.
+
+        Returns:
+            dict: The number of evaluated and corrected rows, the accuracy, the
+                macro-averaged F1 and the expected calibration error.
+        """
+        per_class = self.per_class()
+        return {
+            "Total samples": self.evaluated,
+            "Corrected samples": len(self.corrections),
+            "Accuracy": self.accuracy,
+            "Macro F1": float(per_class["F1"].mean()) if len(per_class) else 0.0,
+            "Calibration error": self.calibration_error(),
+        }
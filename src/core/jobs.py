@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any
+
+from src.core.config import settings
+from src.core.telemetry import RunMetrics
+
+
+class JobStatus(StrEnum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+
+
+@dataclass
+class Job:
+    """A classification run executed in the background."""
+
+    id: str
+    name: str
+    total: int
+    run_id: str | None = None
+    owner: str | None = None
+    status: JobStatus = JobStatus.QUEUED
+    completed: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: Any = None
+    summary: dict = field(default_factory=dict)
+    error: str | None = None
+    metrics: RunMetrics | None = None
+    models: list[str] = field(default_factory=list)
+    future: Future | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has stopped, successfully or not."""
+        return self.status in (
+            JobStatus.COMPLETED,
+            JobStatus.FAILED,
+            JobStatus.CANCELLED,
+        )
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the rows completed so far."""
+        if self.status == JobStatus.COMPLETED:
+            return 1.0
+        return min(self.completed / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds spent running."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Rows completed per second."""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds until completion, if it can be estimated yet."""
+        if self.done or not self.throughput:
+            return None
+        return max(self.total - self.completed, 0) / self.throughput
+
+
+class JobManager:
+    """Run classification jobs on a long-lived event loop in a background thread.
+
+    Jobs are shared by every session of the process, and at most
+    ``max_concurrent_jobs`` of them run at the same time; the others wait in
+    submission order.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = 2, retention_seconds: float = 3600):
+        self.retention_seconds = retention_seconds
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+        self.loop = asyncio.new_event_loop()
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="classification-jobs", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls) -> "JobManager":
+        """Build the job manager described by the application settings."""
+        return cls(max_concurrent_jobs=settings.MAX_CONCURRENT_JOBS)
+
+    def submit(
+        self,
+        name: str,
+        total: int,
+        work: Callable[[Job], Awaitable[Any]],
+        run_id: str | None = None,
+        owner: str | None = None,
+    ) -> Job:
+        """Queue a job, unless a job of the same run is still queued or running.
+
+        Args:
+            name (str): A human-readable name for the job.
+            total (int): The number of rows to process, used for progress and ETA.
+            work (Callable[[Job], Awaitable[Any]]): Runs the job. It receives the job
+                to report progress on (``completed`` and ``summary``) and its return
+                value becomes ``job.result``.
+            run_id (str, optional): The checkpoint run the job writes to. Two jobs
+                of the same run would append to the same checkpoint at once.
+            owner (str, optional): Who submits the job, e.g. a session. Only the
+                owner of a job should collect its result.
+
+        Returns:
+            Job: The queued job, or the unfinished job of the same run, whose
+                ``owner`` may be someone else.
+        """
+        job = Job(
+            id=uuid.uuid4().hex[:8],
+            name=name,
+            total=total,
+            run_id=run_id,
+            owner=owner,
+        )
+
+        with self._lock:
+            self._prune()
+            if run_id is not None:
+                for other in self._jobs.values():
+                    if other.run_id == run_id and not other.done:
+                        return other
+            self._jobs[job.id] = job
+
+        job.future = asyncio.run_coroutine_threadsafe(self._run(job, work), self.loop)
+        job.future.add_done_callback(lambda _: self._on_done(job))
+        return job
+
+    @staticmethod
+    def _on_done(job: Job) -> None:
+        # A job cancelled before it was picked up by the loop never runs at all.
+        if job.future.cancelled() and not job.done:
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]) -> None:
+        try:
+            async with self._slots:
+                job.status = JobStatus.RUNNING
+                job.started_at = time.time()
+                job.result = await work(job)
+                job.status = JobStatus.COMPLETED
+
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            raise
+
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+
+        finally:
+            job.finished_at = time.time()
+
+    def find(self, run_id: str) -> Job | None:
+        """Look up the unfinished job of a checkpoint run.
+
+        Args:
+            run_id (str): The checkpoint run ID.
+
+        Returns:
+            Job | None: The queued or running job of the run, if any.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.run_id == run_id and not job.done:
+                    return job
+        return None
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued or running job. Rows already checkpointed are kept.
+
+        Args:
+            job_id (str): The ID of the job to cancel.
+        """
+        job = self.get(job_id)
+        if job is not None and job.future is not None:
+            job.future.cancel()
+
+    def get(self, job_id: str) -> Job | None:
+        """Look up a job by ID."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def collect(self, job_id: str) -> Any:
+        """Hand over the result of a completed job, releasing it from the manager.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            Any: The result of the job, or None if it was already collected.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        result, job.result = job.result, None
+        return result
+
+    def list_jobs(self) -> list[Job]:
+        """List the known jobs, oldest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
@@ -0,0 +1,350 @@
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+import openai
+
+from src.core.config import settings
+from src.core.telemetry import RunMetrics
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+
+class TokenBucket:
+    """Token bucket enforcing a per-minute budget.
+
+    The bucket refills continuously and holds at most ``capacity`` units, so short
+    bursts are allowed without exceeding the budget over a minute.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else max(per_minute / 6, 1)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> None:
+        """Wait until ``amount`` units are available, then consume them.
+
+        Args:
+            amount (float): The number of units to consume. Amounts above the
+                capacity are capped so they can always be served eventually.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Consume (or give back, if negative) units after the fact.
+
+        Used to correct an estimate once the real usage is known. The level may go
+        negative, which delays the next acquisitions accordingly.
+
+        Args:
+            amount (float): The number of units to consume.
+        """
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Read the delay requested by the server from an API error, if any.
+
+    Args:
+        error (Exception): The error raised by the OpenAI client.
+
+    Returns:
+        float | None: The delay in seconds, or None if the server did not set one.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    if value := headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                return None
+
+    return None
+
+
+class AdaptiveScheduler:
+    """Run LLM requests at the highest sustainable rate.
+
+    Concurrency follows an AIMD policy: it grows by one slot per window of
+    successful requests, shrinks multiplicatively on throttling or server errors,
+    and shrinks gently when latency drifts well above the best recent latency.
+    Latency is compared per estimated token, so that large packs are not mistaken
+    for congestion, and the best latency slowly drifts toward the current one, so
+    that a fast spell long ago does not hold concurrency down for good.
+    Requests and tokens per minute are capped with token buckets, transient errors
+    are retried with jittered exponential backoff, and Retry-After pauses every
+    request, not only the one that was throttled.
+
+    The scheduler may serve several event loops in turn, e.g. one ``asyncio.run``
+    per command, but only one at a time: its slots and waiters belong to a loop.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        initial_concurrency: int = 5,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+        self.latency = None
+        self.pace = None
+        self.best_pace = None
+
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._loop = None
+        self._queue: deque[asyncio.Future] = deque()
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveScheduler":
+        """Build the scheduler described by the application settings."""
+        return cls(
+            min_concurrency=settings.MIN_CONCURRENCY,
+            max_concurrency=settings.MAX_CONCURRENCY,
+            initial_concurrency=settings.INITIAL_CONCURRENCY,
+            requests_per_minute=settings.REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.TOKENS_PER_MINUTE,
+            max_retries=settings.MAX_RETRIES,
+            backoff_base=settings.RETRY_BACKOFF_BASE,
+            backoff_max=settings.RETRY_BACKOFF_MAX,
+        )
+
+    def _waiters(self) -> deque[asyncio.Future]:
+        # asyncio futures are bound to one event loop, while the scheduler (and
+        # what it learned about the upstream) outlives the loop of a single run.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if (
+                self._loop is not None
+                and not self._loop.is_closed()
+                and (self.in_flight or self._queue)
+            ):
+                raise RuntimeError(
+                    "The scheduler is already running requests on another event loop"
+                )
+            self._loop = loop
+            self._queue = deque()
+            self.in_flight = 0
+        return self._queue
+
+    async def _acquire_slot(self) -> None:
+        waiters = self._waiters()
+        if not waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        # Waiters are woken one at a time, in order, as slots free up; waking all
+        # of them on every release costs O(n) per request on large batches.
+        waiter = self._loop.create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation.
+                self._release_slot()
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            raise
+
+    def _release_slot(self) -> None:
+        waiters = self._waiters()
+        self.in_flight -= 1
+        while waiters and self.in_flight < int(self.limit):
+            waiter = waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _on_success(self, latency: float, tokens: int) -> None:
+        self.latency = (
+            latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        )
+        # Seconds per thousand estimated tokens, so that requests of any size compare.
+        pace = latency * 1000 / max(tokens, 1)
+        self.pace = pace if self.pace is None else 0.8 * self.pace + 0.2 * pace
+        self.best_pace = (
+            self.pace
+            if self.best_pace is None
+            else min(self.pace, self.best_pace + 0.01 * (self.pace - self.best_pace))
+        )
+
+        if self.pace > self.latency_tolerance * self.best_pace:
+            self._decrease(0.9)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _decrease(self, factor: float) -> None:
+        # Requests that were already in flight fail together; only react once per
+        # round-trip so a single burst of 429s does not collapse the window.
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * factor)
+
+    def _backoff(self, attempt: int, delay: float | None) -> float:
+        jitter = random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+        return max(jitter, delay or 0.0)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        metrics: RunMetrics | None = None,
+    ) -> T:
+        """Run a request within the concurrency and rate budgets, retrying on transient errors.
+
+        Args:
+            call (Callable[[], Awaitable[T]]): Builds and awaits the request.
+            estimated_tokens (int): The estimated total tokens of the request.
+            metrics (RunMetrics, optional): Where the latency, queue wait, usage and
+                retries of each attempt are recorded.
+
+        Returns:
+            T: The value returned by the request. If it exposes ``usage``, the
+                token budget is corrected with the real usage.
+
+        Raises:
+            Exception: The last error once retries are exhausted, or any
+                non-transient error immediately.
+        """
+
+        def record(failed: bool, usage=None) -> None:
+            if metrics is not None and start is not None:
+                metrics.record_request(
+                    time.monotonic() - start, start - queued, usage, failed
+                )
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            start = None
+            await self._acquire_slot()
+            try:
+                if self.requests is not None:
+                    await self.requests.acquire(1)
+                if self.tokens is not None:
+                    await self.tokens.acquire(estimated_tokens)
+                if (pause := self._paused_until - time.monotonic()) > 0:
+                    await asyncio.sleep(pause)
+
+                start = time.monotonic()
+                result = await call()
+
+            except RETRYABLE_ERRORS as e:
+                record(failed=True)
+                if isinstance(e, openai.RateLimitError):
+                    self.throttled += 1
+                    if metrics is not None:
+                        metrics.count("throttled")
+                self._decrease(0.5)
+
+                delay = retry_after(e)
+                if delay is not None:
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + delay
+                    )
+
+                if attempt == self.max_retries:
+                    raise
+
+                self.retries += 1
+                if metrics is not None:
+                    metrics.count("retries")
+                wait = self._backoff(attempt, delay)
+
+            except Exception:
+                record(failed=True)
+                raise
+
+            else:
+                self._on_success(time.monotonic() - start, estimated_tokens)
+
+                usage = getattr(result, "usage", None)
+                record(failed=False, usage=usage)
+                if self.tokens is not None and usage is not None:
+                    self.tokens.adjust(usage.total_tokens - estimated_tokens)
+
+                return result
+
+            finally:
+                self._release_slot()
+
+            await asyncio.sleep(wait)
+
+        raise RuntimeError("unreachable")
+
+    def stats(self) -> dict:
+        """Summarise the scheduler state.
+
+        Returns:
+            dict: The current concurrency limit, retries, throttled requests and
+                smoothed latency.
+        """
+        return {
+            "Concurrency": int(self.limit),
+            "Retries": self.retries,
+            "Throttled": self.throttled,
+            "Latency": self.latency,
+        }
@@ -0,0 +1,354 @@
+import bisect
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+COUNTERS = {
+    "rows": "Rows classified.",
+    "requests": "Chat completion requests sent, including retries.",
+    "failed_requests": "Requests that raised an error.",
+    "retries": "Requests retried after a transient error.",
+    "throttled": "Requests rejected with a rate limit error.",
+    "parse_failures": "Completions whose content could not be parsed.",
+    "prompt_tokens": "Prompt tokens reported by the API.",
+    "completion_tokens": "Completion tokens reported by the API.",
+}
+
+MODEL_COUNTERS = {
+    "texts": "Texts sent to the model.",
+    "answered": "Texts whose final result came from the model.",
+    "escalated": "Texts sent on to the next model of the cascade.",
+    "requests": "Requests sent to the model, including retries.",
+    "prompt_tokens": "Prompt tokens used by the model.",
+    "completion_tokens": "Completion tokens used by the model.",
+    "latency_seconds": "Time spent waiting for the model's answers.",
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram, as exported to Prometheus.
+
+    Memory does not grow with the number of observations, so it can record every
+    request of a run of any size; quantiles are estimated from the buckets.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the observations of a histogram with the same buckets."""
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile by linear interpolation within its bucket.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float | None: The estimate, or None without observations. Values in the
+                overflow bucket are reported as the largest bucket bound.
+        """
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float | None:
+        """The mean of the observations."""
+        return self.sum / self.count if self.count else None
+
+
+class RunMetrics:
+    """Telemetry of a classification run.
+
+    Records every request sent to the model (latency, time spent waiting for a
+    slot or a rate budget, token usage, retries, unparseable answers) and the time
+    spent in each stage of the run, e.g. loading, classifying and assembling
+    results. A single instance may be shared by concurrent batches of the run.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self.stages: dict[str, float] = {}
+        # Counters of each model, see MODEL_COUNTERS.
+        self.models: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): One of the names of ``COUNTERS``.
+            amount (int): The increment.
+        """
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_request(
+        self, latency: float, queue_wait: float, usage=None, failed: bool = False
+    ) -> None:
+        """Record a request sent to the model.
+
+        Args:
+            latency (float): Seconds between sending the request and its outcome.
+            queue_wait (float): Seconds spent waiting before it could be sent.
+            usage (optional): The ``usage`` of the response, if any.
+            failed (bool): Whether the request raised an error.
+        """
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["failed_requests"] += failed
+            self.latency.observe(latency)
+            self.queue_wait.observe(queue_wait)
+            if usage is not None:
+                self.counters["prompt_tokens"] += getattr(usage, "prompt_tokens", 0)
+                self.counters["completion_tokens"] += getattr(
+                    usage, "completion_tokens", 0
+                )
+
+    def count_model(self, model: str, **amounts: float) -> None:
+        """Increment counters of a model.
+
+        Args:
+            model (str): The model.
+            **amounts (float): The increments, by name of ``MODEL_COUNTERS``.
+        """
+        with self._lock:
+            counters = self.models.setdefault(model, dict.fromkeys(MODEL_COUNTERS, 0))
+            for name, amount in amounts.items():
+                counters[name] += amount
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        """Add time spent in a stage of the run."""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as part of a stage of the run.
+
+        Args:
+            name (str): The stage, e.g. ``"load"``, ``"classify"`` or ``"assemble"``.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def merge(self, other: "RunMetrics") -> None:
+        """Add the telemetry of another part of the same run, e.g. from a worker."""
+        with self._lock:
+            for name, value in other.counters.items():
+                self.counters[name] += value
+            self.latency.merge(other.latency)
+            self.queue_wait.merge(other.queue_wait)
+            for name, seconds in other.stages.items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for model, counters in other.models.items():
+                mine = self.models.setdefault(model, dict.fromkeys(MODEL_COUNTERS, 0))
+                for name, value in counters.items():
+                    mine[name] += value
+            self.started_at = min(self.started_at, other.started_at)
+
+    def finish(self) -> None:
+        """Mark the end of the run, freezing its duration and throughput."""
+        self.finished_at = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds between the start of the run and its end, or now if it is running."""
+        return (self.finished_at or time.time()) - self.started_at
+
+    def summary(self) -> dict:
+        """Summarise the run for display.
+
+        Returns:
+            dict: Request counts, latency and queue wait percentiles in seconds,
+                token usage and error counts.
+        """
+        counters = self.counters
+        requests = counters["requests"]
+        return {
+            "Requests": requests,
+            "Rows/s": counters["rows"] / self.elapsed if self.elapsed else 0.0,
+            "Latency p50": self.latency.quantile(0.5),
+            "Latency p95": self.latency.quantile(0.95),
+            "Latency p99": self.latency.quantile(0.99),
+            "Queue wait p50": self.queue_wait.quantile(0.5),
+            "Queue wait p95": self.queue_wait.quantile(0.95),
+            "Prompt tokens": counters["prompt_tokens"],
+            "Completion tokens": counters["completion_tokens"],
+            "Retries": counters["retries"],
+            "Throttled": counters["throttled"],
+            "Parse failures": counters["parse_failures"],
+            "Error rate": counters["failed_requests"] / requests if requests else 0.0,
+        }
+
+    def to_dict(self) -> dict:
+        """Export the telemetry as plain data, e.g. to save it as JSON."""
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": self.elapsed,
+                "counters": dict(self.counters),
+                "latency_seconds": _histogram_dict(self.latency),
+                "queue_wait_seconds": _histogram_dict(self.queue_wait),
+                "stage_seconds": dict(self.stages),
+                "models": {
+                    model: dict(counters) for model, counters in self.models.items()
+                },
+            }
+
+    def to_prometheus(self, labels: dict[str, str] | None = None) -> str:
+        """Export the telemetry in the Prometheus text exposition format.
+
+        Args:
+            labels (dict[str, str], optional): Labels added to every sample, e.g.
+                the run or job ID.
+
+        Returns:
+            str: The metrics, ready to be served or written for a textfile collector.
+        """
+        labels = labels or {}
+        lines = []
+
+        with self._lock:
+            for name, help_text in COUNTERS.items():
+                metric = f"classifier_{name}_total"
+                lines += [
+                    f"# HELP {metric} {help_text}",
+                    f"# TYPE {metric} counter",
+                    f"{metric}{_labels(labels)} {self.counters[name]}",
+                ]
+
+            for metric, help_text, histogram in (
+                (
+                    "classifier_request_latency_seconds",
+                    "Latency of the requests sent to the model.",
+                    self.latency,
+                ),
+                (
+                    "classifier_queue_wait_seconds",
+                    "Time requests waited for a concurrency slot or rate budget.",
+                    self.queue_wait,
+                ),
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                cumulative = 0
+                for bound, count in zip(
+                    (*histogram.buckets, "+Inf"), histogram.counts, strict=True
+                ):
+                    cumulative += count
+                    lines.append(
+                        f"{metric}_bucket{_labels({**labels, 'le': str(bound)})} {cumulative}"
+                    )
+                lines += [
+                    f"{metric}_sum{_labels(labels)} {histogram.sum}",
+                    f"{metric}_count{_labels(labels)} {histogram.count}",
+                ]
+
+            lines += [
+                "# HELP classifier_stage_seconds_total Time spent in each stage of the run.",
+                "# TYPE classifier_stage_seconds_total counter",
+                *(
+                    f"classifier_stage_seconds_total{_labels({**labels, 'stage': stage})} {seconds}"
+                    for stage, seconds in self.stages.items()
+                ),
+                *(
+                    line
+                    for name, help_text in MODEL_COUNTERS.items()
+                    for line in (
+                        f"# HELP classifier_model_{name}_total {help_text}",
+                        f"# TYPE classifier_model_{name}_total counter",
+                        *(
+                            f"classifier_model_{name}_total{_labels({**labels, 'model': model})} {counters[name]}"
+                            for model, counters in self.models.items()
+                        ),
+                    )
+                ),
+                "# HELP classifier_run_duration_seconds Duration of the run so far.",
+                "# TYPE classifier_run_duration_seconds gauge",
+                f"classifier_run_duration_seconds{_labels(labels)} {self.elapsed}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def __getstate__(self) -> dict:
+        # Locks cannot be pickled; metrics are sent back from worker processes.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _histogram_dict(histogram: Histogram) -> dict:
+    return {
+        "count": histogram.count,
+        "sum": histogram.sum,
+        "buckets": dict(
+            zip((*map(str, histogram.buckets), "+Inf"), histogram.counts, strict=True)
+        ),
+        "p50": histogram.quantile(0.5),
+        "p95": histogram.quantile(0.95),
+        "p99": histogram.quantile(0.99),
+    }
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
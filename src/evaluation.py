@@ -1,83 +1,231 @@
+import math
+
 import pandas as pd
 import streamlit as st
 
+from src.core.config import settings
+from src.core.evaluation import Evaluation
+from src.explanation import PAGE_SIZES
+from src.results import ClassificationResults
+
 
 def allow_user_correction(
-    df: pd.DataFrame, text_column: str, categories: list[str]
-) -> pd.DataFrame:
-    """Let users correct classification results.
+    results: ClassificationResults,
+    categories: list[str],
+    edits: dict,
+    prior_column: str | None = None,
+) -> pd.Series:
+    """Let users correct classification results, one page at a time.
+
+    Rows are shown in review order, see ``ClassificationResults.review_order``, and
+    only the rows of the current page are sent to the browser. Edits are kept in a
+    sparse log, from row label to category, until they are saved.
 
     Args:
-        df (pd.DataFrame): The DataFrame containing the classification results.
-        text_column (str): The name of the text column.
+        results (ClassificationResults): The classification results.
         categories (list[str]): The list of categories.
+        edits (dict): The log of pending edits, updated in place.
+        prior_column (str, optional): A source column holding prior labels, shown
+            next to the predictions. Rows disagreeing with them come first.
 
     Returns:
-        pd.DataFrame: The DataFrame with the corrected classifications.
+        pd.Series: The pending category of each edited row, indexed like the
+            results.
     """
     st.subheader("Review and Correct Classifications")
+    st.caption(
+        "Rows most in need of a review come first: disagreements with prior labels, "
+        "then ambiguous rows, each from the lowest confidence up."
+    )
 
-    display_df = df[[text_column, "category"]].copy()
+    order = results.review_order(prior_column)
 
-    corrected_df = st.data_editor(
-        display_df,
+    col1, col2 = st.columns([5, 1])
+    page_size = col2.selectbox("Rows per page :", PAGE_SIZES, key="review_page_size")
+    pages = max(math.ceil(len(order) / page_size), 1)
+    if st.session_state.get("review_page", 1) > pages:
+        st.session_state.review_page = pages
+    page = col1.number_input(
+        f"Page (of {pages}) :", min_value=1, max_value=pages, key="review_page"
+    )
+
+    # The page is assembled once, with the pending edits, and kept while it is
+    # shown: the editor state is tied to its data.
+    view = (results.version, prior_column, page, page_size)
+    if st.session_state.get("review_view") != view:
+        positions = order[(page - 1) * page_size : page * page_size]
+        rows = results.table.index[positions]
+        page_df = pd.DataFrame(
+            {
+                "text": results.texts.iloc[positions].to_numpy(),
+                "category": [
+                    edits.get(row, category)
+                    for row, category in zip(
+                        rows, results.table["category"].iloc[positions], strict=True
+                    )
+                ],
+                "confidence": results.table["confidence"].iloc[positions].to_numpy(),
+                "ambiguities": results.table["ambiguities"]
+                .iloc[positions]
+                .list.len()
+                .fillna(0)
+                .to_numpy(dtype=int),
+            },
+            index=rows,
+        )
+        if prior_column is not None:
+            page_df["prior"] = results.source[prior_column].iloc[positions].to_numpy()
+        st.session_state.review_view = view
+        st.session_state.review_df = page_df
+
+    page_df = st.session_state.review_df
+    st.data_editor(
+        page_df,
         use_container_width=True,
         column_config={
-            text_column: st.column_config.TextColumn("Text", disabled=True),
+            "text": st.column_config.TextColumn("Text", disabled=True),
             "category": st.column_config.SelectboxColumn(
                 "Category", options=categories
             ),
+            "confidence": st.column_config.NumberColumn(
+                "Confidence", format="%.2f", disabled=True
+            ),
+            "ambiguities": st.column_config.NumberColumn("Ambiguities", disabled=True),
+            "prior": st.column_config.TextColumn("Prior label", disabled=True),
         },
-        column_order=[
-            text_column,
-            "category",
-        ],
         hide_index=True,
+        key="review-editor",
     )
 
-    corrected_df["user_corrected"] = corrected_df["category"] != df["category"]
+    current = results.table["category"]
+    for position, row in st.session_state["review-editor"]["edited_rows"].items():
+        category = row.get("category")
+        if category is None:
+            continue
+        label = page_df.index[position]
+        if category == current.at[label]:
+            edits.pop(label, None)
+        else:
+            edits[label] = category
 
-    if "user_corrected" not in corrected_df.columns:
-        corrected_df["user_corrected"] = False
+    st.caption(f"Pending corrections: {len(edits)}")
 
-    return corrected_df
+    return pd.Series(list(edits.values()), index=list(edits), dtype=object)
 
 
-def calculate_metrics(df: pd.DataFrame) -> dict | None:
-    """Calculate performance metrics if user corrections are available.
+def choose_rows_to_reclassify(
+    results: ClassificationResults, categories: dict[str, str]
+) -> tuple[pd.Index, bool]:
+    """Let users pick the rows to classify again, by condition.
 
     Args:
-        df (pd.DataFrame): The DataFrame containing the classification results.
+        results (ClassificationResults): The classification results.
+        categories (dict[str, str]): The current category set, compared with the
+            one the results were classified with.
 
     Returns:
-        dict | None: The metrics if user corrections are available, otherwise None.
+        tuple[pd.Index, bool]: The labels of the selected rows, and whether they
+            include every row a change of the category set may affect.
     """
-    if "user_corrected" not in df.columns or df["user_corrected"].sum() == 0:
-        return None
+    col1, col2 = st.columns(2)
+    with col1:
+        errors = st.checkbox("Errors", value=True, key="reclassify_errors")
+        undetermined = st.checkbox("Undetermined", key="reclassify_undetermined")
+        corrected = st.checkbox("Corrected by you", key="reclassify_corrected")
+    with col2:
+        below = st.slider(
+            "Confidence below:", 0.0, 1.0, 0.0, 0.05, key="reclassify_below"
+        )
+        predicted = st.multiselect(
+            "Predicted as:",
+            [str(c) for c in results.table["category"].cat.categories],
+            key="reclassify_categories",
+        )
+
+    rows = results.rows_matching(
+        errors=errors,
+        undetermined=undetermined,
+        below=below or None,
+        categories=predicted,
+        corrected=corrected,
+    )
+
+    changed = results.categories != categories
+    affected = changed and st.checkbox(
+        "Affected by the category changes",
+        value=True,
+        disabled=not changed,
+        key="reclassify_affected",
+        help="Rows in a removed or redescribed category or mentioning one in their "
+        "ambiguities and, when categories were added or redescribed, undetermined, "
+        "ambiguous and low-confidence rows.",
+    )
+    if affected:
+        rows = rows.union(
+            results.rows_affected_by(categories, settings.RECLASSIFY_MIN_CONFIDENCE)
+        )
 
-    total_samples = len(df)
-    corrected_samples = df["user_corrected"].sum()
-    accuracy = 1 - (corrected_samples / total_samples)
+    return rows, affected
 
-    metrics = {
-        "Total samples": total_samples,
-        "Corrected samples": corrected_samples,
-        "Accuracy": accuracy,
-    }
 
-    category_metrics = {}
-    for category in df["category"].unique():
-        cat_df = df[df["category"] == category]
-        cat_total = len(cat_df)
-        cat_corrected = cat_df["user_corrected"].sum()
-        cat_accuracy = 1 - (cat_corrected / cat_total) if cat_total > 0 else 1
+def calculate_metrics(evaluation: Evaluation) -> dict | None:
+    """Calculate performance metrics if user corrections or labels are available.
 
-        category_metrics[category] = {
-            "Total": cat_total,
-            "Corrected": cat_corrected,
-            "Accuracy": cat_accuracy,
-        }
+    Args:
+        evaluation (Evaluation): The predictions against the corrections, or
+            against a labelled column.
+
+    Returns:
+        dict | None: The metrics if user corrections or labels are available,
+            otherwise None.
+    """
+    if not evaluation.evaluated or not (evaluation.gold or evaluation.corrections):
+        return None
 
-    metrics["Per category"] = category_metrics
+    metrics = evaluation.summary()
+    metrics["Per category"] = evaluation.per_class()
+    metrics["Calibration"] = evaluation.calibration()
 
     return metrics
+
+
+def show_metrics(metrics: dict, title: str = "Model Performance Metrics") -> None:
+    """Show the performance metrics of the classification.
+
+    Args:
+        metrics (dict): The metrics returned by ``calculate_metrics``.
+        title (str): The heading of the metrics.
+    """
+    st.subheader(title)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Overall accuracy", f"{metrics['Accuracy']:.2%}")
+    col2.metric("Macro F1", f"{metrics['Macro F1']:.2f}")
+    col3.metric(
+        "Calibration error",
+        f"{metrics['Calibration error']:.3f}",
+        help="Gap between the confidence of the predictions and their accuracy, "
+        "averaged over confidence bins.",
+    )
+    col4.metric(
+        "Corrected samples",
+        f"{metrics['Corrected samples']:,}",
+        help=f"Out of {metrics['Total samples']:,} evaluated samples.",
+    )
+
+    st.subheader("Per-Category Performance")
+    st.dataframe(
+        metrics["Per category"],
+        use_container_width=True,
+        column_config={
+            "Precision": st.column_config.NumberColumn(format="%.2f"),
+            "Recall": st.column_config.NumberColumn(format="%.2f"),
+            "F1": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+    st.subheader("Confidence Calibration")
+    calibration = metrics["Calibration"]
+    st.line_chart(
+        calibration.loc[calibration["Rows"] > 0, ["Mean confidence", "Accuracy"]]
+    )
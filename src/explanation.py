@@ -1,48 +1,94 @@
+import math
+from collections.abc import Callable
+
 import pandas as pd
 import streamlit as st
 
+from src.results import SORT_ORDERS, ClassificationResults
+
+PAGE_SIZES = (25, 50, 100, 250)
+
 
-def show_detailed_results(df: pd.DataFrame, text_column: str) -> None:
+def show_detailed_results(
+    results: ClassificationResults,
+    request_details: Callable[[pd.Index], None] | None = None,
+) -> None:
     """Show detailed classification results with options to filter.
 
+    Filters are answered from the precomputed index of the results and only the
+    rows of the current page are assembled and sent to the browser.
+
     Args:
-        df (pd.DataFrame): The dataframe to show.
-        text_column (str): The column to show.
+        results (ClassificationResults): The results to show.
+        request_details (callable, optional): Called with the labels of the
+            label-only rows of the current page, to have their details generated.
     """
     st.subheader("Detailed Classification Results")
 
-    unique_categories = sorted(df["category"].unique().tolist())
-    all_categories = ["All", *unique_categories]
+    index = results.get_index()
+    text_column = results.text_column
+
+    all_categories = ["All", *sorted(index.categories)]
 
-    selected_category = st.selectbox("Filter by category :", all_categories)
+    col1, col2, col3 = st.columns([2, 2, 3])
+    selected_category = col1.selectbox("Filter by category :", all_categories)
+    order = col2.selectbox("Sort by :", SORT_ORDERS)
+    query = col3.text_input("Search text :")
 
     confidence_threshold = st.slider("Minimum confidence score :", 0.0, 1.0, 0.5, 0.1)
 
-    filtered_df = df.copy()
-    if selected_category != "All":
-        filtered_df = filtered_df[filtered_df["category"] == selected_category]
-    filtered_df = filtered_df[filtered_df["confidence"] >= confidence_threshold]
+    positions = index.select(
+        None if selected_category == "All" else selected_category,
+        confidence_threshold,
+        query.strip(),
+        order,
+    )
 
-    if not filtered_df.empty:
-        st.write(f"Total results: {len(filtered_df)}")
+    if len(positions):
+        col1, col2 = st.columns([5, 1])
+        page_size = col2.selectbox("Rows per page :", PAGE_SIZES)
+        pages = math.ceil(len(positions) / page_size)
 
-        display_df = filtered_df[
-            [text_column, "category", "confidence", "explanation"]
-        ].copy()
+        # Go back to the first page whenever the selection changes.
+        selection = (
+            results.version,
+            selected_category,
+            order,
+            query,
+            confidence_threshold,
+            page_size,
+        )
+        if st.session_state.get("results_selection") != selection:
+            st.session_state.results_selection = selection
+            st.session_state.results_page = 1
 
-        if "keywords" in filtered_df.columns and any(filtered_df["keywords"].notna()):
-            display_df["keywords"] = (
-                filtered_df["keywords"] if len(filtered_df["keywords"]) > 0 else None
-            )
+        page = col1.number_input(
+            f"Page (of {pages}) :", min_value=1, max_value=pages, key="results_page"
+        )
+        st.write(f"Total results: {len(positions)}")
 
-        if "ambiguities" in filtered_df.columns and any(
-            filtered_df["ambiguities"].notna()
-        ):
-            display_df["ambiguities"] = (
-                filtered_df["ambiguities"]
-                if len(filtered_df["ambiguities"]) > 0
-                else None
+        rows = positions[(page - 1) * page_size : page * page_size]
+
+        pending = results.pending_details(rows)
+        if not pending.empty:
+            if request_details is not None:
+                request_details(pending)
+            st.caption(
+                f"Explanations of {len(pending)} row(s) of this page are not "
+                "generated yet; they are requested in the background."
             )
+        display_df = results.to_frame(results.table.index[rows])[
+            [
+                text_column,
+                "category",
+                "confidence",
+                "explanation",
+                "keywords",
+                "ambiguities",
+                "model",
+                "cluster_id",
+            ]
+        ]
 
         st.dataframe(
             display_df,
@@ -58,6 +104,12 @@ def show_detailed_results(df: pd.DataFrame, text_column: str) -> None:
                 "ambiguities": st.column_config.JsonColumn(
                     "Ambiguities", width="medium"
                 ),
+                "model": st.column_config.TextColumn("Model"),
+                "cluster_id": st.column_config.NumberColumn(
+                    "Cluster",
+                    help="The row whose label near-duplicates of it received",
+                    format="%d",
+                ),
             },
             hide_index=True,
         )
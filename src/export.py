@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+
+import streamlit as st
+
+from src.pipeline import ResultWriter
+from src.results import ClassificationResults
+
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "CSV (zstd)": (".csv.zst", "application/zstd"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "JSONL": (".jsonl", "application/jsonl"),
+}
+
+
+def export_results(
+    results: ClassificationResults, export_format: str, chunksize: int = 50_000
+) -> Path:
+    """Write the results to a file, once per version of the results.
+
+    Rows are assembled and written chunk by chunk, so the full result table is
+    never materialised. Files are kept in a temporary directory tied to the
+    results and reused until the results change.
+
+    Args:
+        results (ClassificationResults): The results to export.
+        export_format (str): One of the names of ``EXPORT_FORMATS``.
+        chunksize (int): The number of rows assembled at a time.
+
+    Returns:
+        Path: The exported file.
+    """
+    exports = results.exports
+    cached = exports.get(export_format)
+    if cached is not None and cached[0] == results.version:
+        return cached[1]
+
+    if results.export_dir is None:
+        results.export_dir = Path(tempfile.mkdtemp(prefix="classification-export-"))
+        weakref.finalize(results, shutil.rmtree, results.export_dir, True)
+
+    suffix, _ = EXPORT_FORMATS[export_format]
+    path = results.export_dir / f"classification_results_v{results.version}{suffix}"
+    index = results.table.index
+    with ResultWriter(path) as writer:
+        for start in range(0, len(index), chunksize):
+            writer.write(results.to_frame(index[start : start + chunksize]))
+
+    if cached is not None:
+        cached[1].unlink(missing_ok=True)
+    exports[export_format] = (results.version, path)
+
+    return path
+
+
+def show_downloads(results: ClassificationResults) -> None:
+    """Let the user download the results in the format of their choice.
+
+    The file is only built when the user asks for it, and is reused on reruns until
+    the results change.
+
+    Args:
+        results (ClassificationResults): The results to export.
+    """
+    col1, col2 = st.columns([2, 3])
+    export_format = col1.selectbox("Export format:", list(EXPORT_FORMATS))
+    suffix, mimetype = EXPORT_FORMATS[export_format]
+
+    cached = results.exports.get(export_format)
+    if cached is None or cached[0] != results.version:
+        if col2.button(f"Prepare {export_format} file", key="prepare-export"):
+            with st.spinner("Writing the results..."):
+                export_results(results, export_format)
+            st.rerun()
+        return
+
+    with open(cached[1], "rb") as f:
+        col2.download_button(
+            f"Download Results as {export_format}",
+            f,
+            f"classification_results{suffix}",
+            mimetype,
+            key="download-results",
+        )
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from itertools import pairwise
+from pathlib import Path
+from typing import ClassVar
+
+import numpy as np
+
+from src.core.config import settings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class LexicalClassifier:
+    """Lightweight in-process classifier answering easy rows without the LLM.
+
+    Texts are turned into hashed TF-IDF vectors of unigrams and bigrams and
+    assigned to the nearest category centroid. The model only keeps per-category
+    sums of term frequencies and document frequencies, so it is trained
+    incrementally and stays a few megabytes regardless of how many rows it saw.
+    """
+
+    _instances: ClassVar[dict[Path, "LexicalClassifier"]] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        n_features: int = 2**17,
+        min_examples: int = 5,
+        temperature: float = 0.1,
+    ):
+        self.path = Path(path) if path else None
+        self.n_features = n_features
+        self.min_examples = min_examples
+        self.temperature = temperature
+        self.labels: list[str] = []
+        self.counts = np.zeros(0, dtype=np.float64)
+        self.sums = np.zeros((n_features, 0), dtype=np.float32)
+        self.document_frequency = np.zeros(n_features, dtype=np.float32)
+        self.documents = 0.0
+        self._lock = threading.Lock()
+        self._model = None
+
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    @classmethod
+    def for_categories(cls, categories_info: str) -> "LexicalClassifier":
+        """Get the model trained for a category set, shared within the process.
+
+        Args:
+            categories_info (str): The rendered category set.
+
+        Returns:
+            LexicalClassifier: The model, loaded from disk if it was saved before.
+        """
+        key = hashlib.sha256(categories_info.encode("utf-8")).hexdigest()[:16]
+        path = Path(settings.LEXICAL_DIR) / f"{key}.npz"
+
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def _features(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        tokens = TOKEN_PATTERN.findall(str(text).lower())
+        terms = tokens + [f"{a} {b}" for a, b in pairwise(tokens)]
+        if not terms:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        hashed = np.fromiter(
+            (zlib.crc32(term.encode("utf-8")) % self.n_features for term in terms),
+            dtype=np.int64,
+            count=len(terms),
+        )
+        indices, counts = np.unique(hashed, return_counts=True)
+        values = np.log1p(counts).astype(np.float32)
+        return indices, values / np.linalg.norm(values)
+
+    def _label_index(self, label: str) -> int:
+        if label not in self.labels:
+            self.labels.append(label)
+            self.counts = np.append(self.counts, 0.0)
+            self.sums = np.hstack(
+                [self.sums, np.zeros((self.n_features, 1), dtype=np.float32)]
+            )
+        return self.labels.index(label)
+
+    def partial_fit(
+        self, texts: list[str], labels: list[str], weight: float = 1.0
+    ) -> None:
+        """Add labelled examples to the model.
+
+        Args:
+            texts (list[str]): The example texts.
+            labels (list[str]): The category of each text.
+            weight (float): How much each example counts, e.g. more for user
+                corrections than for model outputs.
+        """
+        with self._lock:
+            for text, label in zip(texts, labels, strict=True):
+                indices, values = self._features(text)
+                if not len(indices):
+                    continue
+                column = self._label_index(label)
+                self.sums[indices, column] += weight * values
+                self.counts[column] += weight
+                self.document_frequency[indices] += weight
+                self.documents += weight
+            self._model = None
+
+    def _centroids(self) -> tuple[np.ndarray, np.ndarray] | None:
+        if self._model is not None:
+            return self._model
+
+        trained = self.counts >= self.min_examples
+        if trained.sum() < 2:
+            return None
+
+        idf = np.log((1 + self.documents) / (1 + self.document_frequency)) + 1
+        centroids = self.sums * idf[:, None]
+        norms = np.linalg.norm(centroids, axis=0)
+        norms[norms == 0] = 1
+        centroids /= norms
+        centroids[:, ~trained] = 0
+
+        self._model = (centroids.astype(np.float32), idf.astype(np.float32))
+        return self._model
+
+    def predict(self, texts: list[str]) -> list[tuple[str, float] | None]:
+        """Predict the category of each text with a confidence score.
+
+        The confidence is a softmax over the cosine similarities to each trained
+        category centroid.
+
+        Args:
+            texts (list[str]): The texts to classify.
+
+        Returns:
+            list[tuple[str, float] | None]: The category and confidence of each text,
+                or None when the model has not seen enough examples or shares no
+                term with any category.
+        """
+        with self._lock:
+            model = self._centroids()
+            trained = self.counts >= self.min_examples
+
+        if model is None:
+            return [None] * len(texts)
+
+        centroids, idf = model
+        predictions = []
+        for text in texts:
+            indices, values = self._features(text)
+            vector = values * idf[indices]
+            norm = np.linalg.norm(vector)
+            if not norm:
+                predictions.append(None)
+                continue
+
+            similarities = (vector / norm) @ centroids[indices]
+            if similarities.max() <= 0:
+                predictions.append(None)
+                continue
+
+            scores = np.where(trained, similarities / self.temperature, -np.inf)
+            probabilities = np.exp(scores - scores.max())
+            probabilities /= probabilities.sum()
+
+            best = int(probabilities.argmax())
+            predictions.append((self.labels[best], float(probabilities[best])))
+
+        return predictions
+
+    def save(self) -> None:
+        """Persist the model next to the other cached data."""
+        if self.path is None:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several processes may share the model; never expose a half-written file.
+        tmp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp.npz")
+        with self._lock:
+            np.savez_compressed(
+                tmp_path,
+                labels=np.array(self.labels, dtype=str),
+                counts=self.counts,
+                sums=self.sums,
+                document_frequency=self.document_frequency,
+                documents=np.array(self.documents),
+            )
+        tmp_path.replace(self.path)
+
+    def _load(self) -> None:
+        with np.load(self.path) as data:
+            self.labels = data["labels"].tolist()
+            self.counts = data["counts"]
+            self.sums = data["sums"]
+            self.document_frequency = data["document_frequency"]
+            self.documents = float(data["documents"])
+            self.n_features = self.sums.shape[0]
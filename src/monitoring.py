@@ -0,0 +1,118 @@
+import json
+
+import pandas as pd
+import streamlit as st
+
+from src.core.cascade import cascade_savings
+from src.core.telemetry import RunMetrics
+
+
+def _seconds(value: float | None) -> str:
+    if value is None:
+        return "—"
+    return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.2f} s"
+
+
+def show_run_estimate(estimate: dict) -> None:
+    """Show the estimated size and cost of a run before it starts.
+
+    Args:
+        estimate (dict): The estimate, see ``TextClassifier.estimate_run``.
+    """
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Distinct texts", f"{estimate['Texts']:,}")
+    col2.metric("Requests", f"{estimate['Requests']:,}")
+    col3.metric(
+        "Tokens",
+        f"{estimate['Prompt tokens'] + estimate['Completion tokens']:,}",
+        help=f"{estimate['Prompt tokens']:,} prompt, "
+        f"{estimate['Completion tokens']:,} completion",
+    )
+    col4.metric("Estimated cost", f"${estimate['Estimated cost']:,.2f}")
+    st.caption(
+        f"{estimate['Long texts']:,} texts are over the token budget. Cached "
+        "results, local answers and near-duplicates can only lower these figures."
+    )
+
+
+def show_run_metrics(
+    metrics: RunMetrics, key: str, models: list[str] | None = None
+) -> None:
+    """Show the telemetry of a classification run, with JSON and Prometheus exports.
+
+    Args:
+        metrics (RunMetrics): The telemetry of the run.
+        key (str): A key unique to the run, for the widgets.
+        models (list[str], optional): The models of the run, cheapest first for a
+            cascade. Defaults to the order in which they first answered.
+    """
+    summary = metrics.summary()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requests", summary["Requests"])
+    col1.metric("Rows/s", f"{summary['Rows/s']:.1f}")
+    col2.metric("Latency p50", _seconds(summary["Latency p50"]))
+    col2.metric("Latency p95", _seconds(summary["Latency p95"]))
+    col3.metric("Queue wait p95", _seconds(summary["Queue wait p95"]))
+    col3.metric("Retries", summary["Retries"])
+    col4.metric(
+        "Tokens",
+        f"{summary['Prompt tokens'] + summary['Completion tokens']:,}",
+        help=f"{summary['Prompt tokens']:,} prompt, "
+        f"{summary['Completion tokens']:,} completion",
+    )
+    col4.metric("Parse failures", summary["Parse failures"])
+
+    st.caption(
+        f"Latency p99: {_seconds(summary['Latency p99'])} · "
+        f"Queue wait p50: {_seconds(summary['Queue wait p50'])} · "
+        f"Throttled: {summary['Throttled']} · "
+        f"Request error rate: {summary['Error rate']:.1%}"
+    )
+
+    if metrics.stages:
+        st.write("Time per stage:")
+        st.dataframe(
+            pd.DataFrame(
+                {"Seconds": metrics.stages.values()}, index=list(metrics.stages)
+            ),
+            use_container_width=False,
+        )
+
+    models = models or list(metrics.models)
+    if metrics.models:
+        st.write("Models:")
+        st.dataframe(
+            pd.DataFrame.from_dict(metrics.models, orient="index")
+            .reindex(
+                [model for model in models if model in metrics.models]
+                + [model for model in metrics.models if model not in models]
+            )
+            .rename(columns=lambda name: name.replace("_", " ").capitalize()),
+            use_container_width=True,
+        )
+    if savings := cascade_savings(metrics, models):
+        seconds = savings["Request seconds saved"]
+        st.caption(
+            f"Cascade: {savings['Answered early']:,} texts answered before the last "
+            f"model, saving about {savings['Tokens saved']:,} of its tokens"
+            + (f" and {_seconds(seconds)} of request time" if seconds else "")
+            + f", for {savings['Tokens spent on escalated texts']:,} tokens spent "
+            "on texts that escalated."
+        )
+
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "Export as JSON",
+        json.dumps(metrics.to_dict(), indent=2),
+        f"telemetry_{key}.json",
+        "application/json",
+        key=f"telemetry-json-{key}",
+    )
+    col2.download_button(
+        "Export as Prometheus",
+        metrics.to_prometheus({"run": key}),
+        f"telemetry_{key}.prom",
+        "text/plain",
+        key=f"telemetry-prom-{key}",
+    )
@@ -0,0 +1,356 @@
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections.abc import Callable
+
+import pandas as pd
+from pydantic import ValidationError
+
+from src.classification import (
+    LABEL_FIELDS,
+    PENDING_DETAILS,
+    RESPONSE_FIELDS,
+    TextClassifier,
+    render_category_set,
+)
+from src.core.cache import ResultCache
+from src.schemas.analysis_schema import AnalysisSchema
+from src.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class MultiTaxonomyClassifier:
+    """Classify rows against several category sets and text columns at once.
+
+    Each row is sent in a single completion asking for one result per target, a
+    combination of a taxonomy (a named category set) and a text column, so N
+    targets cost one round-trip per row instead of N full runs. With a single
+    column, targets are named after their taxonomy, otherwise
+    ``"<taxonomy> / <column>"``.
+
+    Identical rows are only sent once. Results are cached per target under the
+    same key as a single-taxonomy run of the same text, so either kind of run
+    serves the other; a row is only sent when one of its targets is missing.
+    Packs, the lexical stage, near-duplicates and the cascade are not used: the
+    request goes to ``classifier.model``, with long texts truncated whatever the
+    classifier's long-text strategy.
+    """
+
+    def __init__(
+        self,
+        classifier: TextClassifier,
+        taxonomies: dict[str, dict[str, str]],
+        columns: list[str],
+    ):
+        if not taxonomies:
+            raise ValueError("At least one taxonomy is required")
+        if not columns:
+            raise ValueError("At least one text column is required")
+        self.classifier = classifier
+        self.taxonomies = taxonomies
+        self.columns = list(columns)
+        self.rendered = {
+            name: render_category_set(categories)
+            for name, categories in taxonomies.items()
+        }
+        self.last_run_stats = {}
+
+    @property
+    def targets(self) -> list[tuple[str, str, str]]:
+        """The name, taxonomy and column of each result of a row."""
+        return [
+            (
+                taxonomy if len(self.columns) == 1 else f"{taxonomy} / {column}",
+                taxonomy,
+                column,
+            )
+            for column in self.columns
+            for taxonomy in self.taxonomies
+        ]
+
+    @property
+    def signature(self) -> str:
+        """The signature of the results, as sent: to the first model, truncated."""
+        classifier = copy.copy(self.classifier)
+        classifier.use_cascade([], classifier.escalation)
+        classifier.use_long_texts(classifier.max_text_tokens, "truncate")
+        return classifier.signature
+
+    def row_messages(self, fields: dict[str, str]) -> list[dict[str, str]]:
+        """Build the conversation that classifies a row against every taxonomy.
+
+        Args:
+            fields (dict[str, str]): The non-empty texts of the row, by column.
+
+        Returns:
+            list[dict[str, str]]: The system and user messages.
+        """
+        keys = [name for name, _, column in self.targets if column in fields]
+        taxonomies_info = "\n\n".join(
+            f'Taxonomy "{name}":\n{rendered}'
+            for name, rendered in self.rendered.items()
+        )
+        response_fields = (
+            LABEL_FIELDS if self.classifier.label_only else RESPONSE_FIELDS
+        )
+
+        if len(self.columns) == 1:
+            scope = (
+                "Classify the provided text against EACH of the following taxonomies"
+            )
+            text = self.classifier.fit_text(next(iter(fields.values())))
+        else:
+            scope = (
+                "The text is made of fields, each starting with its name in square "
+                "brackets. Classify EACH field on its own against EACH of the "
+                "following taxonomies"
+            )
+            text = "\n" + "\n".join(
+                f"[{column}] {self.classifier.fit_text(value)}"
+                for column, value in fields.items()
+            )
+
+        system_message = f"""You are a text classification system.
+        {scope}, selecting ONE category of each:
+
+{taxonomies_info}
+
+        If a text could fit multiple categories of a taxonomy, select the MOST appropriate one.
+
+        Respond in JSON format with a single field "results": an object with exactly one entry for each of these keys: {json.dumps(keys)}
+        Each entry has these fields:
+        {response_fields}
+        """
+
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"Text to classify: {text}"},
+        ]
+
+    def parse_results(
+        self, content: str | None, keys: list[str]
+    ) -> dict[str, AnalysisSchema]:
+        """Parse the answer to the conversation of ``row_messages``.
+
+        Args:
+            content (str | None): The content of the completion.
+            keys (list[str]): The targets asked for.
+
+        Returns:
+            dict[str, AnalysisSchema]: The result of each target, an error result
+                for the targets missing from the answer or invalid.
+        """
+        classifier = self.classifier
+        try:
+            items = json.loads(content)["results"]
+            if not isinstance(items, dict):
+                raise TypeError(
+                    f"expected an object of results, got {type(items).__name__}"
+                )
+        except (ValueError, TypeError, KeyError) as e:
+            classifier.metrics.count("parse_failures")
+            logger.warning("Unparseable classification: %s", e)
+            return dict.fromkeys(
+                keys, classifier.error_result(f"invalid response: {e!s}")
+            )
+
+        results = {}
+        for key in keys:
+            try:
+                results[key] = AnalysisSchema(
+                    **{
+                        **items[key],
+                        **(PENDING_DETAILS if classifier.label_only else {}),
+                        "stage": "llm",
+                        "model": classifier.model,
+                    }
+                )
+            except (KeyError, TypeError, ValidationError) as e:
+                classifier.metrics.count("parse_failures")
+                results[key] = classifier.error_result(
+                    f"invalid result for {key}: {e!s}"
+                )
+        return results
+
+    async def classify_row(
+        self, texts: tuple[str | None, ...]
+    ) -> dict[str, AnalysisSchema]:
+        """Classify a row against every taxonomy with a single completion.
+
+        Args:
+            texts (tuple[str | None, ...]): The text of each column, None if empty.
+
+        Returns:
+            dict[str, AnalysisSchema]: The result of each target. Targets of empty
+                columns get the empty result.
+        """
+        classifier = self.classifier
+        fields = {
+            column: text
+            for column, text in zip(self.columns, texts, strict=True)
+            if text is not None
+        }
+        results = {
+            name: classifier.empty_result()
+            for name, _, column in self.targets
+            if column not in fields
+        }
+        keys = [name for name, _, column in self.targets if column in fields]
+
+        messages = self.row_messages(fields)
+        completion_tokens, max_tokens = classifier.completion_budget(len(keys))
+        try:
+            response = await classifier.scheduler.run(
+                lambda: classifier.complete(messages, max_tokens=max_tokens),
+                estimated_tokens=estimate_tokens(
+                    messages[0]["content"] + messages[1]["content"]
+                )
+                + completion_tokens,
+                metrics=classifier.metrics,
+            )
+        except Exception as e:
+            logger.warning("Classification error: %s", e)
+            return {**results, **dict.fromkeys(keys, classifier.error_result(str(e)))}
+
+        return {
+            **results,
+            **self.parse_results(response.choices[0].message.content, keys),
+        }
+
+    async def classify(
+        self, df: pd.DataFrame, progress_callback: Callable | None = None
+    ) -> dict[str, list[AnalysisSchema]]:
+        """Classify the rows of a DataFrame against every taxonomy.
+
+        Args:
+            df (pd.DataFrame): The rows, with every text column.
+            progress_callback (callable, optional): A callback function to report
+                progress.
+
+        Returns:
+            dict[str, list[AnalysisSchema]]: The result of each row, by target.
+        """
+        start_time = time.perf_counter()
+        classifier = self.classifier
+        total = len(df)
+        targets = self.targets
+        results: dict[str, list[AnalysisSchema | None]] = {
+            name: [None] * total for name, _, _ in targets
+        }
+        completed = 0
+
+        def assign(indices: list[int], row: dict[str, AnalysisSchema]) -> None:
+            nonlocal completed
+            for name, result in row.items():
+                for i in indices:
+                    results[name][i] = result
+            completed += len(indices)
+            if progress_callback and total:
+                progress_callback(completed / total)
+
+        pending: dict[tuple[str | None, ...], list[int]] = {}
+        empty_rows = []
+        columns = [df[column].tolist() for column in self.columns]
+        for i, values in enumerate(zip(*columns, strict=True)):
+            texts = tuple(
+                None if classifier.is_empty(value) else str(value) for value in values
+            )
+            if all(text is None for text in texts):
+                empty_rows.append(i)
+            else:
+                pending.setdefault(texts, []).append(i)
+        assign(empty_rows, {name: classifier.empty_result() for name, _, _ in targets})
+
+        signature = self.signature
+
+        def key(texts: tuple[str | None, ...], taxonomy: str, column: str) -> str:
+            return ResultCache.make_key(
+                signature,
+                self.rendered[taxonomy],
+                texts[self.columns.index(column)],
+            )
+
+        cache_hits = 0
+        if classifier.cache is not None and pending:
+            keys = [
+                key(texts, taxonomy, column)
+                for texts in pending
+                for _, taxonomy, column in targets
+                if texts[self.columns.index(column)] is not None
+            ]
+            cached = await asyncio.to_thread(classifier.cache.get_many, keys)
+            for texts in list(pending):
+                row = {}
+                for name, taxonomy, column in targets:
+                    if texts[self.columns.index(column)] is None:
+                        row[name] = classifier.empty_result()
+                    elif (
+                        result := cached.get(key(texts, taxonomy, column))
+                    ) is not None:
+                        row[name] = result.model_copy(update={"stage": "cache"})
+                if len(row) == len(targets):
+                    indices = pending.pop(texts)
+                    cache_hits += len(indices)
+                    assign(indices, row)
+
+        errors = 0
+        # Written to the cache in one transaction at the end, off the event loop.
+        to_cache: list[tuple[str, AnalysisSchema]] = []
+
+        async def process(texts: tuple[str | None, ...]) -> None:
+            nonlocal errors
+            row = await self.classify_row(texts)
+            if classifier.cache is not None:
+                for name, taxonomy, column in targets:
+                    result = row[name]
+                    if result.category not in ("Error", "Empty"):
+                        to_cache.append((key(texts, taxonomy, column), result))
+            if any(result.category == "Error" for result in row.values()):
+                errors += len(pending[texts])
+            assign(pending[texts], row)
+
+        await asyncio.gather(*[process(texts) for texts in pending])
+        if classifier.cache is not None:
+            await asyncio.to_thread(classifier.cache.set_many, to_cache)
+
+        self.last_run_stats = {
+            "Rows": total,
+            "Targets": len(targets),
+            "Model calls": len(pending),
+            "Duplicates": total - len(empty_rows) - cache_hits - len(pending),
+            "Cache hits": cache_hits,
+            "Empty": len(empty_rows),
+            "Errors": errors,
+        }
+        classifier.metrics.count("rows", total)
+        classifier.metrics.add_stage("classify", time.perf_counter() - start_time)
+
+        return results
+
+
+def attach_target_results(
+    df: pd.DataFrame, results: dict[str, list[AnalysisSchema]]
+) -> pd.DataFrame:
+    """Build the results table of a DataFrame classified against several targets.
+
+    Args:
+        df (pd.DataFrame): The classified rows.
+        results (dict[str, list[AnalysisSchema]]): The result of each row, by
+            target, see ``MultiTaxonomyClassifier.classify``.
+
+    Returns:
+        pd.DataFrame: A copy of the rows followed by a category, confidence and
+            explanation column for each target.
+    """
+    frame = df.copy()
+    for name, target_results in results.items():
+        frame[f"{name} category"] = [r.category for r in target_results]
+        frame[f"{name} confidence"] = [r.confidence for r in target_results]
+        # Typed as strings, so label-only chunks keep the column type of Parquet.
+        frame[f"{name} explanation"] = pd.array(
+            [r.explanation for r in target_results], dtype="string"
+        )
+    return frame
@@ -0,0 +1,205 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Multiplier mixing hashes into a single 64-bit value, wrapping on overflow.
+MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize(words: pa.Array) -> pa.Array:
+    """Normalise words so that trivial variations do not set texts apart.
+
+    Words are lowercased and stripped of everything but letters, so punctuation
+    and numbers, e.g. order numbers or dates, are dropped.
+
+    Args:
+        words (pa.Array): The whitespace-separated words of the texts.
+
+    Returns:
+        pa.Array: The normalised words, empty for words without letters.
+    """
+    return pc.replace_substring_regex(pc.utf8_lower(words), r"[^\pL]+", "")
+
+
+class NearDuplicateClusterer:
+    """Group texts whose word bigrams mostly overlap, in near-linear time.
+
+    Each text gets a MinHash signature of the hashed word bigrams of its normalised
+    form. Signatures are cut into bands, and texts sharing a band in full become
+    candidates (locality-sensitive hashing); candidates are only joined when the
+    fraction of equal signature values, an estimate of their Jaccard similarity,
+    reaches the threshold. Every step is a vectorised pass over the texts or their
+    bigrams, so millions of texts cluster in seconds.
+    """
+
+    def __init__(self, threshold: float = 0.9, permutations: int = 64, seed: int = 1):
+        self.threshold = threshold
+        self.permutations = permutations
+        generator = np.random.default_rng(seed)
+        # Multiply-shift hash functions, h(x) = (a * x + b) >> 32 with odd a.
+        self._a = generator.integers(0, 2**64, permutations, np.uint64) | np.uint64(1)
+        self._b = generator.integers(0, 2**64, permutations, np.uint64)
+        self.bands, self.rows = self._banding()
+
+    def _banding(self) -> tuple[int, int]:
+        # The similarity at which two texts become candidates with probability
+        # 1/2 is about (1 / bands) ** (1 / rows); keep it just below the threshold
+        # so that few true near-duplicates are missed.
+        options = [
+            (self.permutations // rows, rows)
+            for rows in range(1, self.permutations + 1)
+        ]
+        below = [
+            (bands, rows)
+            for bands, rows in options
+            if (1 / bands) ** (1 / rows) <= self.threshold
+        ]
+        return max(below or options[:1], key=lambda option: option[1])
+
+    def signatures(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Compute the MinHash signature of each text.
+
+        Args:
+            texts (list[str]): The texts.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The signatures, one row of
+                ``permutations`` values per text, and whether each text has any
+                word to compare; the signatures of the others are meaningless.
+        """
+        tokens = pc.utf8_split_whitespace(pa.array(texts, pa.string()))
+        words = pc.list_flatten(tokens).dictionary_encode()
+        # Only the distinct words are normalised and hashed.
+        vocabulary = normalize(words.dictionary)
+        known = pc.not_equal(vocabulary, "").to_numpy(zero_copy_only=False)
+        vocabulary = pd.util.hash_array(vocabulary.to_numpy(zero_copy_only=False))
+
+        codes = words.indices.to_numpy()
+        present = known[codes]
+        parents = pc.list_parent_indices(tokens).to_numpy()[present]
+        hashes = vocabulary[codes[present]]
+
+        # Shingles are word bigrams, or the single word of one-word texts.
+        same_text = parents[:-1] == parents[1:]
+        counts = np.bincount(parents, minlength=len(texts))
+        single = counts[parents] == 1
+        with np.errstate(over="ignore"):
+            shingles = np.concatenate(
+                [hashes[:-1][same_text] * MIX ^ hashes[1:][same_text], hashes[single]]
+            )
+        owners = np.concatenate([parents[:-1][same_text], parents[single]])
+        order = np.argsort(owners, kind="stable")
+        shingles = shingles[order]
+        owners = owners[order]
+
+        # One row per hash function, so that each is reduced over contiguous data.
+        signatures = np.full((self.permutations, len(texts)), MAX_HASH, np.uint32)
+        has_words = np.bincount(owners, minlength=len(texts)) > 0
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        if not len(owners):
+            return np.ascontiguousarray(signatures.T), has_words
+
+        # Hash the shingles in slices of whole texts, in a buffer small enough to
+        # stay in the CPU cache.
+        slice_size = max(2**20 // self.permutations, 1)
+        # A text with more shingles than a slice gets a slice of its own.
+        firsts = np.searchsorted(starts, np.arange(0, len(owners), slice_size))
+        bounds = np.unique(np.r_[starts[firsts[firsts < len(starts)]], len(owners)])
+        longest = int(np.diff(bounds).max())
+        buffer = np.empty((self.permutations, longest), dtype=np.uint64)
+        for begin, end in itertools.pairwise(bounds):
+            values = buffer[:, : end - begin]
+            with np.errstate(over="ignore"):
+                np.multiply(self._a[:, None], shingles[None, begin:end], out=values)
+                values += self._b[:, None]
+            values >>= np.uint64(32)
+            local = starts[
+                np.searchsorted(starts, begin) : np.searchsorted(starts, end)
+            ]
+            signatures[:, owners[local]] = np.minimum.reduceat(
+                values, local - begin, axis=1
+            )
+
+        return np.ascontiguousarray(signatures.T), has_words
+
+    def cluster(self, texts: list[str]) -> np.ndarray:
+        """Find the representative of each text.
+
+        Args:
+            texts (list[str]): The texts, typically already free of exact duplicates.
+
+        Returns:
+            np.ndarray: For each text, the position of the text representing its
+                cluster: the first text of the cluster, itself if it has no
+                near-duplicate. Every member is at least ``threshold`` similar to
+                its representative.
+        """
+        count = len(texts)
+        signatures, has_words = self.signatures(texts)
+        candidates = np.flatnonzero(has_words)
+        if len(candidates) < 2:
+            return np.arange(count)
+
+        # Link each text to the first text sharing one of its bands.
+        sources, targets = [], []
+        for band in range(self.bands):
+            columns = signatures[candidates, band * self.rows : (band + 1) * self.rows]
+            keys = np.zeros(len(candidates), dtype=np.uint64)
+            with np.errstate(over="ignore"):
+                for column in columns.T:
+                    keys = keys * MIX + column
+            order = np.argsort(keys, kind="stable")
+            first = np.r_[True, keys[order][1:] != keys[order][:-1]]
+            leaders = order[np.flatnonzero(first)[np.cumsum(first) - 1]]
+            linked = order != leaders
+            sources.append(candidates[order[linked]])
+            targets.append(candidates[leaders[linked]])
+
+        # Texts sharing several bands are linked once.
+        links = np.unique(np.concatenate(sources) * count + np.concatenate(targets))
+        sources, targets = links // count, links % count
+        similar = self.similarity(signatures, sources, targets) >= self.threshold
+        sources, targets = sources[similar], targets[similar]
+
+        # Connected components, each labelled by its first text.
+        labels = np.arange(count)
+        while True:
+            previous = labels.copy()
+            np.minimum.at(labels, sources, labels[targets])
+            np.minimum.at(labels, targets, labels[sources])
+            labels = labels[labels]
+            if np.array_equal(labels, previous):
+                break
+
+        # Chains of similar texts may reach dissimilar ones; those stay apart.
+        members = np.flatnonzero(labels != np.arange(count))
+        far = self.similarity(signatures, members, labels[members]) < self.threshold
+        labels[members[far]] = members[far]
+
+        return labels
+
+    def similarity(
+        self, signatures: np.ndarray, left: np.ndarray, right: np.ndarray
+    ) -> np.ndarray:
+        """Estimate the Jaccard similarity of pairs of texts.
+
+        Args:
+            signatures (np.ndarray): The signatures of the texts.
+            left (np.ndarray): The positions of the first text of each pair.
+            right (np.ndarray): The positions of the second text of each pair.
+
+        Returns:
+            np.ndarray: The fraction of equal signature values of each pair.
+        """
+        similarity = np.empty(len(left), dtype=np.float32)
+        # Compared in slices, so that pairs are not all gathered at once.
+        for start in range(0, len(left), 2**16):
+            end = start + 2**16
+            similarity[start:end] = (
+                signatures[left[start:end]] == signatures[right[start:end]]
+            ).mean(axis=1)
+        return similarity
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import shutil
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.classification import TextClassifier
+from src.core.checkpoint import Checkpoint
+from src.results import AMBIGUITIES_TYPE, KEYWORDS_TYPE
+from src.utils.data import attach_results
+
+
+class ResultWriter:
+    """Append classified chunks to a CSV, JSONL or Parquet file.
+
+    The format is taken from the file suffix; ``.csv.gz``, ``.csv.zst`` and other
+    compressed CSV suffixes understood by pandas are supported. ``header=False``
+    omits the CSV header, for parts that are appended to another file.
+    """
+
+    def __init__(self, path: str | Path, header: bool = True):
+        self.path = Path(path)
+        self.header = header
+        self.rows = 0
+        self._parquet_writer = None
+        self._jsonl_file = None
+        self._zstd_stream = None
+
+        suffixes = self.path.suffixes
+        if ".parquet" in suffixes:
+            self.format = "parquet"
+        elif ".jsonl" in suffixes:
+            self.format = "jsonl"
+        elif ".csv" in suffixes:
+            self.format = "csv"
+        else:
+            raise ValueError(f"Unsupported output format: {self.path.name}")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Append a chunk of results.
+
+        Args:
+            df (pd.DataFrame): The results to append. Every chunk must have the same
+                columns as the first one.
+        """
+        if self.format == "csv" and self.path.suffix == ".zst":
+            # pandas needs the optional zstandard package; pyarrow ships the codec.
+            if self._zstd_stream is None:
+                self._zstd_stream = pa.CompressedOutputStream(str(self.path), "zstd")
+            self._zstd_stream.write(
+                df.to_csv(header=self.header and self.rows == 0, index=False).encode(
+                    "utf-8"
+                )
+            )
+
+        elif self.format == "csv":
+            df.to_csv(
+                self.path, mode="a", header=self.header and self.rows == 0, index=False
+            )
+
+        elif self.format == "jsonl":
+            if self._jsonl_file is None:
+                self._jsonl_file = open(self.path, "w", encoding="utf-8")  # noqa: SIM115
+            for record in df.to_dict(orient="records"):
+                self._jsonl_file.write(json.dumps(record, default=str) + "\n")
+
+        else:
+            if self._parquet_writer is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                # Inferred from the first chunk only, result columns would reject
+                # later chunks, e.g. ambiguities with other keys, or explanations
+                # after a chunk of label-only results.
+                for name, type_ in (
+                    ("explanation", pa.string()),
+                    ("keywords", KEYWORDS_TYPE),
+                    ("ambiguities", AMBIGUITIES_TYPE),
+                ):
+                    if name in schema.names:
+                        index = schema.get_field_index(name)
+                        schema = schema.set(index, pa.field(name, type_))
+                table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(
+                    df, schema=self._parquet_writer.schema, preserve_index=False
+                )
+            self._parquet_writer.write_table(table)
+
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """Flush and close the output file."""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._jsonl_file is not None:
+            self._jsonl_file.close()
+            self._jsonl_file = None
+        if self._zstd_stream is not None:
+            self._zstd_stream.close()
+            self._zstd_stream = None
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def classify_stream(
+    classifier: TextClassifier,
+    chunks: Iterable[pd.DataFrame],
+    text_column: str,
+    writer: ResultWriter,
+    chunk_callback: Callable[[pd.DataFrame], None] | None = None,
+    pack_size: int = 1,
+    chunks_in_flight: int = 2,
+    checkpoint: Checkpoint | None = None,
+) -> int:
+    """Classify a file chunk by chunk, writing results as soon as they are ready.
+
+    Chunks are read in a worker thread and fed through a bounded queue to
+    ``chunks_in_flight`` consumers, so reading, classification and writing overlap
+    while memory stays proportional to the chunk size. Results are written in
+    input order; a consumer does not start a chunk more than ``chunks_in_flight``
+    ahead of the next one to write, so a stalled chunk cannot make finished ones
+    pile up. The time spent loading, assembling and writing chunks is added to
+    ``classifier.metrics``.
+
+    Args:
+        classifier (TextClassifier): The classifier, with its categories set.
+        chunks (Iterable[pd.DataFrame]): The input chunks, e.g. from ``iter_file_chunks``.
+        text_column (str): The name of the text column.
+        writer (ResultWriter): Where to append the classified chunks.
+        chunk_callback (callable, optional): Called with each chunk of results once written.
+        pack_size (int): The maximum number of texts sent in a single request.
+        chunks_in_flight (int): The number of chunks classified concurrently.
+        checkpoint (Checkpoint, optional): Where completed rows are saved, keyed by
+            the chunk index. Rows already saved in it are not classified again.
+
+    Returns:
+        int: The number of rows written.
+    """
+    queue: asyncio.Queue[tuple[int, pd.DataFrame] | None] = asyncio.Queue(
+        maxsize=chunks_in_flight
+    )
+    finished: dict[int, pd.DataFrame] = {}
+    next_to_write = 0
+    written = asyncio.Condition()
+
+    metrics = classifier.metrics
+
+    def read_next(iterator: Iterator[pd.DataFrame]) -> pd.DataFrame | None:
+        with metrics.stage("load"):
+            return next(iterator, None)
+
+    async def produce() -> None:
+        iterator = iter(chunks)
+        sequence = 0
+        while (chunk := await asyncio.to_thread(read_next, iterator)) is not None:
+            await queue.put((sequence, chunk))
+            sequence += 1
+        for _ in range(chunks_in_flight):
+            await queue.put(None)
+
+    async def consume() -> None:
+        nonlocal next_to_write
+        while (item := await queue.get()) is not None:
+            sequence, chunk = item
+            async with written:
+                while sequence - next_to_write >= chunks_in_flight:
+                    await written.wait()
+            results = await classifier.batch_classify(
+                chunk[text_column].tolist(),
+                pack_size=pack_size,
+                checkpoint=checkpoint,
+                row_ids=chunk.index.tolist(),
+                save_lexical=False,
+            )
+            with metrics.stage("assemble"):
+                finished[sequence] = attach_results(chunk, text_column, results)
+
+            while next_to_write in finished:
+                results_df = finished.pop(next_to_write)
+                with metrics.stage("write"):
+                    await asyncio.to_thread(writer.write, results_df)
+                next_to_write += 1
+                async with written:
+                    written.notify_all()
+                if chunk_callback:
+                    chunk_callback(results_df)
+
+    async with asyncio.TaskGroup() as group:
+        group.create_task(produce())
+        for _ in range(chunks_in_flight):
+            group.create_task(consume())
+
+    await asyncio.to_thread(classifier.save_lexical)
+    return writer.rows
+
+
+def merge_parts(parts: list[Path], output: str | Path) -> None:
+    """Concatenate result files written by ``ResultWriter`` into a single file.
+
+    CSV and JSONL parts are copied byte for byte (compressed CSV parts are valid
+    concatenated streams), so they must have been written without a header except
+    for the first one. Parquet parts are rewritten row group by row group.
+
+    Args:
+        parts (list[Path]): The part files, in output order.
+        output (str | Path): The path of the merged file.
+    """
+    output = Path(output)
+
+    if ".parquet" in output.suffixes:
+        writer = None
+        try:
+            for part in parts:
+                parquet_file = pq.ParquetFile(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, parquet_file.schema_arrow)
+                for i in range(parquet_file.num_row_groups):
+                    writer.write_table(
+                        parquet_file.read_row_group(i).cast(writer.schema)
+                    )
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+
+    with open(output, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
@@ -0,0 +1,614 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.core.evaluation import Evaluation
+from src.schemas.analysis_schema import AnalysisSchema, DetailsSchema
+
+KEYWORDS_TYPE = pa.list_(pa.string())
+AMBIGUITIES_TYPE = pa.list_(pa.map_(pa.string(), pa.string()))
+# The entries of an ambiguity, as a list type that can be flattened.
+AMBIGUITY_ENTRIES_TYPE = pa.list_(
+    pa.struct([("key", pa.string()), ("value", pa.string())])
+)
+
+
+class ClassificationResults:
+    """Classification results stored column by column, next to their source rows.
+
+    The source DataFrame is referenced, not copied: results live in a compact table
+    sharing its index, with the category, stage and model as categoricals, the
+    confidence as float32, the near-duplicate cluster as a nullable integer and the
+    keywords and ambiguities as Arrow list arrays. Full
+    rows are only assembled for the rows being shown or exported.
+
+    ``version`` is incremented whenever the results change, so views derived from
+    them can be cached per version. Details generated later for label-only results,
+    see ``set_details``, leave it unchanged. ``categories`` holds the category set
+    the rows were classified with, to find the rows a change of it may affect.
+    """
+
+    def __init__(self, source: pd.DataFrame, text_column: str, table: pd.DataFrame):
+        self.source = source
+        self.text_column = text_column
+        self.table = table
+        self.version = 0
+        self.categories: dict[str, str] = {}
+        # Export files built for a version of the results, see src.export.
+        self.exports: dict[str, tuple[int, Path]] = {}
+        self.export_dir: Path | None = None
+        self._index: ResultIndex | None = None
+        self._evaluation: Evaluation | None = None
+        self._gold_evaluations: dict[str, Evaluation] = {}
+        self._review_orders: dict[str | None, np.ndarray] = {}
+
+        if "user_corrected" not in self.table.columns:
+            self.table["user_corrected"] = False
+        if "explained" not in self.table.columns:
+            self.table["explained"] = True
+
+    @classmethod
+    def from_schemas(
+        cls, source: pd.DataFrame, text_column: str, results: list[AnalysisSchema]
+    ) -> "ClassificationResults":
+        """Build the results of a classified DataFrame.
+
+        Args:
+            source (pd.DataFrame): The classified rows.
+            text_column (str): The name of the text column.
+            results (list[AnalysisSchema]): The classification result of each row.
+
+        Returns:
+            ClassificationResults: The results, indexed like ``source``.
+        """
+        keywords = pa.array(
+            [r.keywords or [] for r in results], type=KEYWORDS_TYPE, from_pandas=True
+        )
+        ambiguities = pa.array(
+            [_ambiguity_items(r.ambiguities) for r in results], type=AMBIGUITIES_TYPE
+        )
+
+        table = pd.DataFrame(
+            {
+                "category": pd.Categorical([r.category or "Unknown" for r in results]),
+                "confidence": np.fromiter(
+                    (r.confidence or 0.0 for r in results),
+                    dtype=np.float32,
+                    count=len(results),
+                ),
+                "explanation": pd.array(
+                    [r.explanation or "" if r.explained else None for r in results],
+                    dtype="string[pyarrow]",
+                ),
+                "keywords": pd.Series(keywords, dtype=pd.ArrowDtype(KEYWORDS_TYPE)),
+                "ambiguities": pd.Series(
+                    ambiguities, dtype=pd.ArrowDtype(AMBIGUITIES_TYPE)
+                ),
+                "stage": pd.Categorical([r.stage or "" for r in results]),
+                "model": pd.Categorical([r.model or "" for r in results]),
+                "cluster_id": pd.array([r.cluster_id for r in results], dtype="Int64"),
+                "explained": np.fromiter(
+                    (r.explained for r in results), dtype=bool, count=len(results)
+                ),
+            }
+        )
+        table.index = source.index
+
+        return cls(source, text_column, table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def get_index(self) -> "ResultIndex":
+        """Get the lookup index of the current version, building it if needed."""
+        if self._index is None or self._index.version != self.version:
+            self._index = ResultIndex(self)
+        return self._index
+
+    def get_evaluation(self, gold_column: str | None = None) -> Evaluation:
+        """Get the evaluation of the predictions, building it if needed.
+
+        Args:
+            gold_column (str, optional): A source column holding the true category
+                of the rows. Defaults to evaluating against the user corrections.
+
+        Returns:
+            Evaluation: The evaluation, kept for the next calls.
+        """
+        if self._evaluation is None:
+            # Built before the first correction, while the table holds predictions.
+            self._evaluation = Evaluation(
+                self.table["category"], self.table["confidence"].to_numpy()
+            )
+        if gold_column is None:
+            return self._evaluation
+
+        if gold_column not in self._gold_evaluations:
+            self._gold_evaluations[gold_column] = self._evaluation.against(
+                self.source[gold_column]
+            )
+        return self._gold_evaluations[gold_column]
+
+    def review_order(self, prior_column: str | None = None) -> np.ndarray:
+        """Order the rows by how much they need a review.
+
+        Rows whose prediction disagrees with a prior label come first, then rows
+        with ambiguities, each group from the lowest confidence up. The order only
+        depends on the predictions, so it is kept for the next calls.
+
+        Args:
+            prior_column (str, optional): A source column holding prior labels.
+
+        Returns:
+            np.ndarray: The positions of the rows, in review order.
+        """
+        if prior_column not in self._review_orders:
+            ambiguous = (
+                self.table["ambiguities"].list.len().fillna(0).to_numpy(dtype=int) > 0
+            )
+            if prior_column is None:
+                disagrees = np.zeros(len(self.table), dtype=bool)
+            else:
+                prior = self.get_evaluation(prior_column)
+                disagrees = (prior.truth >= 0) & (prior.truth != prior.predicted)
+
+            self._review_orders[prior_column] = np.lexsort(
+                (self.table["confidence"].to_numpy(), ~ambiguous, ~disagrees)
+            )
+        return self._review_orders[prior_column]
+
+    @property
+    def texts(self) -> pd.Series:
+        """The classified texts, without copying the source."""
+        return self.source[self.text_column]
+
+    def to_frame(self, rows: pd.Index | None = None) -> pd.DataFrame:
+        """Assemble full result rows, in the layout of the exported files.
+
+        Args:
+            rows (pd.Index, optional): The labels of the rows to assemble. Defaults
+                to every row; pass a page or a filtered selection to keep the
+                assembled frame small.
+
+        Returns:
+            pd.DataFrame: The source columns followed by ``original_text`` and the
+                result columns, with the keywords and ambiguities as Python lists.
+        """
+        if rows is None:
+            table, frame = self.table, self.source.copy()
+        else:
+            table, frame = self.table.loc[rows], self.source.loc[rows]
+
+        frame["original_text"] = frame[self.text_column]
+        frame["category"] = table["category"].astype(object)
+        # float32 values print with spurious digits once widened, e.g. in JSON.
+        frame["confidence"] = table["confidence"].astype(np.float64).round(6)
+        # Explanations not generated yet are left empty.
+        frame["explanation"] = table["explanation"].to_numpy(
+            dtype=object, na_value=None
+        )
+        frame["keywords"] = table["keywords"].tolist()
+        frame["ambiguities"] = [
+            [dict(item) for item in items] for items in table["ambiguities"].tolist()
+        ]
+        frame["stage"] = table["stage"].astype(object)
+        frame["model"] = table["model"].astype(object)
+        frame["cluster_id"] = table["cluster_id"]
+        frame["user_corrected"] = table["user_corrected"]
+
+        return frame
+
+    def pending_details(self, positions: np.ndarray) -> pd.Index:
+        """Find the rows whose details are not generated yet.
+
+        Args:
+            positions (np.ndarray): The positions of the rows to check, e.g. a page.
+
+        Returns:
+            pd.Index: The labels of the label-only rows among them.
+        """
+        explained = self.table["explained"].to_numpy()[positions]
+        return self.table.index[positions[~explained]]
+
+    def set_details(self, rows: pd.Index, details: list[DetailsSchema]) -> None:
+        """Store the details generated for label-only rows.
+
+        Each column is rebuilt with a single Arrow ``take``, whatever the number of
+        rows. The version is left unchanged, so pages and indexes are kept, but
+        review orders and exports built before are dropped.
+
+        Args:
+            rows (pd.Index): The labels of the explained rows.
+            details (list[DetailsSchema]): The details of each row.
+        """
+        if rows.empty:
+            return
+
+        positions = self.table.index.get_indexer(rows)
+        self.table["explanation"] = pd.arrays.ArrowStringArray(
+            _replace(
+                self.table["explanation"],
+                positions,
+                pa.array(
+                    [d.explanation or "" for d in details], type=pa.large_string()
+                ),
+            )
+        )
+        for name, type_, values in (
+            ("keywords", KEYWORDS_TYPE, [d.keywords or [] for d in details]),
+            (
+                "ambiguities",
+                AMBIGUITIES_TYPE,
+                [_ambiguity_items(d.ambiguities) for d in details],
+            ),
+        ):
+            self.table[name] = pd.Series(
+                _replace(self.table[name], positions, pa.array(values, type=type_)),
+                dtype=pd.ArrowDtype(type_),
+                index=self.table.index,
+            )
+        self.table.iloc[positions, self.table.columns.get_loc("explained")] = True
+        # Ambiguities weigh in the review order.
+        self._review_orders.clear()
+
+        for _, path in self.exports.values():
+            path.unlink(missing_ok=True)
+        self.exports.clear()
+
+    def rows_matching(
+        self,
+        errors: bool = False,
+        undetermined: bool = False,
+        below: float | None = None,
+        categories: list[str] | None = None,
+        corrected: bool = False,
+    ) -> pd.Index:
+        """Select the rows matching any of several conditions, e.g. to classify them
+        again.
+
+        Args:
+            errors (bool): Whether to select the rows that could not be classified.
+            undetermined (bool): Whether to select the "Undetermined" rows.
+            below (float, optional): Select the rows less confident than this.
+            categories (list[str], optional): Select the rows in these categories.
+            corrected (bool): Whether to select the rows users corrected.
+
+        Returns:
+            pd.Index: The labels of the selected rows, in row order.
+        """
+        category = self.table["category"]
+        selected = category.isin(
+            [
+                *(categories or []),
+                *(["Error"] if errors else []),
+                *(["Undetermined"] if undetermined else []),
+            ]
+        ).to_numpy()
+        if below is not None:
+            selected |= self.table["confidence"].to_numpy() < below
+        if corrected:
+            selected |= self.table["user_corrected"].to_numpy()
+        return self.table.index[selected]
+
+    def rows_affected_by(
+        self, categories: dict[str, str], min_confidence: float
+    ) -> pd.Index:
+        """Find the rows whose category may change with a new category set.
+
+        Rows in a removed or redescribed category, and rows whose ambiguities
+        mention one, may move. When categories are added or redescribed, the
+        "Undetermined" rows, the rows with ambiguities and the rows less confident
+        than ``min_confidence`` may move too. Other rows were classified confidently
+        into a category left as is, and are assumed to stay.
+
+        Args:
+            categories (dict[str, str]): The new category names and descriptions.
+            min_confidence (float): The confidence below which a row may move to an
+                added or redescribed category.
+
+        Returns:
+            pd.Index: The labels of the affected rows, in row order.
+        """
+        old = self.categories
+        touched = [
+            name
+            for name, description in old.items()
+            if categories.get(name) != description
+        ]
+        added = categories.keys() - old.keys()
+
+        selected = self.table["category"].isin(touched).to_numpy()
+        ambiguities = pa.array(self.table["ambiguities"].array)
+        # Maps cannot be flattened, lists of their entries can.
+        items = pc.list_flatten(ambiguities).cast(AMBIGUITY_ENTRIES_TYPE)
+        mentions = pc.is_in(
+            pc.list_flatten(items).field("value"), pa.array(touched, pa.string())
+        )
+        owners = pc.list_parent_indices(ambiguities).to_numpy()[
+            pc.list_parent_indices(items).to_numpy()[
+                mentions.to_numpy(zero_copy_only=False)
+            ]
+        ]
+        selected[owners] = True
+
+        if added or any(name in categories for name in touched):
+            selected |= self.table["category"].eq("Undetermined").to_numpy()
+            selected |= self.table["confidence"].to_numpy() < min_confidence
+            selected |= (
+                self.table["ambiguities"].list.len().fillna(0).to_numpy(dtype=int) > 0
+            )
+        return self.table.index[selected]
+
+    def replace_results(
+        self,
+        rows: pd.Index,
+        results: list[AnalysisSchema],
+        categories: dict[str, str] | None = None,
+    ) -> pd.Index:
+        """Merge new results of some rows, e.g. classified again, in place.
+
+        Rows users corrected keep their category, and only take the rest of the new
+        result; a correction the new prediction agrees with is undone. The
+        evaluation follows the new predictions.
+
+        Args:
+            rows (pd.Index): The labels of the rows.
+            results (list[AnalysisSchema]): The new result of each row.
+            categories (dict[str, str], optional): The category set every row now
+                reflects, when the rows are those affected by a change of it.
+
+        Returns:
+            pd.Index: The labels of the rows whose category changed.
+        """
+        if categories is not None:
+            self.categories = dict(categories)
+        if rows.empty:
+            return rows
+
+        # Built before the first change, while the table holds predictions.
+        evaluation = self.get_evaluation()
+        positions = self.table.index.get_indexer(rows)
+        new = ClassificationResults.from_schemas(
+            self.source.iloc[positions], self.text_column, results
+        ).table
+        previous = self.table["category"].iloc[positions].astype(object).to_numpy()
+        predicted = new["category"].astype(object).to_numpy()
+        corrected = self.table["user_corrected"].to_numpy()[positions]
+
+        evaluation.repredict(positions, list(predicted), new["confidence"].to_numpy())
+        self._gold_evaluations.clear()
+
+        for name in ("category", "stage", "model"):
+            column = self.table[name]
+            values = (
+                new[name]
+                if name != "category"
+                else pd.Series(np.where(corrected, previous, predicted))
+            )
+            missing = pd.Index(values.unique()).difference(column.cat.categories)
+            if not missing.empty:
+                self.table[name] = column.cat.add_categories(missing)
+            self.table.iloc[positions, self.table.columns.get_loc(name)] = (
+                values.to_numpy()
+            )
+        for name in ("confidence", "cluster_id", "explained"):
+            self.table.iloc[positions, self.table.columns.get_loc(name)] = new[
+                name
+            ].to_numpy()
+        self.table["explanation"] = pd.arrays.ArrowStringArray(
+            _replace(
+                self.table["explanation"],
+                positions,
+                pa.array(new["explanation"].array).cast(pa.large_string()),
+            )
+        )
+        for name, type_ in (
+            ("keywords", KEYWORDS_TYPE),
+            ("ambiguities", AMBIGUITIES_TYPE),
+        ):
+            self.table[name] = pd.Series(
+                _replace(self.table[name], positions, pa.array(new[name].array)),
+                dtype=pd.ArrowDtype(type_),
+                index=self.table.index,
+            )
+        self.table.iloc[positions, self.table.columns.get_loc("user_corrected")] = [
+            position in evaluation.corrections for position in positions
+        ]
+
+        self.version += 1
+        self._review_orders.clear()
+        for _, path in self.exports.values():
+            path.unlink(missing_ok=True)
+        self.exports.clear()
+
+        return rows[
+            self.table["category"].iloc[positions].astype(object).to_numpy() != previous
+        ]
+
+    def apply_corrections(self, categories: pd.Series) -> pd.Index:
+        """Replace the category of the rows users corrected.
+
+        Each correction is also recorded in the evaluation of the results, see
+        ``get_evaluation``.
+
+        Args:
+            categories (pd.Series): The category of each row after review, indexed
+                like the results. Rows may be left out.
+
+        Returns:
+            pd.Index: The labels of the rows whose category changed.
+        """
+        evaluation = self.get_evaluation()
+        positions = self.table.index.get_indexer(categories.index)
+        updated = np.fromiter(
+            (
+                evaluation.correct(position, category)
+                for position, category in zip(positions, categories, strict=True)
+            ),
+            dtype=bool,
+            count=len(positions),
+        )
+        changed = categories.index[updated]
+        if changed.empty:
+            return changed
+
+        new = categories.loc[changed]
+        column = self.table["category"]
+        missing = pd.Index(new.unique()).difference(column.cat.categories)
+        if not missing.empty:
+            self.table["category"] = column.cat.add_categories(missing)
+
+        self.table.loc[changed, "category"] = new
+        # Setting a row back to its prediction undoes its correction.
+        self.table.loc[changed, "user_corrected"] = [
+            position in evaluation.corrections for position in positions[updated]
+        ]
+        self.version += 1
+
+        return changed
+
+
+@dataclass
+class Reclassification:
+    """New results for some rows, as returned by a background job.
+
+    Attributes:
+        results (ClassificationResults): The results the rows belong to.
+        rows (pd.Index): The labels of the rows.
+        new_results (list[AnalysisSchema]): The new result of each row.
+        categories (dict[str, str] | None): The category set every row reflects
+            afterwards, see ``ClassificationResults.replace_results``.
+    """
+
+    results: ClassificationResults
+    rows: pd.Index
+    new_results: list[AnalysisSchema]
+    categories: dict[str, str] | None = None
+
+
+def _ambiguity_items(ambiguities: list | None) -> list[dict[str, str]]:
+    """Keep the well-formed items of an answer's ambiguities, as strings."""
+    return [
+        {str(k): str(v) for k, v in item.items()}
+        for item in ambiguities or []
+        if isinstance(item, dict)
+    ]
+
+
+def _replace(column: pd.Series, positions: np.ndarray, values: pa.Array) -> pa.Array:
+    """Replace the values of an Arrow-backed column at some positions."""
+    taken = np.arange(len(column))
+    taken[positions] = len(column) + np.arange(len(positions))
+    return pa.concat_arrays([pa.array(column.array), values]).take(taken)
+
+
+SORT_ORDERS = ("Confidence (high to low)", "Confidence (low to high)", "Row order")
+
+
+class ResultIndex:
+    """Precomputed lookups over a version of the results.
+
+    Rows are kept as positions sorted by confidence, overall and per category, so
+    a category and minimum-confidence filter is a binary search and a page is a
+    slice. Text searches are cached by query, and the per-category aggregates are
+    computed once.
+    """
+
+    def __init__(self, results: ClassificationResults, max_searches: int = 8):
+        self.version = results.version
+        self.max_searches = max_searches
+        self._texts = results.texts
+        self._searches: dict[str, np.ndarray] = {}
+
+        table = results.table
+        confidence = table["confidence"].to_numpy()
+        codes = table["category"].cat.codes.to_numpy()
+
+        order = np.argsort(confidence, kind="stable")
+        self.positions = order
+        self.confidence = confidence[order]
+
+        # Group the confidence order by category, keeping it within each group.
+        by_category = order[np.argsort(codes[order], kind="stable")]
+        bounds = np.searchsorted(
+            codes[by_category], np.arange(len(table["category"].cat.categories) + 1)
+        )
+        self.categories: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for code, name in enumerate(table["category"].cat.categories):
+            positions = by_category[bounds[code] : bounds[code + 1]]
+            if len(positions):
+                self.categories[name] = (positions, confidence[positions])
+
+        self.category_counts = pd.Series(
+            {name: len(positions) for name, (positions, _) in self.categories.items()},
+            dtype="int64",
+        ).sort_values(ascending=False)
+        self.mean_confidence = pd.Series(
+            {
+                name: float(values.mean())
+                for name, (_, values) in self.categories.items()
+            },
+            dtype="float64",
+        )
+
+    def search(self, query: str) -> np.ndarray:
+        """Find the rows whose text contains a query, ignoring case.
+
+        Args:
+            query (str): The text to look for.
+
+        Returns:
+            np.ndarray: A boolean mask over the rows, by position.
+        """
+        if query not in self._searches:
+            if len(self._searches) >= self.max_searches:
+                self._searches.pop(next(iter(self._searches)))
+            self._searches[query] = (
+                self._texts.astype(str)
+                .str.contains(query, case=False, regex=False)
+                .to_numpy(dtype=bool)
+            )
+        return self._searches[query]
+
+    def select(
+        self,
+        category: str | None = None,
+        min_confidence: float = 0.0,
+        query: str = "",
+        order: str = SORT_ORDERS[0],
+    ) -> np.ndarray:
+        """Select the positions of the rows matching filters.
+
+        Args:
+            category (str | None): The category to keep, or None for every category.
+            min_confidence (float): The minimum confidence to keep.
+            query (str): Text the rows must contain, or empty for every row.
+            order (str): One of ``SORT_ORDERS``.
+
+        Returns:
+            np.ndarray: The positions of the matching rows in the result table, in
+                the requested order. Without a query or row order this is a view
+                found by binary search, regardless of the number of rows.
+        """
+        if category is None:
+            positions, confidence = self.positions, self.confidence
+        elif category in self.categories:
+            positions, confidence = self.categories[category]
+        else:
+            return np.empty(0, dtype=np.intp)
+
+        start = np.searchsorted(confidence, np.float32(min_confidence), side="left")
+        positions = positions[start:]
+
+        if query:
+            positions = positions[self.search(query)[positions]]
+
+        if order == SORT_ORDERS[0]:
+            return positions[::-1]
+        if order == SORT_ORDERS[2]:
+            return np.sort(positions)
+        return positions
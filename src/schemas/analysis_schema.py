@@ -2,8 +2,36 @@ from pydantic import BaseModel
 
 
 class AnalysisSchema(BaseModel):
+    """The classification result of a text.
+
+    ``explained`` is False when only the category and confidence were requested:
+    the explanation, keywords and ambiguities are then not generated yet and are
+    None, see ``TextClassifier.explain``. ``cluster_id`` is set on the texts of a
+    cluster of near-duplicates, see ``TextClassifier.use_near_duplicates``.
+    """
+
     category: str | None
     confidence: float | None
     explanation: str | None
     keywords: list[str] | None
     ambiguities: list[dict[str, str]] | None
+    stage: str | None = None
+    model: str | None = None
+    explained: bool = True
+    cluster_id: int | None = None
+
+
+class PackedAnalysisSchema(AnalysisSchema):
+    index: int
+
+
+class DetailsSchema(BaseModel):
+    """The explanation of a text's category, generated after its classification."""
+
+    explanation: str | None
+    keywords: list[str] | None
+    ambiguities: list[dict[str, str]] | None
+
+
+class PackedDetailsSchema(DetailsSchema):
+    index: int
@@ -1,31 +1,110 @@
+import time
+from collections.abc import Iterator
+from typing import BinaryIO
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import streamlit as st
+from openpyxl import load_workbook
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+from src.results import ClassificationResults
+from src.schemas.analysis_schema import AnalysisSchema
+
+# Files with up to this many other columns keep them all by default.
+MAX_DEFAULT_COLUMNS = 20
+
+
+def sniff_file(uploaded_file: UploadedFile, rows: int = 5) -> pd.DataFrame | None:
+    """Read the header and the first rows of an uploaded Excel or CSV file.
 
-def load_file(uploaded_file: UploadedFile) -> pd.DataFrame | None:
-    """Load data from an uploaded Excel or CSV file.
+    Only the start of the file is parsed, enough to pick the columns to load.
 
     Args:
-        uploaded_file (UploadedFile): The uploaded file to load.
+        uploaded_file (UploadedFile): The uploaded file.
+        rows (int): The number of rows to read.
 
     Returns:
-        pd.DataFrame | None: The loaded DataFrame or None if an error occurs.
+        pd.DataFrame | None: The first rows, or None if an error occurs.
     """
+    filename = uploaded_file.name
+    if not filename.endswith((".csv", ".xlsx", ".xls")):
+        st.error("Unsupported file format. Please upload a CSV or Excel file.")
+        return None
+
     try:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith((".xls", ".xlsx")):
-            df = pd.read_excel(uploaded_file)
+        uploaded_file.seek(0)
+        if filename.endswith(".csv"):
+            return pd.read_csv(uploaded_file, nrows=rows)
+        return next(iter_file_chunks(uploaded_file, filename, chunksize=rows))
+
+    except Exception as e:
+        st.error(f"Error loading file: {e!s}")
+        return None
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading the selected columns...")
+def _load_columns(
+    digest: str,  # noqa: ARG001 - identifies the file content in the cache key
+    filename: str,
+    columns: tuple[str, ...],
+    _file: BinaryIO,
+) -> tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    _file.seek(0)
+
+    if filename.endswith(".csv"):
+        try:
+            table = pa_csv.read_csv(
+                _file,
+                # Texts often span several lines within quotes.
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(include_columns=list(columns)),
+            )
+        except pa.ArrowInvalid:
+            table = None
+
+        # pyarrow reads text that is not UTF-8 as binary; pandas reports it.
+        if table is None or any(
+            pa.types.is_binary(field.type) for field in table.schema
+        ):
+            _file.seek(0)
+            df = pd.read_csv(_file, usecols=list(columns))
         else:
-            st.error("Unsupported file format. Please upload a CSV or Excel file.")
-            return None
+            df = table.to_pandas()
+    else:
+        df = pd.concat(
+            iter_file_chunks(_file, filename, columns=list(columns)),
+            ignore_index=True,
+        )
 
-        return df
+    return df[list(columns)], time.perf_counter() - start
 
+
+def load_columns(
+    uploaded_file: UploadedFile, digest: str, columns: list[str]
+) -> tuple[pd.DataFrame | None, float]:
+    """Load selected columns of an uploaded Excel or CSV file.
+
+    CSV files are parsed with pyarrow and ``.xlsx`` workbooks read in read-only
+    mode, skipping the other columns. The result is kept by file digest and columns
+    across reruns and sessions, so it must not be modified.
+
+    Args:
+        uploaded_file (UploadedFile): The uploaded file.
+        digest (str): The digest of the file content, identifying it in the cache.
+        columns (list[str]): The columns to load, in file order.
+
+    Returns:
+        tuple[pd.DataFrame | None, float]: The loaded DataFrame, or None if an error
+            occurs, and the seconds it took to parse it.
+    """
+    try:
+        return _load_columns(digest, uploaded_file.name, tuple(columns), uploaded_file)
     except Exception as e:
         st.error(f"Error loading file: {e!s}")
-        return None
+        return None, 0.0
 
 
 def get_text_column(df: pd.DataFrame) -> str:
@@ -43,6 +122,36 @@ def get_text_column(df: pd.DataFrame) -> str:
     return text_column
 
 
+def get_kept_columns(df: pd.DataFrame, text_column: str) -> list[str]:
+    """Let the user select the other columns to keep next to the results.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to select the columns from.
+        text_column (str): The name of the text column.
+
+    Returns:
+        list[str]: The columns to load, with the text column, in file order.
+    """
+    others = [column for column in df.columns if column != text_column]
+    if len(others) <= MAX_DEFAULT_COLUMNS:
+        default = others
+    else:
+        default = [
+            column
+            for column in others
+            if str(column).lower() in ("id", "key")
+            or str(column).lower().endswith("_id")
+        ]
+
+    kept = st.multiselect(
+        "Other columns to keep (IDs, labels...):",
+        others,
+        default=default,
+        help="Only the selected columns are loaded, and exported with the results.",
+    )
+    return [column for column in df.columns if column == text_column or column in kept]
+
+
 def sample_data(df: pd.DataFrame) -> pd.DataFrame:
     """Display a sample of the data for the user to review.
 
@@ -58,3 +167,93 @@ def sample_data(df: pd.DataFrame) -> pd.DataFrame:
     st.write(df.head())
 
     return df
+
+
+def iter_file_chunks(
+    file: str | BinaryIO,
+    filename: str,
+    chunksize: int = 10_000,
+    columns: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Excel file as a sequence of DataFrames.
+
+    CSV files are parsed incrementally by pandas and ``.xlsx`` workbooks are read
+    row by row with openpyxl in read-only mode, so only one chunk is held in memory
+    at a time. Legacy ``.xls`` files cannot be streamed and are split after loading.
+
+    Args:
+        file (str | BinaryIO): The path or file object to read.
+        filename (str): The file name, used to detect the format.
+        chunksize (int): The number of rows per chunk.
+        columns (list[str], optional): The columns to read. Defaults to all.
+
+    Yields:
+        pd.DataFrame: The consecutive chunks, indexed by their row number in the file.
+
+    Raises:
+        ValueError: If the file format is not supported.
+    """
+    if filename.endswith(".csv"):
+        yield from pd.read_csv(file, chunksize=chunksize, usecols=columns)
+
+    elif filename.endswith(".xlsx"):
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [
+                str(name) if name is not None else f"Unnamed: {i}"
+                for i, name in enumerate(next(rows, ()))
+            ]
+            if columns is not None:
+                positions = [header.index(column) for column in columns]
+                header = list(columns)
+            start = 0
+            batch = []
+            for row in rows:
+                if columns is not None:
+                    row = [row[i] if i < len(row) else None for i in positions]
+                batch.append(row)
+                if len(batch) == chunksize:
+                    yield pd.DataFrame(
+                        batch,
+                        columns=header,
+                        index=pd.RangeIndex(start, start + len(batch)),
+                    )
+                    start += len(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(
+                    batch,
+                    columns=header,
+                    index=pd.RangeIndex(start, start + len(batch)),
+                )
+        finally:
+            workbook.close()
+
+    elif filename.endswith(".xls"):
+        df = pd.read_excel(file, usecols=columns)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start : start + chunksize]
+
+    else:
+        raise ValueError(f"Unsupported file format: {filename}")
+
+
+def attach_results(
+    df: pd.DataFrame, text_column: str, results: list[AnalysisSchema]
+) -> pd.DataFrame:
+    """Build the results table of a classified DataFrame.
+
+    Args:
+        df (pd.DataFrame): The classified rows.
+        text_column (str): The name of the text column.
+        results (list[AnalysisSchema]): The classification result of each row.
+
+    Returns:
+        pd.DataFrame: A copy of the rows with the classification columns added.
+    """
+    return (
+        ClassificationResults.from_schemas(df, text_column, results)
+        .to_frame()
+        .drop(columns="user_corrected")
+    )
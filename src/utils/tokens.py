@@ -0,0 +1,83 @@
+import math
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text without a tokenizer.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The approximate token count, using about four characters per token.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _cut(text: str, position: int, window: int, forward: bool) -> int:
+    # Move a cut position to the nearest whitespace within ``window`` characters,
+    # before it for the end of a span and after it for the start of one, so that
+    # words are not split in half.
+    if forward:
+        found = text.rfind(" ", max(position - window, 0), position)
+    else:
+        found = text.find(" ", position, position + window)
+    return position if found == -1 else found
+
+
+def truncate_head_tail(text: str, max_tokens: int, head_share: float = 0.7) -> str:
+    """Shorten a text to a token budget, keeping its beginning and its end.
+
+    The subject of long texts, e.g. email threads, is usually stated at the top and
+    concluded at the bottom, so the middle is dropped.
+
+    Args:
+        text (str): The text to shorten.
+        max_tokens (int): The estimated token budget.
+        head_share (float): The share of the budget given to the beginning.
+
+    Returns:
+        str: The text itself if it fits, otherwise its beginning and its end
+            separated by ``[...]``.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    window = max(max_chars // 10, 1)
+    head = _cut(text, int(max_chars * head_share), window, forward=True)
+    tail = _cut(text, len(text) - (max_chars - head), window, forward=False)
+    return f"{text[:head].rstrip()} [...] {text[tail:].lstrip()}"
+
+
+def split_text(text: str, max_tokens: int, max_chunks: int) -> list[str]:
+    """Split a text into chunks within a token budget.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): The estimated token budget of each chunk.
+        max_chunks (int): The maximum number of chunks returned.
+
+    Returns:
+        list[str]: The chunks, in order. When the text needs more than
+            ``max_chunks``, chunks evenly spread over it are kept, always
+            including the first and the last.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end < len(text):
+            end = _cut(text, end, max(max_chars // 10, 1), forward=True)
+        chunks.append(text[start:end].strip())
+        start = end
+
+    chunks = [chunk for chunk in chunks if chunk]
+    if len(chunks) <= max_chunks:
+        return chunks
+    if max_chunks == 1:
+        return chunks[:1]
+    step = (len(chunks) - 1) / (max_chunks - 1)
+    return [chunks[round(i * step)] for i in range(max_chunks)]
@@ -0,0 +1,21 @@
+from src.near_duplicates import NearDuplicateClusterer
+
+
+def test_text_longer_than_a_slice():
+    long_text = " ".join(f"w{i}" for i in range(20_000))
+
+    labels = NearDuplicateClusterer(0.9).cluster(["hello world foo", long_text])
+
+    assert labels.tolist() == [0, 1]
+
+
+def test_near_duplicates_share_a_representative():
+    texts = [
+        "My order 1234 has not arrived yet, please help",
+        "My order 5678 has not arrived yet, please help!",
+        "The app crashes when I open the settings page",
+    ]
+
+    labels = NearDuplicateClusterer(0.8).cluster(texts)
+
+    assert labels.tolist() == [0, 0, 2]